@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Import-time budgets in seconds (median of fresh interpreter runs, interpreter startup excluded).
+# Modules imported by servers, trainers and simulations must stay light; the CLI generators load
+# pandas and the SDK's error classes, and the data tools (corpus index, exporter) work on DataFrames
+# throughout, so they get a larger allowance. The local scorer is loaded for live scoring and only
+# needs numpy until it is trained.
+IMPORT_BUDGETS = {
+    "clients": 0.05,
+    "token_budget": 0.05,
+    "termination": 0.05,
+    "interviewee": 0.05,
+    "failure_ledger": 0.05,
+    "spend_governor": 0.05,
+    "json_stream": 0.05,
+    "local_backend": 0.05,
+    "model_routing": 0.05,
+    "checkpoint": 0.05,
+    "dedup": 0.05,
+    "diversity": 0.05,
+    "sharding": 0.05,
+    "hedging": 0.1,
+    "opener_pool": 0.05,
+    "speculative_turn": 0.05,
+    "emotional_interviewer": 0.1,
+    "test_interviewer": 0.1,
+    "experiment_runner": 0.1,
+    "reward_service": 0.1,
+    "load_test": 0.25,
+    "local_scorer": 0.25,
+    "generate_eq_training_data": 1.5,
+    "generate_scenarios": 1.5,
+    "process_existing_scenarios": 1.5,
+    "scenario_stream": 1.5,
+    "corpus_index": 1.5,
+    "export_training_data": 1.5,
+}
+
+_SNIPPET = "import time, importlib; start = time.perf_counter(); importlib.import_module({!r}); print(time.perf_counter() - start)"
+
+
+def measure_import(module, runs=3):
+    """Median import time of a module in fresh interpreters, plus any files the import created.
+
+    Imports run in an empty working directory so side effects such as creating data/ or
+    reading .env from the current directory show up as created files.
+    """
+    times = []
+    created = set()
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""), PYTHONDONTWRITEBYTECODE="1")
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run([sys.executable, "-c", _SNIPPET.format(module)], cwd=workdir, env=env,
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+            times.append(float(result.stdout.strip().splitlines()[-1]))
+            created |= set(os.listdir(workdir))
+    return statistics.median(times), sorted(created)
+
+
+def main(modules=None, runs=3):
+    failures = []
+    for module in modules or IMPORT_BUDGETS:
+        budget = IMPORT_BUDGETS.get(module, 0.1)
+        seconds, created = measure_import(module, runs)
+        status = "ok"
+        if seconds > budget:
+            status = "SLOW"
+            failures.append(f"{module} imported in {seconds:.3f}s (budget {budget:.2f}s)")
+        if created:
+            status = "SIDE EFFECT"
+            failures.append(f"importing {module} created {created}")
+        print(f"{module:32s} {seconds * 1000:8.1f} ms  (budget {budget * 1000:.0f} ms)  {status}")
+
+    if failures:
+        print("\nStartup regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll imports within budget and free of side effects")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Guard module import latency and import-time side effects')
+    parser.add_argument('modules', nargs='*', help='Modules to check (default: all with a budget)')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreter runs per module')
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    exit_code = main(args.modules, args.runs)
+    print(f"Checked in {time.perf_counter() - start:.1f}s")
+    sys.exit(exit_code)
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+from clients import env
+
+
+def default_checkpoint_db():
+    """Where simulation checkpoints are kept between runs (SIMULATION_CHECKPOINT_DB)"""
+    return env("SIMULATION_CHECKPOINT_DB", os.path.join("data", "simulation_checkpoints.db"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS simulations (
+    key TEXT PRIMARY KEY,
+    persona TEXT NOT NULL,
+    sim INTEGER NOT NULL,
+    n_turns INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    average REAL,
+    updated_at REAL NOT NULL,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS turns (
+    key TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    row TEXT NOT NULL,
+    PRIMARY KEY (key, turn)
+);
+"""
+
+
+class SimulationCheckpoint:
+    """Durable per-turn state of interview simulations in SQLite.
+
+    After every completed turn the simulation stores its CSV row and the state needed to continue
+    (the interviewer's messages, the candidate's history and the score state) in one transaction,
+    so an interrupted sweep restarts at the last completed turn instead of from scratch. Each
+    simulation also keeps the run configuration it was started with (turns and termination rules),
+    so a sweep run with other settings can tell that the checkpoint is not its own.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_checkpoint_db()
+        self._conn = None
+
+    @property
+    def conn(self):
+        # Opened on first use so constructing a checkpoint never touches the filesystem
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(simulations)")]
+            if "config" not in columns:
+                # Databases from before run configurations were stored; their checkpoints match no run
+                self._conn.execute("ALTER TABLE simulations ADD COLUMN config TEXT")
+        return self._conn
+
+    def start(self, key, persona, sim, n_turns, config=None):
+        """Begin a simulation from scratch under a run configuration, dropping any earlier checkpoint under the same key"""
+        with self.conn:
+            self.conn.execute("DELETE FROM turns WHERE key = ?", (key,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO simulations (key, persona, sim, n_turns, status, average, updated_at, config) VALUES (?, ?, ?, ?, 'running', NULL, ?, ?)",
+                (key, persona, sim, n_turns, time.time(), json.dumps(config))
+            )
+
+    def save_turn(self, key, turn, state, row):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO turns (key, turn, state, row) VALUES (?, ?, ?, ?)",
+                (key, turn, json.dumps(state), json.dumps(row))
+            )
+            self.conn.execute("UPDATE simulations SET updated_at = ? WHERE key = ?", (time.time(), key))
+
+    def finish(self, key, average):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE simulations SET status = 'done', average = ?, updated_at = ? WHERE key = ?",
+                (average, time.time(), key)
+            )
+
+    def load(self, key):
+        """Saved progress of a simulation: dict with status, average, run config, rows and the last turn's state, or None"""
+        simulation = self.conn.execute("SELECT status, average, n_turns, config FROM simulations WHERE key = ?", (key,)).fetchone()
+        if simulation is None:
+            return None
+        turns = self.conn.execute("SELECT state, row FROM turns WHERE key = ? ORDER BY turn", (key,)).fetchall()
+        return {
+            "status": simulation[0],
+            "average": simulation[1],
+            "n_turns": simulation[2],
+            "config": json.loads(simulation[3]) if simulation[3] else None,
+            "rows": [json.loads(row) for _, row in turns],
+            "state": json.loads(turns[-1][0]) if turns else None,
+        }
+
+    def summary(self):
+        rows = self.conn.execute(
+            "SELECT s.key, s.status, s.average, COUNT(t.turn) FROM simulations s LEFT JOIN turns t ON t.key = s.key GROUP BY s.key ORDER BY s.key"
+        ).fetchall()
+        return [{"key": key, "status": status, "average": average, "turns": turns} for key, status, average, turns in rows]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Show the state of checkpointed interview simulations')
+    parser.add_argument('--db', type=str, default=default_checkpoint_db(), help='Checkpoint database')
+
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        print(f"No checkpoints at {args.db}")
+    else:
+        for simulation in SimulationCheckpoint(args.db).summary():
+            average = f"{simulation['average']:.1f}" if simulation["average"] is not None else "-"
+            print(f"{simulation['key']:32s} {simulation['status']:8s} turns={simulation['turns']:3d} average={average}")
@@ -0,0 +1,49 @@
+import os
+import weakref
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Load the .env file once, on first use rather than at import time"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
+
+
+# Default for paths and settings that come from the environment: they are read on first use,
+# after .env has been loaded, instead of at import time
+FROM_ENV = object()
+
+
+def env(name, default=None):
+    """An environment setting, with .env loaded first"""
+    load_env()
+    return os.getenv(name, default)
+
+
+def api_key():
+    load_env()
+    return os.getenv("ANTHROPIC_API_KEY")
+
+
+@lru_cache(maxsize=None)
+def get_client(key=None):
+    """Shared Anthropic client, created on first use and reused for every call"""
+    from anthropic import Anthropic
+    return Anthropic(api_key=key or api_key())
+
+
+# Async clients hold connections tied to the event loop that created them, so they are cached per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(key=None):
+    """Shared AsyncAnthropic client for the running event loop"""
+    import asyncio
+    from anthropic import AsyncAnthropic
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = key or api_key()
+    if key not in clients:
+        clients[key] = AsyncAnthropic(api_key=key)
+    return clients[key]
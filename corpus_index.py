@@ -0,0 +1,293 @@
+import os
+import glob
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import pandas as pd
+from clients import env
+from export_training_data import SIMULATION_GLOB, parse_simulation_filename
+
+
+def default_index_db():
+    """Where the corpus index is kept (CORPUS_INDEX_DB)"""
+    return env("CORPUS_INDEX_DB", os.path.join("data", "corpus_index.db"))
+
+
+# Generated variation datasets (generate_eq_training_data.py / process_existing_scenarios.py outputs)
+VARIATION_GLOB = os.path.join("data", "eq_training_data*.csv")
+
+# Free-text columns indexed for full-text search; FTS queries can target one with "column: terms"
+TEXT_FIELDS = [
+    "scenario",
+    "variation_description",
+    "conversation_objective",
+    "conversation_history",
+    "current_emotional_state",
+    "conversation_point",
+    "optimal_response",
+    "reasoning",
+    "interviewer_emotions",
+    "interviewer_thoughts",
+    "interviewer_response",
+    "interviewee_response",
+]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    prefix_sha1 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    persona TEXT,
+    eq_level TEXT,
+    sim INTEGER,
+    turn INTEGER,
+    score REAL,
+    reward REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_source ON records (source, row_index);
+CREATE INDEX IF NOT EXISTS records_filters ON records (kind, persona, turn, score);
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5({", ".join(TEXT_FIELDS)}, tokenize='porter unicode61');
+"""
+
+
+def _file_sha1(path, size):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number
+
+
+def source_kind(path):
+    """"simulation" for test_interviewer.py CSVs, "variation" for generated training data"""
+    return "simulation" if parse_simulation_filename(path)["eq_level"] != "unknown" else "variation"
+
+
+class CorpusIndex:
+    """SQLite FTS5 index over generated variations and interview simulations.
+
+    Each CSV row becomes one record with structured columns (kind, persona, EQ level, simulation,
+    turn, score, reward) for filtering and its free-text fields in an FTS5 table for ranked search.
+    Updates are incremental: unchanged files are skipped, files that only grew (the generators
+    append records) have just their new rows indexed, and anything else is reindexed.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_index_db()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def update(self, paths):
+        """Index new and changed files; returns {"indexed": rows added, "skipped": unchanged files, "removed": rows dropped}"""
+        stats = {"indexed": 0, "skipped": 0, "removed": 0}
+        for path in paths:
+            path = os.path.normpath(path)
+            stat = os.stat(path)
+            source = self.conn.execute("SELECT * FROM sources WHERE path = ?", (path,)).fetchone()
+            if source and source["size"] == stat.st_size and source["mtime"] == stat.st_mtime:
+                stats["skipped"] += 1
+                continue
+
+            start_row = 0
+            if source and stat.st_size > source["size"] and _file_sha1(path, source["size"]) == source["prefix_sha1"]:
+                # Appended to since the last update: keep the rows already indexed
+                start_row = source["rows"]
+            elif source:
+                stats["removed"] += self._remove_source(path)
+
+            df = pd.read_csv(path)
+            with self.conn:
+                stats["indexed"] += self._index_rows(path, df.iloc[start_row:], start_row)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO sources (path, kind, size, mtime, rows, prefix_sha1) VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, source_kind(path), stat.st_size, stat.st_mtime, len(df), _file_sha1(path, stat.st_size))
+                )
+        return stats
+
+    def prune(self):
+        """Drop records of indexed files that no longer exist"""
+        removed = 0
+        for (path,) in self.conn.execute("SELECT path FROM sources").fetchall():
+            if not os.path.exists(path):
+                removed += self._remove_source(path)
+        return removed
+
+    def _remove_source(self, path):
+        with self.conn:
+            ids = [row[0] for row in self.conn.execute("SELECT id FROM records WHERE source = ?", (path,))]
+            self.conn.executemany("DELETE FROM records_fts WHERE rowid = ?", [(i,) for i in ids])
+            self.conn.execute("DELETE FROM records WHERE source = ?", (path,))
+            self.conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+        return len(ids)
+
+    def _index_rows(self, path, df, start_row):
+        kind = source_kind(path)
+        meta = parse_simulation_filename(path) if kind == "simulation" else {}
+        df = df.astype(object).where(df.notna(), None)
+        count = 0
+        for offset, record in enumerate(df.to_dict("records")):
+            row_index = start_row + offset
+            if kind == "simulation":
+                persona, eq_level, sim, turn = meta["persona"], meta["eq_level"], meta["sim"], row_index
+                score, reward = _number(record.get("interviewer_emotion_score")), _number(record.get("reward"))
+            else:
+                persona, eq_level, sim, turn = record.get("persona"), None, None, None
+                score, reward = None, None
+            cursor = self.conn.execute(
+                "INSERT INTO records (source, row_index, kind, persona, eq_level, sim, turn, score, reward, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, row_index, kind, persona, eq_level, sim, turn, score, reward, json.dumps(record, default=str))
+            )
+            self.conn.execute(
+                f"INSERT INTO records_fts (rowid, {', '.join(TEXT_FIELDS)}) VALUES (?, {', '.join('?' * len(TEXT_FIELDS))})",
+                [cursor.lastrowid] + [str(record.get(field) or "") for field in TEXT_FIELDS]
+            )
+            count += 1
+        return count
+
+    def search(self, query=None, kind=None, persona=None, eq_level=None, min_score=None, max_score=None,
+               turn=None, min_turn=None, max_turn=None, limit=20):
+        """Matching records, best full-text match first when a query is given.
+
+        query uses FTS5 syntax, e.g. 'frustrat*', '"lost confidence"' or 'interviewer_thoughts: vague'.
+        persona matches the stored name or its first word, case-insensitively ("Taylor", "taylor").
+        """
+        where, params = [], []
+        if query:
+            where.append("records_fts MATCH ?")
+            params.append(query)
+        if kind:
+            where.append("r.kind = ?")
+            params.append(kind)
+        if persona:
+            where.append("(lower(r.persona) = lower(?) OR lower(r.persona) LIKE lower(?) || ' %')")
+            params.extend([persona, persona])
+        if eq_level:
+            where.append("lower(r.eq_level) = lower(?)")
+            params.append(eq_level)
+        for clause, value in (("r.score >= ?", min_score), ("r.score <= ?", max_score), ("r.turn = ?", turn),
+                              ("r.turn >= ?", min_turn), ("r.turn <= ?", max_turn)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+
+        sql = "SELECT r.* FROM records r"
+        if query:
+            sql += " JOIN records_fts ON records_fts.rowid = r.id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY bm25(records_fts)" if query else " ORDER BY r.source, r.row_index"
+        sql += " LIMIT ?"
+        params.append(limit)
+
+        results = []
+        for row in self.conn.execute(sql, params):
+            result = {key: row[key] for key in ("source", "row_index", "kind", "persona", "eq_level", "sim", "turn", "score", "reward")}
+            result["record"] = json.loads(row["data"])
+            results.append(result)
+        return results
+
+    def summary(self):
+        rows = self.conn.execute("SELECT kind, COUNT(*), COUNT(DISTINCT source) FROM records GROUP BY kind").fetchall()
+        return {kind: {"records": count, "files": files} for kind, count, files in rows}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def default_sources():
+    return sorted(set(glob.glob(SIMULATION_GLOB)) | set(glob.glob(VARIATION_GLOB)))
+
+
+def _preview(result, width=100):
+    record = result["record"]
+    text = next((str(record[f]) for f in ("current_emotional_state", "interviewer_emotions", "scenario") if record.get(f)), "")
+    text = " ".join(text.split())
+    return text[:width] + ("..." if len(text) > width else "")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Full-text and filtered search over the generated EQ corpus')
+    parser.add_argument('--db', type=str, default=default_index_db(), help='Index database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='Index new or changed CSV files')
+    update_parser.add_argument('paths', nargs='*', help=f'CSV files or globs (default: {SIMULATION_GLOB} and {VARIATION_GLOB})')
+
+    search_parser = subparsers.add_parser('search', help='Query the index')
+    search_parser.add_argument('query', nargs='?', default=None, help='FTS5 query, e.g. "frustrat*" or "interviewer_thoughts: vague"')
+    search_parser.add_argument('--kind', choices=['simulation', 'variation'], default=None)
+    search_parser.add_argument('--persona', type=str, default=None)
+    search_parser.add_argument('--eq_level', type=str, default=None)
+    search_parser.add_argument('--min_score', type=float, default=None)
+    search_parser.add_argument('--max_score', type=float, default=None)
+    search_parser.add_argument('--turn', type=int, default=None, help='0-based simulation turn')
+    search_parser.add_argument('--min_turn', type=int, default=None)
+    search_parser.add_argument('--max_turn', type=int, default=None)
+    search_parser.add_argument('--limit', type=int, default=20)
+    search_parser.add_argument('--json', action='store_true', help='Print full records as JSON lines')
+
+    subparsers.add_parser('stats', help='Show what is indexed')
+
+    args = parser.parse_args()
+    index = CorpusIndex(args.db)
+
+    if args.command == 'update':
+        paths = sorted({p for pattern in args.paths for p in glob.glob(pattern)}) if args.paths else default_sources()
+        start = time.perf_counter()
+        stats = index.update(paths)
+        stats["removed"] += index.prune()
+        print(f"Indexed {stats['indexed']} rows, {stats['skipped']} files unchanged, {stats['removed']} stale rows removed in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'search':
+        start = time.perf_counter()
+        results = index.search(args.query, kind=args.kind, persona=args.persona, eq_level=args.eq_level,
+                               min_score=args.min_score, max_score=args.max_score, turn=args.turn,
+                               min_turn=args.min_turn, max_turn=args.max_turn, limit=args.limit)
+        elapsed = time.perf_counter() - start
+        for result in results:
+            if args.json:
+                print(json.dumps(result))
+            else:
+                location = f"{result['source']}:{result['row_index']}"
+                score = f" score={result['score']:.0f}" if result["score"] is not None else ""
+                print(f"{location:40s}{score}  {_preview(result)}")
+        print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+    else:
+        print(json.dumps(index.summary(), indent=2))
@@ -0,0 +1,178 @@
+import re
+import json
+import zlib
+import argparse
+
+# numpy and pandas are imported on first use: diversity and model_routing only need shingle_set and jaccard
+
+# Variation fields compared when looking for near-duplicates
+DEFAULT_FIELDS = ["current_emotional_state", "conversation_point"]
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_set(record, fields=DEFAULT_FIELDS, shingle_size=3):
+    """Lower-cased word n-gram shingles over the given fields of a record"""
+    shingles = set()
+    for field in fields:
+        words = _WORD_RE.findall(str(record.get(field, "") or "").lower())
+        if len(words) < shingle_size:
+            # Short fields still contribute a single shingle so they can match each other
+            if words:
+                shingles.add(f"{field}:{' '.join(words)}")
+            continue
+        for i in range(len(words) - shingle_size + 1):
+            shingles.add(f"{field}:{' '.join(words[i:i + shingle_size])}")
+    return shingles
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateFilter:
+    """MinHash/LSH near-duplicate filter over conversation variation fields.
+
+    Records are compared within a group (normally the scenario they belong to), and a record is a
+    duplicate when the Jaccard similarity of its shingles with an already kept record reaches the
+    threshold. LSH bands only pick the candidates; the final decision uses the exact Jaccard score.
+    """
+
+    def __init__(self, threshold=0.8, fields=DEFAULT_FIELDS, shingle_size=3, num_perm=64, bands=16, seed=42):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.fields = list(fields)
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        import numpy as np
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._buckets = {}
+        self._kept = {}
+        self.report = {"checked": 0, "kept": 0, "dropped": 0, "duplicates": []}
+
+    def signature(self, shingles):
+        """MinHash signature of a shingle set"""
+        import numpy as np
+        if not shingles:
+            return np.zeros(len(self._a), dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * h + b) mod p for every permutation and shingle, then the minimum per permutation
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def _band_keys(self, group, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield (group, band, signature[start:start + self.rows].tobytes())
+
+    def find_duplicate(self, record, group=None):
+        """Return (kept_record, similarity) for the closest kept near-duplicate of a record, or None"""
+        shingles = shingle_set(record, self.fields, self.shingle_size)
+        return self._find(shingles, self.signature(shingles), group)
+
+    def _find(self, shingles, signature, group):
+        best = None
+        seen = set()
+        for key in self._band_keys(group, signature):
+            for index in self._buckets.get(key, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                kept_record, kept_shingles = self._kept[index]
+                similarity = jaccard(shingles, kept_shingles)
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (kept_record, similarity)
+        return best
+
+    def add(self, record, group=None):
+        """Keep the record unless it is a near-duplicate of one already kept. Returns True if kept."""
+        shingles = shingle_set(record, self.fields, self.shingle_size)
+        signature = self.signature(shingles)
+        self.report["checked"] += 1
+        duplicate = self._find(shingles, signature, group)
+        if duplicate:
+            kept_record, similarity = duplicate
+            self.report["dropped"] += 1
+            self.report["duplicates"].append({
+                "group": None if group is None else str(group)[:80],
+                "dropped": record.get("variation_description", ""),
+                "kept": kept_record.get("variation_description", ""),
+                "similarity": round(similarity, 3),
+            })
+            return False
+
+        index = len(self._kept)
+        self._kept[index] = (record, shingles)
+        for key in self._band_keys(group, signature):
+            self._buckets.setdefault(key, []).append(index)
+        self.report["kept"] += 1
+        return True
+
+    def filter(self, records, group=None):
+        """Return the records that are not near-duplicates of each other or of earlier kept records"""
+        return [record for record in records if self.add(record, group)]
+
+    def print_report(self):
+        report = self.report
+        rate = report["dropped"] / report["checked"] * 100 if report["checked"] else 0
+        print(f"Near-duplicate filter (threshold {self.threshold}): checked {report['checked']}, "
+              f"kept {report['kept']}, dropped {report['dropped']} ({rate:.1f}%)")
+        for duplicate in report["duplicates"][:10]:
+            print(f"  dropped '{duplicate['dropped']}' ~ '{duplicate['kept']}' (similarity {duplicate['similarity']})")
+
+    def save_report(self, path):
+        with open(path, "w") as f:
+            json.dump(dict(self.report, threshold=self.threshold, fields=self.fields), f, indent=2)
+
+
+def compact_dataset(input_file, output_file, threshold=0.8, fields=DEFAULT_FIELDS, group_by="scenario", report_file=None):
+    """Remove near-duplicate variations from an existing dataset CSV"""
+    import pandas as pd
+    df = pd.read_csv(input_file)
+    print(f"Loaded {len(df)} records from {input_file}")
+
+    dedup = NearDuplicateFilter(threshold=threshold, fields=fields)
+    records = df.to_dict("records")
+    keep = [dedup.add(record, record.get(group_by) if group_by else None) for record in records]
+
+    compacted = df[keep]
+    compacted.to_csv(output_file, index=False)
+    print(f"Saved {len(compacted)} records to {output_file}")
+    dedup.print_report()
+    if report_file:
+        dedup.save_report(report_file)
+        print(f"Dedup report saved to {report_file}")
+    return compacted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Remove near-duplicate conversation variations from an EQ training dataset')
+    parser.add_argument('input', type=str, help='Input CSV file with generated variations')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output CSV file (default: <input>_dedup.csv)')
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help='Jaccard similarity at which two variations count as duplicates')
+    parser.add_argument('--fields', type=str, nargs='+', default=DEFAULT_FIELDS,
+                        help='Variation fields to compare')
+    parser.add_argument('--group_by', type=str, default="scenario",
+                        help="Only compare records sharing this column ('none' compares across the whole dataset)")
+    parser.add_argument('--report', type=str, default=None,
+                        help='Write the dedup report as JSON to this file')
+
+    args = parser.parse_args()
+    output_file = args.output or args.input.replace(".csv", "_dedup.csv")
+    compact_dataset(
+        args.input,
+        output_file,
+        threshold=args.threshold,
+        fields=args.fields,
+        group_by=None if args.group_by.lower() == "none" else args.group_by,
+        report_file=args.report
+    )
@@ -0,0 +1,86 @@
+import re
+from dedup import DEFAULT_FIELDS, shingle_set
+
+# Coarse emotion families used to measure coverage of current_emotional_state
+EMOTION_FAMILIES = {
+    "anger": ["angry", "anger", "frustrat", "irritat", "annoy", "furious", "resent", "hostile", "bitter"],
+    "anxiety": ["anxious", "anxiety", "worr", "nervous", "afraid", "fear", "scared", "insecur", "overwhelm", "stress", "panic"],
+    "sadness": ["sad", "hurt", "disappoint", "discourag", "hopeless", "resign", "dejected", "lonely", "grief", "demoraliz"],
+    "defensiveness": ["defensive", "guarded", "dismissive", "resist", "skeptic", "suspicious", "withdrawn", "closed", "stubborn"],
+    "shame": ["embarrass", "ashamed", "shame", "guilt", "humiliat"],
+    "confusion": ["confus", "uncertain", "unsure", "ambivalen", "conflicted", "torn", "puzzled"],
+    "openness": ["open", "hopeful", "relieved", "receptive", "grateful", "optimist", "curious", "willing", "calm", "relaxed", "engaged"],
+    "unaware": ["unaware", "neutral", "casual", "indifferent", "oblivious", "distracted"],
+}
+
+_WORD_RE = re.compile(r"\w+")
+_NO_HISTORY_RE = re.compile(r"\bno (prior|previous|earlier)\b|\bfirst (time|approach|conversation)\b")
+
+
+def emotion_families(text):
+    """Emotion families mentioned in an emotional state description"""
+    words = _WORD_RE.findall(str(text or "").lower())
+    return {family for family, stems in EMOTION_FAMILIES.items()
+            if any(word.startswith(stem) for word in words for stem in stems)}
+
+
+def history_bucket(text):
+    """Bucket a conversation history by how much prior interaction it describes"""
+    text = str(text or "").lower()
+    words = len(_WORD_RE.findall(text))
+    if words <= 12 or _NO_HISTORY_RE.search(text):
+        return "none"
+    if words < 40:
+        return "brief"
+    if words < 90:
+        return "multiple"
+    return "extensive"
+
+
+class DiversityTracker:
+    """Tracks how much new material each round of variations adds for a scenario"""
+
+    def __init__(self, fields=DEFAULT_FIELDS, min_novelty=0.3):
+        self.fields = list(fields)
+        self.min_novelty = min_novelty
+        self.shingles = set()
+        self.emotions = set()
+        self.histories = set()
+        self.rounds = []
+
+    def update(self, variations):
+        """Add a round of variations and return its gain over everything seen before"""
+        round_shingles = set()
+        round_emotions = set()
+        round_histories = set()
+        for variation in variations:
+            round_shingles |= shingle_set(variation, self.fields)
+            round_emotions |= emotion_families(variation.get("current_emotional_state"))
+            round_histories.add(history_bucket(variation.get("conversation_history")))
+
+        gain = {
+            "variations": len(variations),
+            "novelty": len(round_shingles - self.shingles) / len(round_shingles) if round_shingles else 0.0,
+            "new_emotions": sorted(round_emotions - self.emotions),
+            "new_histories": sorted(round_histories - self.histories),
+        }
+        self.shingles |= round_shingles
+        self.emotions |= round_emotions
+        self.histories |= round_histories
+        self.rounds.append(gain)
+        return gain
+
+    def saturated(self, gain):
+        """True when a round added neither enough new wording nor new emotion/history coverage"""
+        if not gain["variations"]:
+            return True
+        growing = gain["new_emotions"] or gain["new_histories"]
+        return gain["novelty"] < self.min_novelty and not growing
+
+    def summary(self):
+        return {
+            "rounds": len(self.rounds),
+            "emotion_families": sorted(self.emotions),
+            "history_buckets": sorted(self.histories),
+            "novelty_per_round": [round(r["novelty"], 3) for r in self.rounds],
+        }
@@ -1,43 +1,132 @@
 import os
 import sys
 import json
-from anthropic import Anthropic
-from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from clients import api_key, get_client, get_async_client
+from token_budget import create_message, acreate_message
+from hedging import default_hedge_policy
+from opener_pool import default_opener_pool
 
-class EmotionScore(BaseModel):
-    emotion: int = Field(description="Overall emotion state at the moment: 0-100, where 0 is very negative and 100 is elated")
+# pydantic, the Anthropic SDK and the local scorer are imported on first use so importing this
+# module stays cheap for servers, trainers and tests
+
+@lru_cache(maxsize=None)
+def emotion_score_model():
+    """The EmotionScore pydantic model, built once on first use"""
+    from pydantic import BaseModel, Field
+
+    class EmotionScore(BaseModel):
+        emotion: int = Field(description="Overall emotion state at the moment: 0-100, where 0 is very negative and 100 is elated")
+
+    return EmotionScore
+
+
+def __getattr__(name):
+    # Keeps `from emotional_interviewer import EmotionScore` working without importing pydantic up front
+    if name == "EmotionScore":
+        return emotion_score_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@lru_cache(maxsize=None)
+def emotion_score_tools():
+    """Tool definition for the scoring call; the JSON schema is computed once instead of on every score"""
+    return [
+        {
+            "name": "emotion_score_result",
+            "description": "build the emotion score object",
+            "input_schema": emotion_score_model().model_json_schema()
+        }
+    ]
+
+
+# The interviewer's persona and interview agenda
+SYSTEM_PROMPT = (
+    "You are an interviewer conducting a job assessment interview on a candidate's Product management skills. "
+    "Please focus on the following areas of interest: "
+    "(a) market positioning of the new product, "
+    "(b) competitive analysis, "
+    "(c) TAM calculation, "
+    "(d) MRD and PRD creation, "
+    "(e) engineering, "
+    "(f) pre-launch and launch, "
+    "(g) maintenance and EOL cycles. "
+    "Make it general enough to test the candidate's knowledge and ask them to provide specific examples."
+    "Keep the interview conversational and engaging and to the point. When all areas are covered, ask the candidate if they have any questions."
+    "Do not output bullet points, markdown titles, or other formatting. Just output the text in a clear and easy to read format."
+    "Use your thoughts on this candidate as a reference. They are marked as 'thoughts' in assistant messages."
+    "Also consider your emotional state changes and how they affect your assessment of the candidate."
+    "They are marked as 'emotions' in assistant messages. You are allowed to be emotional and let it show."
+)
+
+# Fixed candidate line that opens a session when the candidate has not said anything yet
+OPENING_MESSAGE = "Hello, I'm here for the interview."
+
+# Prompts for the interviewer's hidden emotional and analytical planes, shared by the sync and async paths
+EMOTIONS_PROMPT = (
+    "You are impersonating an emotional plane of an interviewer. "
+    "Based on the conversation so far, express your current emotional state "
+    "and your feelings about the candidate. Be authentic and raw with your emotions. "
+    "For example: 'Im feeling really now excited about the candidate's experience', or "
+    "'Im getting increasingly frustrated because the candidate is avoding my questions.' "
+    "Consider your previous emotional state to gauge the change and conclude with the final state, e.g. 'I am sad now'"
+    "Only print your assessment of emotional state and nothing else – no tags, no markdown, no formatting, just the statement."
+)
+
+INTERNAL_MONOLOGUE_PROMPT = (
+    "You are an interviewer conducting a job assessment interview on a candidate's Product management skills. "
+    "Your job is to assess where you are in this conversation given the following context: "
+    "(a) what the interviewee said so far (b) how you candidly assessed this internally and (c) what you said back to him. "
+    "Your assessment should be straightforward and similar to what you would say to your good colleague about this candidate, "
+    "without covering anything up. It will never be heard by a candidate. For example, if you observe that the candidate "
+    "is making great claims but lacks on examples to support them, you may tell your colleague: 'this guy likes to make "
+    "bold statements but he is a bit thin on substance and experience' "
+    "Only print your assessment and nothing else – no tags, no markdown, no formatting, just the statement."
+)
+
+def generate_opener():
+    """One interviewer opening line for OPENING_MESSAGE. Raises on API errors, so a pool never stores a fallback reply"""
+    message = create_message(
+        get_client(),
+        "interviewer.opener",
+        default_max_tokens=1024,
+        model="claude-3-7-sonnet-20250219",
+        system=SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": OPENING_MESSAGE}]
+    )
+    return message.content[0].text
 
 
 # Global debug flag
 DEBUG = False
 
 class Interviewer:
-    def __init__(self):
-        # Load environment variables from .env file
-        load_dotenv()
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        self.system_prompt = (
-            "You are an interviewer conducting a job assessment interview on a candidate's Product management skills. "
-            "Please focus on the following areas of interest: "
-            "(a) market positioning of the new product, "
-            "(b) competitive analysis, "
-            "(c) TAM calculation, "
-            "(d) MRD and PRD creation, "
-            "(e) engineering, "
-            "(f) pre-launch and launch, "
-            "(g) maintenance and EOL cycles. "
-            "Make it general enough to test the candidate's knowledge and ask them to provide specific examples."
-            "Keep the interview conversational and engaging and to the point. When all areas are covered, ask the candidate if they have any questions."
-            "Do not output bullet points, markdown titles, or other formatting. Just output the text in a clear and easy to read format."
-            "Use your thoughts on this candidate as a reference. They are marked as 'thoughts' in assistant messages."
-            "Also consider your emotional state changes and how they affect your assessment of the candidate."
-            "They are marked as 'emotions' in assistant messages. You are allowed to be emotional and let it show."
-        )
+    def __init__(self, scorer=None, hedge=None, opener_pool=None, client=None, async_client=None):
+        # Load environment variables from .env file (once per process)
+        self.api_key = api_key()
+        # Emotion scorer: "llm" (API call per score) or "local" (CPU model trained on the simulation CSVs)
+        self.scorer = scorer or os.getenv("EMOTION_SCORER", "llm")
+        self._local_scorer = None
+        if self.scorer == "local":
+            # Loaded here so a missing model fails before the interview starts, not in its middle
+            from local_scorer import get_local_scorer
+            self._local_scorer = get_local_scorer()
+        # Optional hedging.HedgePolicy for the visible reply (HEDGE_REPLIES=1 enables the shared one)
+        self.hedge = hedge or default_hedge_policy()
+        # Optional opener_pool.OpenerPool of pre-generated first lines (OPENER_POOL_SIZE enables the shared one)
+        self.opener_pool = opener_pool or default_opener_pool()
+        self.system_prompt = SYSTEM_PROMPT
+        # Injected clients (e.g. a mock backend for load tests) replace the shared SDK clients
+        self._client = client
+        self._async_client = async_client
         self.conversation_history = []
         self.messages = []
 
-    def call_anthropic_api(self, messages, system_prompt=None):
+    @property
+    def client(self):
+        # Shared client per API key instead of a new connection pool for every call
+        return self._client or get_client(self.api_key)
+
+    def call_anthropic_api(self, messages, system_prompt=None, call_site="interviewer.reply"):
         # Debug: Print accumulated context before API call
         if DEBUG:
             print("\n----- DEBUG: LATEST CONTEXT BEING SENT TO API -----")
@@ -50,10 +139,12 @@ class Interviewer:
         prompt_to_use = system_prompt if system_prompt else self.system_prompt
         
         try:
-            client = Anthropic(api_key=self.api_key)
-            message = client.messages.create(
+            message = create_message(
+                self.client,
+                call_site,
+                default_max_tokens=1024,
+                hedge=self.hedge if call_site == "interviewer.reply" else None,
                 model="claude-3-7-sonnet-20250219",
-                max_tokens=1024,
                 system=prompt_to_use,
                 messages=messages
             )
@@ -72,34 +163,22 @@ class Interviewer:
 
     def generate_internal_emotions(self):
         """Generate interviewer's emotional state during the interview"""
-        emotions_prompt = (
-            "You are impersonating an emotional plane of an interviewer. "
-            "Based on the conversation so far, express your current emotional state "
-            "and your feelings about the candidate. Be authentic and raw with your emotions. "
-            "For example: 'Im feeling really now excited about the candidate's experience', or "
-            "'Im getting increasingly frustrated because the candidate is avoding my questions.' "
-            "Consider your previous emotional state to gauge the change and conclude with the final state, e.g. 'I am sad now'"
-            "Only print your assessment of emotional state and nothing else – no tags, no markdown, no formatting, just the statement."
-        )
-        
         # Call API with the conversation history and the emotions prompt
-        return self.call_anthropic_api(self.messages, emotions_prompt)
+        return self.call_anthropic_api(self.messages, EMOTIONS_PROMPT, call_site="interviewer.emotions")
 
     def generate_emotion_score(self, text):
         """Generate an emotion score for a given text"""
-        emotion_score_schema = EmotionScore.model_json_schema()
- 
-        tools = [
-            {
-                "name": "emotion_score_result",
-                "description": "build the emotion score object",
-                "input_schema": emotion_score_schema
-            }
-        ]
-        client = Anthropic(api_key=self.api_key)
-        message = client.messages.create(
+        if self._local_scorer is not None:
+            return self._local_scorer.score(text)
+        
+        message = create_message(self.client, "interviewer.emotion_score", **self._emotion_score_request(text))
+        function_call = message.content[0].input
+        return emotion_score_model()(**function_call).emotion
+
+    def _emotion_score_request(self, text):
+        return dict(
+            default_max_tokens=1200,
             model="claude-3-7-sonnet-20250219",
-            max_tokens=1200,
             temperature=0.2,
             system="You are calculating the integer emotion score for a given text (0-100).",
             messages=[
@@ -108,11 +187,9 @@ class Interviewer:
                     "content": f"{text}"
                 }
             ],
-            tools=tools,
+            tools=emotion_score_tools(),
             tool_choice={"type": "tool", "name": "emotion_score_result"}
         )
-        function_call = message.content[0].input
-        return EmotionScore(**function_call).emotion
 
     def get_response(self, user_input):
         """Function mode: Get a single response from the interviewer"""
@@ -150,11 +227,13 @@ class Interviewer:
                 
                 return (internal_emotions, internal_thoughts, interviewer_response, emotion_score)
             else:
-                # Otherwise start with an assistant message
-                initial_message = self.call_anthropic_api([{"role": "user", "content": "Hello, I'm here for the interview."}])
+                # Otherwise start with an assistant message, pre-generated when a warm pool is available
+                initial_message = self.opener_pool.take() if self.opener_pool else None
+                if initial_message is None:
+                    initial_message = self.call_anthropic_api([{"role": "user", "content": OPENING_MESSAGE}])
                 
                 # No thoughts for the initial message since there's no context yet
-                self.messages.append({"role": "user", "content": "Hello, I'm here for the interview."})
+                self.messages.append({"role": "user", "content": OPENING_MESSAGE})
                 self.messages.append({"role": "assistant", "content": initial_message})
                 
                 # Store the complete conversation history separately if needed
@@ -203,19 +282,117 @@ class Interviewer:
 
     def generate_internal_monologue(self):
         """Generate interviewer's internal thoughts about the candidate"""
-        internal_monologue_prompt = (
-            "You are an interviewer conducting a job assessment interview on a candidate's Product management skills. "
-            "Your job is to assess where you are in this conversation given the following context: "
-            "(a) what the interviewee said so far (b) how you candidly assessed this internally and (c) what you said back to him. "
-            "Your assessment should be straightforward and similar to what you would say to your good colleague about this candidate, "
-            "without covering anything up. It will never be heard by a candidate. For example, if you observe that the candidate "
-            "is making great claims but lacks on examples to support them, you may tell your colleague: 'this guy likes to make "
-            "bold statements but he is a bit thin on substance and experience' "
-            "Only print your assessment and nothing else – no tags, no markdown, no formatting, just the statement."
-        )
-        
         # Call API with the conversation history and the internal monologue prompt
-        return self.call_anthropic_api(self.messages, internal_monologue_prompt)
+        return self.call_anthropic_api(self.messages, INTERNAL_MONOLOGUE_PROMPT, call_site="interviewer.thoughts")
+
+    def inner_state(self, messages):
+        """Emotions, score and thoughts for a conversation ending in a candidate message, computed
+        on the given message list without touching self.messages"""
+        internal_emotions = self.call_anthropic_api(messages, EMOTIONS_PROMPT, call_site="interviewer.emotions").strip()
+        if "[emotions]" in internal_emotions and "[/emotions]" in internal_emotions:
+            internal_emotions = internal_emotions.split("[emotions]")[1].split("[/emotions]")[0]
+        messages = messages + [{"role": "assistant", "content": f"[emotions]{internal_emotions}[/emotions]"}]
+
+        emotion_score = self.generate_emotion_score(internal_emotions)
+        if not isinstance(emotion_score, int) or not (0 <= emotion_score <= 100):
+            emotion_score = 50
+
+        internal_thoughts = self.call_anthropic_api(messages, INTERNAL_MONOLOGUE_PROMPT, call_site="interviewer.thoughts").strip()
+        if "[thoughts]" in internal_thoughts and "[/thoughts]" in internal_thoughts:
+            internal_thoughts = internal_thoughts.split("[thoughts]")[1].split("[/thoughts]")[0]
+        return internal_emotions, emotion_score, internal_thoughts
+
+    def begin_turn(self, **kwargs):
+        """Start a turn fed with partial transcripts; see speculative_turn.SpeculativeTurn"""
+        from speculative_turn import SpeculativeTurn
+        return SpeculativeTurn(self, **kwargs)
+
+    # Async counterparts: same prompts, return tuple and message bookkeeping, on the async SDK client
+    # so one event loop can drive many sessions without a thread each
+
+    @property
+    def async_client(self):
+        return self._async_client or get_async_client(self.api_key)
+
+    async def acall_anthropic_api(self, messages, system_prompt=None, call_site="interviewer.reply"):
+        prompt_to_use = system_prompt if system_prompt else self.system_prompt
+        try:
+            message = await acreate_message(
+                self.async_client,
+                call_site,
+                default_max_tokens=1024,
+                model="claude-3-7-sonnet-20250219",
+                system=prompt_to_use,
+                messages=messages
+            )
+            if message.content and len(message.content) > 0:
+                return message.content[0].text
+            print("Warning: Received empty response from API")
+            return "I do not have data to respond. Let's continue with the interview."
+        except Exception as e:
+            print(f"Error calling Anthropic API: {str(e)}")
+            return "I apologize for the technical difficulties. Let's proceed with the interview."
+
+    async def agenerate_emotion_score(self, text):
+        if self._local_scorer is not None:
+            return self._local_scorer.score(text)
+        message = await acreate_message(self.async_client, "interviewer.emotion_score", **self._emotion_score_request(text))
+        return emotion_score_model()(**message.content[0].input).emotion
+
+    async def aget_response(self, user_input, timeout=None):
+        """Async get_response. A turn that times out or is cancelled is rolled back from self.messages
+        before the exception propagates, so the session can retry it."""
+        import asyncio
+        turn_start = len(self.messages)
+        try:
+            return await asyncio.wait_for(self._aturn(user_input), timeout)
+        except BaseException:
+            del self.messages[turn_start:]
+            self.conversation_history = self.messages.copy()
+            raise
+
+    async def _aturn(self, user_input):
+        import asyncio
+        if not self.messages and not user_input:
+            initial_message = self.opener_pool.take() if self.opener_pool else None
+            if initial_message is None:
+                initial_message = await self.acall_anthropic_api([{"role": "user", "content": OPENING_MESSAGE}])
+            self.messages.append({"role": "user", "content": OPENING_MESSAGE})
+            self.messages.append({"role": "assistant", "content": initial_message})
+            self.conversation_history = self.messages.copy()
+            return (None, None, initial_message, None)
+
+        first_turn = not self.messages
+        self.messages.append({"role": "user", "content": user_input})
+
+        internal_emotions = (await self.acall_anthropic_api(self.messages, EMOTIONS_PROMPT, call_site="interviewer.emotions")).strip()
+        if "[emotions]" in internal_emotions and "[/emotions]" in internal_emotions:
+            internal_emotions = internal_emotions.split("[emotions]")[1].split("[/emotions]")[0]
+        self.messages.append({"role": "assistant", "content": f"[emotions]{internal_emotions}[/emotions]"})
+
+        # The score and the monologue both depend only on the emotions, so they run concurrently
+        emotion_score, internal_thoughts = await asyncio.gather(
+            self.agenerate_emotion_score(internal_emotions),
+            self.acall_anthropic_api(list(self.messages), INTERNAL_MONOLOGUE_PROMPT, call_site="interviewer.thoughts")
+        )
+        # Same validation as get_response, which only checks scores after the first turn
+        if not first_turn and (not isinstance(emotion_score, int) or not (0 <= emotion_score <= 100)):
+            emotion_score = 50
+        internal_thoughts = internal_thoughts.strip()
+        if "[thoughts]" in internal_thoughts and "[/thoughts]" in internal_thoughts:
+            internal_thoughts = internal_thoughts.split("[thoughts]")[1].split("[/thoughts]")[0]
+        self.messages.append({"role": "assistant", "content": f"[thoughts]{internal_thoughts}[/thoughts]"})
+
+        interviewer_response = await self.acall_anthropic_api(self.messages)
+        if first_turn:
+            interviewer_response = interviewer_response.strip()
+        self.messages.append({"role": "assistant", "content": interviewer_response})
+        self.conversation_history = self.messages.copy()
+        return (internal_emotions, internal_thoughts, interviewer_response, emotion_score)
+
+    async def aconduct_interview(self, opening_message=None, timeout=None):
+        """Async conduct_interview(function_mode=True) with an optional per-turn timeout in seconds"""
+        return await self.aget_response(opening_message, timeout)
 
     def conduct_interview(self, opening_message=None, function_mode=False):
         """
@@ -269,6 +446,8 @@ class Interviewer:
         
         print("Opening message:", opening_message)
         self.conduct_interview(opening_message)
+        if self.hedge:
+            print(f"Reply hedging: {self.hedge.metrics()}")
 
 if __name__ == "__main__":
     # Check for debug flag in environment
@@ -0,0 +1,231 @@
+import json
+import math
+import argparse
+import statistics
+from functools import partial
+from test_interviewer import PERSONAS, run_simulation, print_persona_statistics
+from termination import TerminationPolicy
+from checkpoint import SimulationCheckpoint, default_checkpoint_db
+
+# Defaults for fields an experiment spec leaves out
+DEFAULT_SPEC = {
+    "name": "persona-eq",
+    "turns": 10,
+    "min_sims": 3,
+    "max_sims": 10,
+    "ci_half_width": 5.0,
+    "confidence": 0.95,
+    # "bonferroni" widens each interim interval for the repeated looks; "none" uses the fixed-sample interval
+    "sequential_correction": "bonferroni",
+    "stop_when_separated": True,
+    # TerminationPolicy arguments for ending single sessions early; null plays every turn
+    "termination": {},
+    "personas": [p["name"] for p in PERSONAS],
+}
+
+# Interviewer makes 4 calls per turn (emotions, score, thoughts, reply) and the candidate at least 1;
+# sessions that end early make fewer, so the estimate is an upper bound
+CALLS_PER_TURN = 5
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b) (continued fraction, Numerical Recipes betacf)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        # The continued fraction converges fast only below the mean; use the symmetry relation above it
+        return 1.0 - _betainc(b, a, 1 - x)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    f = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            f *= c * d
+        if abs(c * d - 1.0) < 1e-15:
+            break
+    return front * f
+
+
+def t_critical(df, confidence=0.95):
+    """Two-sided Student t critical value, found by inverting the t distribution's tail probability.
+
+    P(|T| > t) = I_x(df/2, 1/2) with x = df / (df + t^2), so the critical value comes from bisecting
+    x; exact to float precision for any df and confidence, small df included.
+    """
+    if df <= 0:
+        return math.inf
+    alpha = 1 - confidence
+    low, high = 0.0, 1.0
+    for _ in range(200):
+        x = (low + high) / 2
+        if _betainc(df / 2, 0.5, x) < alpha:
+            low = x
+        else:
+            high = x
+    x = (low + high) / 2
+    return math.sqrt(df * (1 - x) / x)
+
+
+def per_look_confidence(spec):
+    """Confidence of each interim interval so that all of a persona's looks together keep spec["confidence"].
+
+    A persona's interval is checked after every round from min_sims up to max_sims. Testing a fixed
+    95% interval at each of those looks would stop on a chance fluctuation far more than 5% of the
+    time, so with the default "bonferroni" correction the error rate is split evenly across the looks.
+    """
+    if spec.get("sequential_correction", "bonferroni") == "none":
+        return spec["confidence"]
+    looks = max(1, spec["max_sims"] - spec["min_sims"] + 1)
+    return 1 - (1 - spec["confidence"]) / looks
+
+
+def confidence_interval(scores, confidence=0.95):
+    """(mean, half width) of the mean score's confidence interval"""
+    mean = statistics.mean(scores)
+    if len(scores) < 2:
+        return mean, math.inf
+    return mean, t_critical(len(scores) - 1, confidence) * statistics.stdev(scores) / math.sqrt(len(scores))
+
+
+def load_spec(path=None):
+    """Experiment spec from a JSON file, with persona names resolved against test_interviewer.PERSONAS"""
+    spec = dict(DEFAULT_SPEC)
+    if path:
+        with open(path) as f:
+            spec.update(json.load(f))
+    by_name = {p["name"]: p for p in PERSONAS}
+    by_name.update({p["name"].split()[0]: p for p in PERSONAS})
+    personas = []
+    for persona in spec["personas"]:
+        if isinstance(persona, str):
+            if persona not in by_name:
+                raise ValueError(f"Unknown persona '{persona}' in experiment spec")
+            persona = by_name[persona]
+        personas.append(persona)
+    spec["personas"] = personas
+    return spec
+
+
+class SequentialExperiment:
+    """Runs persona simulations round by round and stops each persona once its result is settled.
+
+    A persona stops when its mean-score confidence interval is narrower than ci_half_width, when
+    (optionally) its interval no longer overlaps any persona with a different EQ level, or when it
+    reaches max_sims. Each round gives one more simulation to every persona that is still open.
+    Intervals are computed at per_look_confidence(spec), which corrects for re-testing them after
+    every round, so a persona's reported interval holds at spec["confidence"] overall.
+    """
+
+    def __init__(self, spec, simulate=run_simulation):
+        self.spec = spec
+        self.simulate = simulate
+        self.termination = TerminationPolicy.from_dict(spec.get("termination"))
+        self.scores = {p["name"]: [] for p in spec["personas"]}
+        self.stop_reasons = {}
+        self.confidence = per_look_confidence(spec)
+
+    def interval(self, persona):
+        return confidence_interval(self.scores[persona["name"]], self.confidence)
+
+    def separated(self, persona):
+        mean, half = self.interval(persona)
+        for other in self.spec["personas"]:
+            if other["eq_level"] == persona["eq_level"] or len(self.scores[other["name"]]) < 2:
+                continue
+            other_mean, other_half = self.interval(other)
+            if abs(mean - other_mean) <= half + other_half:
+                return False
+        return True
+
+    def stop_reason(self, persona):
+        n = len(self.scores[persona["name"]])
+        if n < self.spec["min_sims"]:
+            return None
+        if n >= self.spec["max_sims"]:
+            return "max_sims"
+        if self.interval(persona)[1] <= self.spec["ci_half_width"]:
+            return "ci_tight"
+        if self.spec["stop_when_separated"] and self.separated(persona):
+            return "separated"
+        return None
+
+    def run(self):
+        round_number = 0
+        while True:
+            active = [p for p in self.spec["personas"] if p["name"] not in self.stop_reasons]
+            for persona in active:
+                reason = self.stop_reason(persona)
+                if reason:
+                    self.stop_reasons[persona["name"]] = reason
+                    mean, half = self.interval(persona)
+                    print(f"Stopping {persona['name']} after {len(self.scores[persona['name']])} sims ({reason}): {mean:.1f} ± {half:.1f}")
+            active = [p for p in active if p["name"] not in self.stop_reasons]
+            if not active:
+                break
+
+            round_number += 1
+            print(f"\n=== Round {round_number}: {len(active)} personas still open ===")
+            for persona in active:
+                sim = len(self.scores[persona["name"]]) + 1
+                self.scores[persona["name"]].append(self.simulate(persona, sim, self.spec["turns"], self.termination))
+        return self.report()
+
+    def report(self):
+        personas = {}
+        for persona in self.spec["personas"]:
+            scores = self.scores[persona["name"]]
+            mean, half = self.interval(persona)
+            personas[persona["name"]] = {
+                "eq_level": persona["eq_level"],
+                "sims": len(scores),
+                "mean": round(mean, 2),
+                "ci_half_width": round(half, 2) if math.isfinite(half) else None,
+                "stop_reason": self.stop_reasons.get(persona["name"]),
+            }
+        sims_run = sum(len(s) for s in self.scores.values())
+        sims_fixed = self.spec["max_sims"] * len(self.spec["personas"])
+        return {
+            "name": self.spec["name"],
+            "confidence": self.spec["confidence"],
+            "per_look_confidence": round(self.confidence, 5),
+            "sequential_correction": self.spec.get("sequential_correction", "bonferroni"),
+            "personas": personas,
+            "sims_run": sims_run,
+            "sims_fixed_design": sims_fixed,
+            "estimated_api_calls": sims_run * self.spec["turns"] * CALLS_PER_TURN,
+            "estimated_api_calls_saved": (sims_fixed - sims_run) * self.spec["turns"] * CALLS_PER_TURN,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run persona EQ simulations with sequential stopping')
+    parser.add_argument('--spec', type=str, default=None,
+                        help='JSON experiment spec (personas, turns, min_sims, max_sims, ci_half_width, confidence, sequential_correction, stop_when_separated, termination)')
+    parser.add_argument('--report', type=str, default=None,
+                        help='Write the final report as JSON to this file')
+    parser.add_argument('--resume', action='store_true',
+                        help='Reuse finished simulations and continue unfinished ones from their last checkpointed turn')
+    parser.add_argument('--checkpoint_db', type=str, default=default_checkpoint_db(),
+                        help='SQLite file holding per-turn simulation checkpoints')
+
+    args = parser.parse_args()
+    spec = load_spec(args.spec)
+    simulate = partial(run_simulation, checkpoint=SimulationCheckpoint(args.checkpoint_db), resume=args.resume)
+    experiment = SequentialExperiment(spec, simulate)
+    report = experiment.run()
+
+    for persona in spec["personas"]:
+        print_persona_statistics(persona, experiment.scores[persona["name"]], spec["turns"])
+    print(f"\n{json.dumps(report, indent=2)}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
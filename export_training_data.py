@@ -0,0 +1,211 @@
+import os
+import re
+import glob
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# Simulation CSVs are named <persona>-<eq level>-eq-<sim>.csv by test_interviewer.py
+SIMULATION_GLOB = "*-eq-*.csv"
+_FILENAME_RE = re.compile(r"(?P<persona>[^/\\]+)-(?P<eq_level>[a-z]+)-eq-(?P<sim>\d+)\.csv$")
+
+
+def parse_simulation_filename(path):
+    match = _FILENAME_RE.search(os.path.basename(path))
+    if not match:
+        return {"persona": os.path.basename(path), "eq_level": "unknown", "sim": 0}
+    return {"persona": match["persona"], "eq_level": match["eq_level"], "sim": int(match["sim"])}
+
+
+def discounted_returns(rewards, gamma):
+    """G_t = sum_k gamma^k * r_(t+k), computed with a reversed cumulative sum"""
+    rewards = np.asarray(rewards, dtype=np.float64)
+    if not len(rewards):
+        return rewards
+    if gamma == 0:
+        return rewards.copy()
+    discounts = gamma ** np.arange(len(rewards))
+    return np.cumsum((rewards * discounts)[::-1])[::-1] / discounts
+
+
+def load_simulation(path, gamma=0.9):
+    """One simulation as training rows: the candidate answer of each turn and the reaction it got.
+
+    Row t holds the interviewer's question and the candidate's answer to it. The answer is rewarded
+    with the change in interviewer emotion score it caused, which is only observed on turn t+1, so
+    the final turn (whose reaction was never scored) is dropped. Turn 0's score is the opener's
+    unscored placeholder rather than an observed reaction, so the first answer gets reward 0, the
+    same as the reward column test_interviewer.py writes.
+    """
+    df = pd.read_csv(path)
+    meta = parse_simulation_filename(path)
+    scores = df["interviewer_emotion_score"].to_numpy(dtype=np.float64)
+    rewards = np.diff(scores)
+    if len(rewards):
+        rewards[0] = 0.0
+
+    df = df.iloc[:-1].copy()
+    df["turn"] = np.arange(len(df))
+    df["emotion_score"] = scores[:-1]
+    df["next_emotion_score"] = scores[1:]
+    df["reward"] = rewards
+    df["return"] = discounted_returns(rewards, gamma)
+    for key, value in meta.items():
+        df[key] = value
+
+    # Prompt = transcript so far plus the current question, built from running string sums
+    questions = df["interviewer_response"].fillna("").astype(str).str.strip()
+    answers = df["interviewee_response"].fillna("").astype(str).str.strip()
+    exchanges = "Interviewer: " + questions + "\nCandidate: " + answers + "\n"
+    history = exchanges.cumsum().shift(1, fill_value="")
+    df["prompt"] = history + "Interviewer: " + questions + "\nCandidate:"
+    df["completion"] = " " + answers
+    return df
+
+
+def persona_return_stats(files, gamma=0.9):
+    """First pass: mean and standard deviation of returns per persona"""
+    totals = {}
+    for path in files:
+        df = load_simulation(path, gamma)
+        for persona, returns in df.groupby("persona")["return"]:
+            count, total, total_sq = totals.get(persona, (0, 0.0, 0.0))
+            totals[persona] = (count + len(returns), total + returns.sum(), total_sq + (returns ** 2).sum())
+    stats = {}
+    for persona, (count, total, total_sq) in totals.items():
+        mean = total / count
+        std = np.sqrt(max(total_sq / count - mean ** 2, 0.0))
+        stats[persona] = {"count": int(count), "mean": float(mean), "std": float(std)}
+    return stats
+
+
+class ShardWriter:
+    """Writes records into numbered JSONL or Arrow shards of a fixed size"""
+
+    def __init__(self, output_dir, shard_size=5000, fmt="jsonl"):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.fmt = fmt
+        self.buffer = []
+        self.shards = []
+        self.records = 0
+        if fmt == "arrow":
+            try:
+                import pyarrow
+                import pyarrow.feather
+            except ImportError:
+                raise ImportError("Arrow output requires pyarrow: pip install pyarrow")
+            self._pyarrow = pyarrow
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, df):
+        self.buffer.append(df)
+        buffered = sum(len(d) for d in self.buffer)
+        while buffered >= self.shard_size:
+            combined = pd.concat(self.buffer, ignore_index=True)
+            self._flush(combined.iloc[:self.shard_size])
+            rest = combined.iloc[self.shard_size:]
+            self.buffer = [rest] if len(rest) else []
+            buffered = len(rest)
+
+    def close(self):
+        if self.buffer:
+            combined = pd.concat(self.buffer, ignore_index=True)
+            if len(combined):
+                self._flush(combined)
+            self.buffer = []
+        return self.shards
+
+    def _flush(self, df):
+        path = os.path.join(self.output_dir, f"train-{len(self.shards):05d}.{self.fmt}")
+        if self.fmt == "arrow":
+            table = self._pyarrow.Table.from_pandas(df, preserve_index=False)
+            self._pyarrow.feather.write_feather(table, path)
+        else:
+            df.to_json(path, orient="records", lines=True, force_ascii=False)
+        self.shards.append(path)
+        self.records += len(df)
+        print(f"Wrote {len(df)} records to {path}")
+
+
+OUTPUT_COLUMNS = ["prompt", "completion", "persona", "eq_level", "sim", "turn", "emotion_score",
+                  "next_emotion_score", "reward", "return", "advantage"]
+
+
+def export_training_data(pattern=SIMULATION_GLOB, output_dir="data/grpo", gamma=0.9, shard_size=5000, fmt="jsonl",
+                         min_reward=None, min_return=None, min_advantage=None):
+    """Stream simulation CSVs into training shards with returns and per-persona normalized advantages"""
+    files = sorted(glob.glob(pattern))
+    if not files:
+        print(f"No simulation CSVs match {pattern}")
+        return None
+    print(f"Exporting {len(files)} simulation files")
+
+    stats = persona_return_stats(files, gamma)
+    writer = ShardWriter(output_dir, shard_size, fmt)
+    kept = dropped = 0
+    for path in files:
+        df = load_simulation(path, gamma)
+        mean = df["persona"].map(lambda p: stats[p]["mean"])
+        std = df["persona"].map(lambda p: stats[p]["std"])
+        df["advantage"] = (df["return"] - mean) / (std + 1e-8)
+
+        mask = np.ones(len(df), dtype=bool)
+        if min_reward is not None:
+            mask &= df["reward"].to_numpy() >= min_reward
+        if min_return is not None:
+            mask &= df["return"].to_numpy() >= min_return
+        if min_advantage is not None:
+            mask &= df["advantage"].to_numpy() >= min_advantage
+        kept += int(mask.sum())
+        dropped += int((~mask).sum())
+        writer.write(df.loc[mask, OUTPUT_COLUMNS])
+
+    shards = writer.close()
+    manifest = {
+        "source": pattern,
+        "files": len(files),
+        "records": kept,
+        "filtered_out": dropped,
+        "gamma": gamma,
+        "filters": {"min_reward": min_reward, "min_return": min_return, "min_advantage": min_advantage},
+        "persona_return_stats": stats,
+        "shards": [os.path.basename(s) for s in shards],
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"\nExported {kept} records ({dropped} filtered out) in {len(shards)} shards to {output_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export interview simulations as GRPO-ready training shards')
+    parser.add_argument('--input', type=str, default=SIMULATION_GLOB,
+                        help='Glob of simulation CSVs written by test_interviewer.py')
+    parser.add_argument('--output_dir', type=str, default="data/grpo",
+                        help='Directory for the shards and manifest.json')
+    parser.add_argument('--gamma', type=float, default=0.9,
+                        help='Discount factor for returns')
+    parser.add_argument('--shard_size', type=int, default=5000,
+                        help='Records per shard')
+    parser.add_argument('--format', choices=["jsonl", "arrow"], default="jsonl",
+                        help='Shard format (arrow requires pyarrow)')
+    parser.add_argument('--min_reward', type=float, default=None,
+                        help='Keep only answers whose immediate reward is at least this')
+    parser.add_argument('--min_return', type=float, default=None,
+                        help='Keep only answers whose discounted return is at least this')
+    parser.add_argument('--min_advantage', type=float, default=None,
+                        help='Keep only answers whose per-persona normalized advantage is at least this')
+
+    args = parser.parse_args()
+    export_training_data(
+        pattern=args.input,
+        output_dir=args.output_dir,
+        gamma=args.gamma,
+        shard_size=args.shard_size,
+        fmt=args.format,
+        min_reward=args.min_reward,
+        min_return=args.min_return,
+        min_advantage=args.min_advantage
+    )
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+from clients import env
+
+
+def default_failure_ledger():
+    """Where failed generation units are recorded between runs (GENERATION_FAILURE_LEDGER)"""
+    return env("GENERATION_FAILURE_LEDGER", os.path.join("data", "generation_failures.db"))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    generator TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    key TEXT NOT NULL,
+    output TEXT,
+    inputs TEXT NOT NULL,
+    call_site TEXT,
+    error_class TEXT NOT NULL,
+    message TEXT,
+    attempts INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    first_failed_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (generator, stage, key)
+);
+"""
+
+
+class GenerationFailure(Exception):
+    """A generation unit that could not be produced: API retries ran out or the response was unusable"""
+
+    def __init__(self, call_site, error_class, message, attempts=1):
+        super().__init__(f"{call_site}: {error_class}: {message}")
+        self.call_site = call_site
+        self.error_class = error_class
+        self.message = message
+        self.attempts = attempts
+
+
+class FailureLedger:
+    """Failed generation units in SQLite, so a later run can retry just those.
+
+    A unit is one scenario's variations or one variation's optimal response. Each entry keeps the
+    unit's inputs, the output file its records belong in, the last error class and the API attempts
+    spent on it across runs. A unit that later succeeds is marked resolved instead of deleted.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_failure_ledger()
+        self.recorded = 0
+        self._conn = None
+
+    @property
+    def conn(self):
+        # Opened on first use so a run without failures never creates the database
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def record(self, generator, stage, key, inputs, output, failure):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                """INSERT INTO failures (generator, stage, key, output, inputs, call_site, error_class, message, attempts, failures, status, first_failed_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 'failed', ?, ?)
+                   ON CONFLICT (generator, stage, key) DO UPDATE SET
+                       output = excluded.output, inputs = excluded.inputs, call_site = excluded.call_site,
+                       error_class = excluded.error_class, message = excluded.message,
+                       attempts = attempts + excluded.attempts, failures = failures + 1,
+                       status = 'failed', updated_at = excluded.updated_at""",
+                (generator, stage, key, output, json.dumps(inputs), failure.call_site, failure.error_class,
+                 failure.message, failure.attempts, now, now)
+            )
+        self.recorded += 1
+        print(f"Recorded failed {stage} unit in {self.path}: {failure.error_class} after {failure.attempts} attempt(s)")
+
+    @property
+    def exists(self):
+        return self._conn is not None or os.path.exists(self.path)
+
+    def resolve(self, generator, stage, key):
+        """Mark a unit that has now succeeded as resolved, in a retry or in any later run"""
+        # Without a database nothing ever failed, and resolving must not create one
+        if not self.exists:
+            return
+        with self.conn:
+            self.conn.execute(
+                "UPDATE failures SET status = 'resolved', updated_at = ? WHERE generator = ? AND stage = ? AND key = ? AND status = 'failed'",
+                (time.time(), generator, stage, key)
+            )
+
+    def supersede(self, generator, stage, key_prefix, before):
+        """Resolve failed units under key_prefix recorded before `before`, whose scenario has since been regenerated"""
+        if not self.exists:
+            return
+        with self.conn:
+            self.conn.execute(
+                "UPDATE failures SET status = 'resolved', updated_at = ? "
+                "WHERE generator = ? AND stage = ? AND substr(key, 1, ?) = ? AND updated_at < ? AND status = 'failed'",
+                (time.time(), generator, stage, len(key_prefix), key_prefix, before)
+            )
+
+    def pending(self, generator=None, stage=None):
+        """Unresolved units, oldest first, as dicts with their decoded inputs"""
+        query = "SELECT generator, stage, key, output, inputs, error_class, attempts, failures FROM failures WHERE status = 'failed'"
+        params = []
+        if generator:
+            query += " AND generator = ?"
+            params.append(generator)
+        if stage:
+            query += " AND stage = ?"
+            params.append(stage)
+        rows = self.conn.execute(query + " ORDER BY first_failed_at", params).fetchall()
+        return [
+            {"generator": g, "stage": s, "key": k, "output": o, "inputs": json.loads(i), "error_class": e, "attempts": a, "failures": f}
+            for g, s, k, o, i, e, a, f in rows
+        ]
+
+    def summary(self):
+        rows = self.conn.execute(
+            "SELECT generator, stage, status, error_class, COUNT(*), SUM(attempts) FROM failures "
+            "GROUP BY generator, stage, status, error_class ORDER BY generator, stage, status, error_class"
+        ).fetchall()
+        return [
+            {"generator": g, "stage": s, "status": st, "error_class": e, "units": n, "attempts": a}
+            for g, s, st, e, n, a in rows
+        ]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Show failed generation units')
+    parser.add_argument('--db', type=str, default=default_failure_ledger(), help='Failure ledger database')
+
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        print(f"No failures recorded at {args.db}")
+    else:
+        for entry in FailureLedger(args.db).summary():
+            print(f"{entry['generator']:28s} {entry['stage']:20s} {entry['status']:8s} {entry['error_class']:20s} "
+                  f"units={entry['units']:4d} attempts={entry['attempts']}")
@@ -1,20 +1,22 @@
 import os
 import time
+import shutil
 import json
-import pandas as pd
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 from tqdm import tqdm
-from dotenv import load_dotenv
-from anthropic import Anthropic, APIError, APIStatusError, RateLimitError
-
-# Load environment variables
-load_dotenv()
-
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-# Create data directory if it doesn't exist
-os.makedirs("data", exist_ok=True)
+from anthropic import APIError, APIStatusError, RateLimitError
+from clients import get_client
+from token_budget import create_message
+from dedup import NearDuplicateFilter
+from diversity import DiversityTracker
+from sharding import parse_shard, shard_output_path, scenario_key
+from scenario_stream import iter_scenarios, processed_scenario_keys, append_records, count_rows
+from failure_ledger import FailureLedger, GenerationFailure, default_failure_ledger
+from spend_governor import SpendGovernor, BudgetExceeded, parse_stage_limit
+from json_stream import ArrayObjectParser
+import token_budget
 
 # Define personas with varying levels of EQ
 personas = [
@@ -29,7 +31,20 @@ personas = [
 # Map persona names to their full descriptions
 persona_map = {p.split(':')[0]: p for p in personas}
 
-def generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations=10):
+# Name of this generator in the failure ledger
+GENERATOR = "generate_eq_training_data"
+
+def covered_variations_section(covered):
+    """Prompt section listing variations generated in earlier rounds, so new rounds explore elsewhere"""
+    if not covered:
+        return ""
+    lines = "\n".join(f"- {v.get('variation_description', '')}: {v.get('current_emotional_state', '')}" for v in covered)
+    return f"""
+ALREADY COVERED (earlier variations for this scenario - do NOT repeat these stages or emotional states):
+{lines}
+"""
+
+def generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations=10, covered=None):
     return f"""Based on the following scenario and conversation requirements, generate {num_variations} DIVERSE conversation history variations:
 
 SCENARIO:
@@ -37,7 +52,7 @@ SCENARIO:
 
 CONVERSATION NEEDED:
 {conversation_needed}
-
+{covered_variations_section(covered)}
 Generate {num_variations} different conversation histories that represent DIVERSE points in the conversation with DIFFERENT emotional states and conversation points. Each variation should be at a different stage with different emotional dynamics.
 
 For each variation, provide:
@@ -137,8 +152,14 @@ def extract_json_from_response(response_text):
         print(f"Failed to parse JSON from response: {e}")
         return None
 
-def api_call(prompt, system_message, attempt=1, max_attempts=3):
-    """Make an API call with retry logic."""
+def api_call(prompt, system_message, attempt=1, max_attempts=3, call_site="generator", default_max_tokens=4000, stream_to=None):
+    """Make an API call with retry logic and a learned max_tokens budget for the call site.
+
+    With stream_to, the response is streamed: stream_to() is called once per attempt and returns
+    the callback that receives that attempt's text deltas, or raises GenerationFailure to give up
+    instead of retrying. Raises GenerationFailure once the
+    retries are exhausted or on a non-retryable error.
+    """
     print(f"\n--- Prompt Preview (first 200 chars) ---")
     print(prompt[:200] + "..." if len(prompt) > 200 else prompt)
     print("--- End Prompt ---\n")
@@ -146,26 +167,37 @@ def api_call(prompt, system_message, attempt=1, max_attempts=3):
     print(f"Making API call (attempt {attempt}/{max_attempts})")
     
     try:
-        response = client.messages.create(
+        response = create_message(
+            get_client(),
+            call_site,
+            default_max_tokens=default_max_tokens,
             model="claude-3-5-sonnet-20240620",
-            max_tokens=4000,  # Increased for multiple variations
             temperature=0.8,  # Slightly increased for diversity
             system=system_message,
             messages=[
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            on_text=stream_to() if stream_to else None
         )
         
         return response.content[0].text
         
+    except BudgetExceeded:
+        # Out of budget is not a failure of this unit; the run stops
+        raise
+        
+    except GenerationFailure:
+        # Raised by stream_to to stop retrying
+        raise
+        
     except RateLimitError as e:
         print(f"Rate limit error: {e}")
         if attempt < max_attempts:
             wait_time = min(2 ** attempt * 5, 60)  # Exponential backoff
             print(f"Waiting {wait_time} seconds before retry...")
             time.sleep(wait_time)
-            return api_call(prompt, system_message, attempt+1, max_attempts)
-        return None
+            return api_call(prompt, system_message, attempt+1, max_attempts, call_site, default_max_tokens, stream_to)
+        raise GenerationFailure(call_site, type(e).__name__, str(e), attempt)
         
     except APIStatusError as e:
         if e.status_code == 529:  # Overloaded
@@ -174,179 +206,498 @@ def api_call(prompt, system_message, attempt=1, max_attempts=3):
                 wait_time = min(2 ** attempt * 10, 120)  # Longer exponential backoff
                 print(f"Waiting {wait_time} seconds before retry...")
                 time.sleep(wait_time)
-                return api_call(prompt, system_message, attempt+1, max_attempts)
+                return api_call(prompt, system_message, attempt+1, max_attempts, call_site, default_max_tokens, stream_to)
         else:
             print(f"API error: {e}")
-        return None
+        raise GenerationFailure(call_site, type(e).__name__, str(e), attempt)
         
     except Exception as e:
         print(f"Error making API call: {e}")
-        return None
+        raise GenerationFailure(call_site, type(e).__name__, str(e), attempt)
+
+def valid_variation(variation):
+    required_keys = ["conversation_objective", "conversation_history", "current_emotional_state", "conversation_point", "variation_description"]
+    return isinstance(variation, dict) and all(k in variation for k in required_keys)
 
-def generate_diverse_conversation_histories(scenario, conversation_needed, num_variations=10):
-    """Generate multiple diverse conversation histories for a scenario."""
-    prompt = generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations)
+def generate_diverse_conversation_histories(scenario, conversation_needed, num_variations=10, covered=None, on_variation=None):
+    """Generate multiple diverse conversation histories for a scenario; raises GenerationFailure if none are usable.
+
+    With on_variation the response is streamed and parsed incrementally, and each valid variation is
+    passed to on_variation as soon as its JSON object is complete, before the rest of the array arrives.
+    A stream that breaks off after delivering variations is not retried, since a retry would stream a
+    second, different set; GenerationFailure is raised and the caller keeps what it already has.
+    """
+    prompt = generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations, covered)
     
     system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate diverse and realistic conversation histories and emotional states for challenging scenarios. Each variation should be truly different in terms of emotional dynamics and conversation progress. IMPORTANT: Your response must be valid JSON that can be parsed directly."
     
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
+    stream_to = None
+    if on_variation:
+        streamed = []
+        def stream_to():
+            if streamed:
+                raise GenerationFailure("generator.variations", "StreamInterrupted",
+                                        f"stream broke off after {len(streamed)} variations", attempts=0)
+            # A fresh parser for every attempt, since a retry streams a new array
+            parser = ArrayObjectParser()
+            def on_text(text):
+                for variation in parser.feed(text):
+                    if valid_variation(variation):
+                        streamed.append(variation)
+                        on_variation(variation)
+            return on_text
     
-    data = extract_json_from_response(response_text)
+    response_text = api_call(prompt, system_message, call_site="generator.variations", stream_to=stream_to)
+    data = extract_json_from_response(response_text) if response_text else None
     
     if isinstance(data, list) and len(data) > 0:
-        required_keys = ["conversation_objective", "conversation_history", "current_emotional_state", "conversation_point", "variation_description"]
-        valid_variations = [v for v in data if all(k in v for k in required_keys)]
+        valid_variations = [v for v in data if valid_variation(v)]
         
         if valid_variations:
             print(f"Successfully generated {len(valid_variations)} conversation history variations")
             return valid_variations
     
     print("Failed to extract valid conversation history variations")
-    return None
+    error_class = "InvalidJSON" if data is None else "InvalidResponse"
+    raise GenerationFailure("generator.variations", error_class, "no valid conversation history variations in the response")
+
+def generate_adaptive_variations(scenario, conversation_needed, max_variations=10, round_size=4, dedup=None, min_novelty=0.3):
+    """Request variations in small rounds until the scenario stops producing new material."""
+    tracker = DiversityTracker(min_novelty=min_novelty)
+    collected = []
+    
+    while len(collected) < max_variations:
+        num_variations = min(round_size, max_variations - len(collected))
+        print(f"Adaptive round {len(tracker.rounds)+1}: requesting {num_variations} variations ({len(collected)} so far)")
+        try:
+            round_variations = generate_diverse_conversation_histories(scenario, conversation_needed, num_variations, covered=collected)
+        except GenerationFailure:
+            # Only a scenario without any variations counts as failed
+            if not collected:
+                raise
+            print("Adaptive round failed, keeping the variations collected so far")
+            break
+        if dedup:
+            round_variations = dedup.filter(round_variations, group=scenario)
+        
+        gain = tracker.update(round_variations)
+        collected.extend(round_variations)
+        print(f"Round added {gain['variations']} variations, novelty {gain['novelty']:.2f}, "
+              f"new emotions {gain['new_emotions']}, new history lengths {gain['new_histories']}")
+        if tracker.saturated(gain):
+            print("Variation diversity saturated for this scenario")
+            break
+    
+    # Keep variation ids unique across rounds
+    for i, variation in enumerate(collected, start=1):
+        variation["variation_id"] = i
+    
+    print(f"Adaptive mode kept {len(collected)} variations: {tracker.summary()}")
+    return collected or None
 
 def generate_optimal_response(scenario, conversation_data, persona_desc):
-    """Generate the optimal next response based on scenario, conversation history, and persona."""
+    """Generate the optimal next response based on scenario, conversation history, and persona; raises GenerationFailure if unusable."""
     prompt = generate_optimal_response_prompt(scenario, conversation_data, persona_desc)
     
     system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate optimal responses that demonstrate emotional intelligence and help achieve conversation objectives. IMPORTANT: Your response must be valid JSON that can be parsed directly."
     
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
-    
-    data = extract_json_from_response(response_text)
+    response_text = api_call(prompt, system_message, call_site="generator.optimal_response")
+    data = extract_json_from_response(response_text) if response_text else None
     
     if data and all(k in data for k in ["optimal_response", "reasoning"]):
         print("Successfully generated optimal response")
         return data
     else:
         print("Failed to extract valid optimal response data")
-        return None
+        raise GenerationFailure("generator.optimal_response", "InvalidJSON" if data is None else "InvalidResponse",
+                                "no optimal_response and reasoning in the response")
+
+def variation_key(scenario, conversation_needed, variation):
+    """Failure ledger key of one variation's optimal response"""
+    digest = hashlib.sha1(json.dumps(variation, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{scenario_key(scenario, conversation_needed)}:{digest}"
+
+def generate_scenario_variations(scenario, conversation_needed, variations_per_scenario=10, adaptive=False, round_size=4, dedup=None, min_novelty=0.3):
+    """Conversation variations for one scenario, near-duplicates removed; raises GenerationFailure if none could be generated."""
+    if adaptive:
+        # Request variations in rounds while they keep adding diversity, up to variations_per_scenario
+        return generate_adaptive_variations(
+            scenario,
+            conversation_needed,
+            max_variations=variations_per_scenario,
+            round_size=round_size,
+            dedup=dedup,
+            min_novelty=min_novelty
+        )
+    
+    # Generate diverse conversation histories
+    conversation_variations = generate_diverse_conversation_histories(
+        scenario, 
+        conversation_needed,
+        num_variations=variations_per_scenario
+    )
+    
+    if dedup:
+        conversation_variations = dedup.filter(conversation_variations, group=scenario)
+    return conversation_variations
+
+def variation_record(scenario, conversation_needed, variation, response_data):
+    # Combine all data - REMOVED persona and eq_skills_demonstrated
+    return {
+        "scenario": scenario,
+        "conversation_needed": conversation_needed,
+        "variation_id": variation.get("variation_id", 0),
+        "variation_description": variation.get("variation_description", "Unknown variation"),
+        "conversation_objective": variation["conversation_objective"],
+        "conversation_history": variation["conversation_history"],
+        "current_emotional_state": variation["current_emotional_state"],
+        "conversation_point": variation["conversation_point"],
+        "optimal_response": response_data["optimal_response"],
+        "reasoning": response_data["reasoning"]
+    }
+
+def record_response_failure(scenario, conversation_needed, persona, variation, ledger, ledger_output, failure):
+    inputs = {"scenario": scenario, "conversation_needed": conversation_needed, "persona": persona, "variation": variation}
+    ledger.record(GENERATOR, "optimal_response", variation_key(scenario, conversation_needed, variation), inputs, ledger_output, failure)
 
-def process_scenarios_with_variations(input_file, output_file=None, persona_to_process=None, max_scenarios=None, variations_per_scenario=10, resume_from=None):
-    """Process existing scenarios to generate multiple conversation variations and optimal responses."""
-    # Read the existing scenarios
-    df = pd.read_csv(input_file)
-    print(f"Loaded {len(df)} scenarios from {input_file}")
+def budget_failure(error):
+    # The scenario already has records, so --resume would skip it; its unanswered variations go to the ledger for --retry-failed
+    return GenerationFailure("generator.optimal_response", "BudgetExceeded", str(error), attempts=0)
+
+def generate_variation_records(scenario, conversation_needed, persona, variations, progress_file, ledger, ledger_output, records=None):
+    """Optimal responses for a scenario's variations as training records.
+
+    Each record is appended to progress_file as soon as it is generated; variations whose response
+    fails are recorded in the ledger under ledger_output, the file their records belong in, and ones
+    that succeed are resolved there in case an earlier run recorded them. When the
+    spend budget runs out, the remaining variations are recorded too and BudgetExceeded is re-raised.
+    Records are added to `records` when given, so the ones generated before such a stop are kept.
+    """
+    persona_desc = persona_map.get(persona, persona)
+    records = [] if records is None else records
+    for i, variation in enumerate(tqdm(variations, desc="Processing variations")):
+        try:
+            # Generate optimal response for this variation
+            response_data = generate_optimal_response(scenario, variation, persona_desc)
+        except GenerationFailure as e:
+            record_response_failure(scenario, conversation_needed, persona, variation, ledger, ledger_output, e)
+        except BudgetExceeded as e:
+            for remaining in variations[i:]:
+                record_response_failure(scenario, conversation_needed, persona, remaining, ledger, ledger_output, budget_failure(e))
+            raise
+        else:
+            combined_data = variation_record(scenario, conversation_needed, variation, response_data)
+            records.append(combined_data)
+            
+            # Save progress after each variation
+            append_records(progress_file, [combined_data])
+            ledger.resolve(GENERATOR, "optimal_response", variation_key(scenario, conversation_needed, variation))
+            print(f"Progress saved to {progress_file}")
+        
+        # Small pause between variations to be nice to the API
+        time.sleep(3)
+    return records
+
+def stream_variation_records(scenario, conversation_needed, persona, variations_per_scenario, progress_file, ledger, ledger_output, records=None, dedup=None, workers=4):
+    """Variations and their optimal responses for one scenario, with the two stages overlapped.
+
+    The variations call is streamed and parsed incrementally; each variation is handed to a pool of
+    response workers as soon as its JSON object is complete, so most responses are done by the time
+    the array ends. Records are written in variation order with the same ledger and budget handling
+    as generate_variation_records. Raises GenerationFailure if no usable variation arrives.
+    """
+    persona_desc = persona_map.get(persona, persona)
+    records = [] if records is None else records
+    seen = []
+    submitted = []
+    budget_stop = None
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="optimal-response")
+    
+    def submit(variation):
+        # The model may return more variations than asked for; only the first variations_per_scenario are answered
+        if variation in seen or len(submitted) >= variations_per_scenario:
+            return
+        seen.append(variation)
+        if dedup and not dedup.add(variation, group=scenario):
+            return
+        print(f"Variation {len(submitted) + 1} streamed, generating its optimal response")
+        submitted.append((variation, pool.submit(generate_optimal_response, scenario, variation, persona_desc)))
     
-    # If a specific persona is requested, filter for it
-    if persona_to_process:
-        df = df[df["persona"] == persona_to_process]
-        print(f"Filtered to {len(df)} scenarios for persona {persona_to_process}")
+    try:
+        try:
+            variations = generate_diverse_conversation_histories(scenario, conversation_needed, variations_per_scenario, on_variation=submit)
+        except (GenerationFailure, BudgetExceeded) as e:
+            # Variations that streamed out complete are usable even if the whole array is not
+            if not submitted:
+                raise
+            print(f"Variations call failed after {len(submitted)} variations, keeping those: {e}")
+            if isinstance(e, BudgetExceeded):
+                budget_stop = e
+            variations = []
+        # Catch any variation the incremental parser missed
+        for variation in variations:
+            submit(variation)
+        
+        for variation, future in submitted:
+            try:
+                response_data = future.result()
+            except GenerationFailure as e:
+                record_response_failure(scenario, conversation_needed, persona, variation, ledger, ledger_output, e)
+            except BudgetExceeded as e:
+                record_response_failure(scenario, conversation_needed, persona, variation, ledger, ledger_output, budget_failure(e))
+                budget_stop = e
+            else:
+                combined_data = variation_record(scenario, conversation_needed, variation, response_data)
+                records.append(combined_data)
+                append_records(progress_file, [combined_data])
+                ledger.resolve(GENERATOR, "optimal_response", variation_key(scenario, conversation_needed, variation))
+        print(f"Progress saved to {progress_file}")
+    finally:
+        pool.shutdown(wait=True)
     
-    # If max_scenarios is specified, limit the number of scenarios
-    if max_scenarios and max_scenarios < len(df):
-        df = df.sample(max_scenarios, random_state=42)
-        print(f"Sampled {len(df)} scenarios")
+    if budget_stop:
+        raise budget_stop
+    return records
+
+def process_scenarios_with_variations(input_file, output_file=None, persona_to_process=None, max_scenarios=None, variations_per_scenario=10, resume_from=None, dedup_threshold=0.8, adaptive=False, round_size=4, min_novelty=0.3, shard=None, ledger=None, governor=None, stream=False, response_workers=4):
+    """Process existing scenarios to generate multiple conversation variations and optimal responses.
+
+    Scenarios are streamed from input_file chunk by chunk, so the input can be larger than memory;
+    records are appended to the progress file as they are generated. Returns the records generated in this run.
+    Scenarios and variations that fail are recorded in the failure ledger for retry_failed_units.
+    A scenario that succeeds resolves its ledger entries from earlier runs, so a later
+    --retry-failed does not generate it a second time.
+
+    With a SpendGovernor every API call is metered against its limits. The run stops between
+    scenarios once the next one would not fit the budget at the average spend so far (or as soon as
+    a limit is hit mid-scenario); the progress file can then be passed to resume_from.
+
+    With stream, each scenario's variations call is streamed and its variations are answered by
+    response_workers threads while the rest of the array is still being generated (not in adaptive mode).
+    """
+    # iter_scenarios keeps only this shard's scenarios; each shard writes its own output file
+    if shard:
+        print(f"Processing shard {shard[0]}/{shard[1]}")
+        if output_file:
+            output_file = shard_output_path(output_file, shard)
     
     # Create a list to store the processed data
     processed_data = []
     
-    # If resuming from a previous run, load existing data
+    # Create data directory if it doesn't exist
+    os.makedirs("data", exist_ok=True)
+    
+    # Name the final output up front so failed units can record where their records belong
+    if not output_file:
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        final_output_file = shard_output_path(f"data/eq_training_data_diverse_{timestamp}.csv", shard)
+    else:
+        final_output_file = output_file
+    ledger = ledger or FailureLedger()
+    if governor is not None:
+        token_budget.default_governor = governor
+        planned = count_rows(input_file)
+        if max_scenarios:
+            planned = min(planned, max_scenarios)
+    
+    # Create a temporary file to save progress
+    temp_output_file = output_file or shard_output_path(f"data/eq_training_data_diverse_temp_{time.strftime('%Y%m%d-%H%M%S')}.csv", shard)
+    
+    # Start a fresh progress file unless it is the one being resumed
+    resuming_in_place = bool(resume_from) and os.path.abspath(resume_from) == os.path.abspath(temp_output_file)
+    if os.path.exists(temp_output_file) and not resuming_in_place:
+        os.remove(temp_output_file)
+    
+    # If resuming from a previous run, skip the scenarios it already covered and carry its records over
+    processed_scenarios = None
     if resume_from and os.path.exists(resume_from):
         try:
-            existing_df = pd.read_csv(resume_from)
-            processed_data = existing_df.to_dict('records')
-            print(f"Loaded {len(processed_data)} existing samples from {resume_from}")
-            
-            # Get the scenarios we've already processed
-            processed_scenarios = set()
-            for item in processed_data:
-                scenario_key = f"{item['persona']}_{item['scenario'][:50]}"
-                processed_scenarios.add(scenario_key)
-            
-            # Filter out scenarios we've already processed
-            df_filtered = []
-            for _, row in df.iterrows():
-                scenario_key = f"{row['persona']}_{row['scenario'][:50]}"
-                if scenario_key not in processed_scenarios:
-                    df_filtered.append(row)
-            
-            if df_filtered:
-                df = pd.DataFrame(df_filtered)
-                print(f"Filtered to {len(df)} unprocessed scenarios")
-            else:
-                print("All scenarios have been processed already")
-                return processed_data
-                
+            processed_scenarios = processed_scenario_keys(resume_from)
+            print(f"Loaded {len(processed_scenarios)} processed scenarios from {resume_from}")
+            if not resuming_in_place:
+                shutil.copyfile(resume_from, temp_output_file)
         except Exception as e:
             print(f"Error loading existing data: {e}")
             print("Starting from scratch")
+            processed_scenarios = None
     
-    # Create a temporary file to save progress
-    temp_output_file = output_file or f"data/eq_training_data_diverse_temp_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    scenarios = iter_scenarios(
+        input_file,
+        persona=persona_to_process,
+        max_scenarios=max_scenarios,
+        shard=shard,
+        skip_keys=processed_scenarios
+    )
+    
+    # Drop near-duplicate variations before paying for their optimal responses
+    dedup = NearDuplicateFilter(threshold=dedup_threshold) if dedup_threshold else None
+    
+    if stream and adaptive:
+        print("Streaming is not used in adaptive mode, whose rounds depend on each other")
+        stream = False
     
     # Process each scenario
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing scenarios"):
+    scenarios_processed = 0
+    budget_stop = None
+    for row in tqdm(scenarios, desc="Processing scenarios"):
         scenario = row["scenario"]
         conversation_needed = row["conversation_needed"]
         persona = row.get("persona", "Unknown")  # Use "Unknown" if persona is not in the data
         
-        print(f"\nProcessing scenario {idx+1}/{len(df)} for persona {persona}")
+        # Stop between scenarios rather than run out of budget halfway through one
+        if governor is not None and not governor.can_afford(scenarios_processed):
+            budget_stop = f"the next scenario would exceed the budget (remaining {governor.remaining()})"
+            break
+        scenarios_processed += 1
         
-        # Get the full persona description
-        persona_desc = persona_map.get(persona, persona)
+        print(f"\nProcessing scenario {scenarios_processed} for persona {persona}")
+        key = scenario_key(scenario, conversation_needed)
+        scenario_start = time.time()
+        records_before = len(processed_data)
         
-        # Generate diverse conversation histories
-        conversation_variations = generate_diverse_conversation_histories(
-            scenario, 
-            conversation_needed,
-            num_variations=variations_per_scenario
-        )
+        try:
+            try:
+                if stream:
+                    # Variations are streamed straight into the response stage
+                    stream_variation_records(scenario, conversation_needed, persona, variations_per_scenario, temp_output_file, ledger,
+                                             final_output_file, records=processed_data, dedup=dedup, workers=response_workers)
+                    conversation_variations = None
+                else:
+                    conversation_variations = generate_scenario_variations(
+                        scenario,
+                        conversation_needed,
+                        variations_per_scenario=variations_per_scenario,
+                        adaptive=adaptive,
+                        round_size=round_size,
+                        dedup=dedup,
+                        min_novelty=min_novelty
+                    )
+            except GenerationFailure as e:
+                inputs = {"scenario": scenario, "conversation_needed": conversation_needed, "persona": persona, "variations_per_scenario": variations_per_scenario}
+                ledger.record(GENERATOR, "variations", key, inputs, final_output_file, e)
+                conversation_variations = None
+            else:
+                ledger.resolve(GENERATOR, "variations", key)
+            
+            if conversation_variations:
+                generate_variation_records(scenario, conversation_needed, persona, conversation_variations, temp_output_file, ledger, final_output_file, records=processed_data)
+            if len(processed_data) > records_before:
+                # Regenerated variations replace any an earlier run failed to answer for this scenario
+                ledger.supersede(GENERATOR, "optimal_response", f"{key}:", scenario_start)
+            print(f"{len(processed_data)} new samples so far")
+        except BudgetExceeded as e:
+            budget_stop = str(e)
+            break
+        
+        if governor is not None:
+            projected = governor.projection(scenarios_processed, planned)
+            print(f"Spent ${governor.totals['cost']:.2f} ({governor.totals['tokens']} tokens, {governor.totals['calls']} calls); "
+                  f"projected ${projected['cost']:.2f} and {projected['tokens']:.0f} tokens for up to {planned} scenarios")
         
+        # Streaming runs are paced by --tokens_per_minute instead of fixed pauses
         if conversation_variations:
-            # Process each variation
-            for variation in tqdm(conversation_variations, desc="Processing variations"):
-                # Generate optimal response for this variation
-                response_data = generate_optimal_response(scenario, variation, persona_desc)
-                
-                if response_data:
-                    # Combine all data - REMOVED persona and eq_skills_demonstrated
-                    combined_data = {
-                        "scenario": scenario,
-                        "conversation_needed": conversation_needed,
-                        "variation_id": variation.get("variation_id", 0),
-                        "variation_description": variation.get("variation_description", "Unknown variation"),
-                        "conversation_objective": variation["conversation_objective"],
-                        "conversation_history": variation["conversation_history"],
-                        "current_emotional_state": variation["current_emotional_state"],
-                        "conversation_point": variation["conversation_point"],
-                        "optimal_response": response_data["optimal_response"],
-                        "reasoning": response_data["reasoning"]
-                    }
-                    
-                    processed_data.append(combined_data)
-                    
-                    # Save progress after each variation
-                    temp_df = pd.DataFrame(processed_data)
-                    temp_df.to_csv(temp_output_file, index=False)
-                    print(f"Progress saved to {temp_output_file} ({len(processed_data)} samples)")
-                
-                # Small pause between variations to be nice to the API
-                time.sleep(3)
-            
             # Longer pause between scenarios
             wait_time = 10
             print(f"Waiting {wait_time} seconds before next scenario...")
             time.sleep(wait_time)
     
-    # Generate final output filename if not provided
-    if not output_file:
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        output_file = f"data/eq_training_data_diverse_{timestamp}.csv"
+    if budget_stop:
+        print(f"\nStopping early: {budget_stop}")
+        print(f"Progress is in {temp_output_file}; continue with --resume {temp_output_file} once the budget allows "
+              f"(and --retry-failed for any variations the interrupted scenario left in {ledger.path})")
+    
+    output_file = final_output_file
     
-    # Save to CSV
+    # The progress file already holds every record; copy it when the final name differs
     if processed_data:
-        final_df = pd.DataFrame(processed_data)
-        final_df.to_csv(output_file, index=False)
-        print(f"\nProcessed {len(processed_data)} total samples across {len(df)} scenarios and saved to {output_file}")
+        if os.path.abspath(output_file) != os.path.abspath(temp_output_file):
+            shutil.copyfile(temp_output_file, output_file)
+        print(f"\nProcessed {len(processed_data)} new samples across {scenarios_processed} scenarios and saved to {output_file}")
+    elif processed_scenarios is not None and not scenarios_processed:
+        print("All scenarios have been processed already")
     else:
         print("No data was processed successfully.")
     
+    if ledger.recorded:
+        print(f"{ledger.recorded} units failed and were recorded in {ledger.path}; rerun with --retry-failed to reprocess only those")
+    
+    if dedup:
+        dedup.print_report()
+        if processed_data:
+            report_file = output_file.replace(".csv", "_dedup_report.json")
+            dedup.save_report(report_file)
+            print(f"Dedup report saved to {report_file}")
+    
+    if governor is not None:
+        governor.report(records=len(processed_data))
+    
     return processed_data
 
+def retry_failed_units(ledger=None, output_file=None, dedup_threshold=0.8, adaptive=False, round_size=4, min_novelty=0.3, governor=None):
+    """Reprocess only the units recorded in the failure ledger and merge their records into the existing output.
+
+    A failed scenario is regenerated from its variations onwards, a failed variation only gets its
+    optimal response. Records are appended to the output file each unit was recorded with (or to
+    output_file), and units that succeed are marked resolved. Returns the records generated.
+    With a SpendGovernor the retry stops when a limit is reached, leaving the rest in the ledger.
+    """
+    ledger = ledger or FailureLedger()
+    if governor is not None:
+        token_budget.default_governor = governor
+    units = ledger.pending(GENERATOR) if os.path.exists(ledger.path) else []
+    if not units:
+        print(f"No failed units waiting in {ledger.path}")
+        return []
+    print(f"Retrying {len(units)} failed units from {ledger.path}")
+    
+    dedup = NearDuplicateFilter(threshold=dedup_threshold) if dedup_threshold else None
+    records = []
+    resolved = 0
+    for unit in tqdm(units, desc="Retrying failed units"):
+        inputs = unit["inputs"]
+        scenario = inputs["scenario"]
+        conversation_needed = inputs["conversation_needed"]
+        persona = inputs["persona"]
+        target = output_file or unit["output"]
+        try:
+            try:
+                if unit["stage"] == "variations":
+                    variations = generate_scenario_variations(
+                        scenario,
+                        conversation_needed,
+                        variations_per_scenario=inputs["variations_per_scenario"],
+                        adaptive=adaptive,
+                        round_size=round_size,
+                        dedup=dedup,
+                        min_novelty=min_novelty
+                    )
+                else:
+                    variations = [inputs["variation"]]
+            except GenerationFailure as e:
+                ledger.record(GENERATOR, unit["stage"], unit["key"], inputs, unit["output"], e)
+                continue
+        
+            if unit["stage"] == "variations":
+                ledger.resolve(GENERATOR, unit["stage"], unit["key"])
+                resolved += 1
+                generate_variation_records(scenario, conversation_needed, persona, variations or [], target, ledger, unit["output"], records=records)
+            else:
+                merged = len(records)
+                # Resolves the unit in the ledger when its response succeeds
+                generate_variation_records(scenario, conversation_needed, persona, variations, target, ledger, unit["output"], records=records)
+                if len(records) > merged:
+                    resolved += 1
+        except BudgetExceeded as e:
+            print(f"\nStopping early: {e}")
+            break
+    
+    print(f"\nResolved {resolved} of {len(units)} failed units, {len(records)} records merged; "
+          f"{len(ledger.pending(GENERATOR))} failed units remain in {ledger.path}")
+    if governor is not None:
+        governor.report(records=len(records))
+    return records
+
+
 if __name__ == "__main__":
     # Set up command line arguments
     parser = argparse.ArgumentParser(description='Generate diverse EQ training data from scenarios')
@@ -359,11 +710,39 @@ if __name__ == "__main__":
     parser.add_argument('--max_scenarios', type=int, default=None,
                         help='Maximum number of scenarios to process')
     parser.add_argument('--variations', type=int, default=10,
-                        help='Number of variations to generate per scenario')
+                        help='Number of variations to generate per scenario (the upper limit in adaptive mode)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Request variations in rounds and stop once a scenario stops adding diversity')
+    parser.add_argument('--round_size', type=int, default=4,
+                        help='Variations requested per round in adaptive mode')
+    parser.add_argument('--min_novelty', type=float, default=0.3,
+                        help='Adaptive mode stops when a round adds less than this fraction of new shingles and no new emotion/history coverage')
+    parser.add_argument('--shard', type=str, default=None,
+                        help='Process only shard i/N (0-based) of the scenarios, partitioned by content hash; output files get a shard suffix')
     parser.add_argument('--test', action='store_true',
                         help='Run in test mode (1 scenario, 3 variations)')
     parser.add_argument('--resume', type=str, default=None,
                         help='Resume from a previous run by loading this CSV file')
+    parser.add_argument('--dedup_threshold', type=float, default=0.8,
+                        help='Similarity at which a variation is skipped as a near-duplicate (0 disables the filter)')
+    parser.add_argument('--failure_ledger', type=str, default=default_failure_ledger(),
+                        help='SQLite ledger where failed scenarios and variations are recorded')
+    parser.add_argument('--retry_failed', '--retry-failed', action='store_true',
+                        help='Only reprocess the failed units in the ledger and merge their records into the output they belong to (or --output)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream each variations call and generate optimal responses as variations arrive (not with --adaptive)')
+    parser.add_argument('--response_workers', type=int, default=4,
+                        help='Concurrent optimal response calls per scenario with --stream')
+    parser.add_argument('--budget_tokens', type=int, default=None,
+                        help='Stop the run once this many input+output tokens have been used')
+    parser.add_argument('--budget_calls', type=int, default=None,
+                        help='Stop the run after this many API calls')
+    parser.add_argument('--budget_cost', type=float, default=None,
+                        help='Stop the run once its estimated cost reaches this many USD')
+    parser.add_argument('--stage_budget', type=str, action='append', default=[],
+                        help='Limit for one stage as call_site:kind=value, e.g. generator.optimal_response:cost=5 (repeatable)')
+    parser.add_argument('--tokens_per_minute', type=int, default=None,
+                        help='Throttle calls to keep the trailing minute under this many tokens')
     
     args = parser.parse_args()
     
@@ -375,6 +754,31 @@ if __name__ == "__main__":
         if not args.output:
             args.output = f"data/eq_training_data_TEST_{time.strftime('%Y%m%d-%H%M%S')}.csv"
     
+    ledger = FailureLedger(args.failure_ledger)
+    stage_limits = {}
+    for spec in args.stage_budget:
+        stage, kind, value = parse_stage_limit(spec)
+        stage_limits.setdefault(stage, {})[kind] = value
+    # Spend is always metered so the run reports its cost per record; the limits are optional
+    governor = SpendGovernor(
+        max_tokens=args.budget_tokens,
+        max_calls=args.budget_calls,
+        max_cost=args.budget_cost,
+        stage_limits=stage_limits,
+        tokens_per_minute=args.tokens_per_minute
+    )
+    if args.retry_failed:
+        retry_failed_units(
+            ledger=ledger,
+            output_file=args.output,
+            dedup_threshold=args.dedup_threshold,
+            adaptive=args.adaptive,
+            round_size=args.round_size,
+            min_novelty=args.min_novelty,
+            governor=governor
+        )
+        raise SystemExit
+    
     # Process scenarios with variations
     process_scenarios_with_variations(
         input_file=args.input,
@@ -382,5 +786,14 @@ if __name__ == "__main__":
         persona_to_process=args.persona,
         max_scenarios=args.max_scenarios,
         variations_per_scenario=args.variations,
-        resume_from=args.resume
+        resume_from=args.resume,
+        dedup_threshold=args.dedup_threshold,
+        adaptive=args.adaptive,
+        round_size=args.round_size,
+        min_novelty=args.min_novelty,
+        shard=parse_shard(args.shard),
+        ledger=ledger,
+        governor=governor,
+        stream=args.stream,
+        response_workers=args.response_workers
     ) 
\ No newline at end of file
@@ -1,19 +1,14 @@
 import os
 import time
 import json
+import argparse
+import threading
 import pandas as pd
 from tqdm import tqdm
-from dotenv import load_dotenv
-from anthropic import Anthropic, APIError, APIStatusError, RateLimitError
-
-# Load environment variables
-load_dotenv()
-
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-# Create data directory if it doesn't exist
-os.makedirs("data", exist_ok=True)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from anthropic import APIError, APIStatusError, RateLimitError
+from clients import get_client
+from token_budget import create_message
 
 # Define personas with varying levels of EQ
 personas = [
@@ -53,7 +48,38 @@ Example format:
 }}
 """
 
-def extract_json_from_response(response_text, persona_name, attempt_number):
+def generate_scenario_batch_prompt(persona, num_scenarios, covered=None):
+    covered_section = ""
+    if covered:
+        lines = "\n".join(f"- {c['scenario'][:150]}" for c in covered)
+        covered_section = f"""
+These scenarios already exist for this persona - make the new ones clearly DIFFERENT from them:
+{lines}
+"""
+    return f"""Generate {num_scenarios} DIFFERENT challenging scenarios that would be difficult for someone with the following emotional intelligence profile to navigate:
+
+{persona}
+
+Each scenario should:
+1. Be realistic and specific
+2. Involve interpersonal dynamics
+3. Require emotional intelligence to handle effectively
+4. Be challenging but not impossible for this persona
+5. Have a clear objective that needs to be achieved
+
+Vary the settings (workplace, family, friendships, community, customers...), the relationships and the emotional challenges across the scenarios.
+{covered_section}
+Format your response as a JSON array with {num_scenarios} objects, each with these fields:
+- scenario: A detailed description of the situation
+- conversation_needed: A description of the conversation required to address the issue, including:
+  * The specific objective/goal that needs to be achieved
+  * The emotional challenges that make this conversation difficult
+  * The key emotional intelligence skills needed to navigate it successfully
+
+IMPORTANT: Your entire response must be a valid JSON array that can be parsed. Do not include any text before or after the JSON.
+"""
+
+def extract_json_from_response(response_text, persona_name, attempt_number, expect_array=False):
     """Extract JSON from the response text, handling potential formatting issues."""
     # Print the first 200 characters of the response for debugging
     print(f"\n--- Response Preview (first 200 chars) ---")
@@ -66,8 +92,9 @@ def extract_json_from_response(response_text, persona_name, attempt_number):
             return json.loads(response_text)
         except json.JSONDecodeError:
             # If that fails, try to find JSON in the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
+            open_char, close_char = ('[', ']') if expect_array else ('{', '}')
+            start_idx = response_text.find(open_char)
+            end_idx = response_text.rfind(close_char) + 1
             
             if start_idx >= 0 and end_idx > start_idx:
                 json_str = response_text[start_idx:end_idx]
@@ -93,7 +120,7 @@ def generate_scenario(persona, attempt=1, max_attempts=3):
     print(f"\nGenerating scenario for {persona_name} (attempt {attempt}/{max_attempts})")
     
     try:
-        response = client.messages.create(
+        response = get_client().messages.create(
             model="claude-3-5-sonnet-20240620",
             max_tokens=1000,
             temperature=0.7,
@@ -145,21 +172,139 @@ def generate_scenario(persona, attempt=1, max_attempts=3):
         print(f"Error generating scenario: {e}")
         return None
 
-def main():
+def valid_scenario(item):
+    """A batch item is usable when both fields are non-empty strings"""
+    return (isinstance(item, dict)
+            and all(isinstance(item.get(k), str) and item[k].strip() for k in ("scenario", "conversation_needed")))
+
+def request_scenario_batch(persona, num_scenarios, covered=None, attempt=1, max_attempts=3):
+    """Request several scenarios for a persona in one structured call. Returns the parsed items or None."""
+    persona_name = persona.split(':')[0]
+    prompt = generate_scenario_batch_prompt(persona, num_scenarios, covered)
+    
+    print(f"\nRequesting {num_scenarios} scenarios for {persona_name} (attempt {attempt}/{max_attempts})")
+    
+    try:
+        response = create_message(
+            get_client(),
+            "scenarios.batch",
+            default_max_tokens=min(600 * num_scenarios, 8000),
+            model="claude-3-5-sonnet-20240620",
+            temperature=0.9,
+            system="You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate realistic, challenging scenarios that test emotional intelligence. Each scenario must have a clear objective that requires specific EQ skills to achieve. The conversation needed should outline the goal, challenges, and required skills. IMPORTANT: Your response must be valid JSON that can be parsed directly.",
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        
+        data = extract_json_from_response(response.content[0].text, persona_name, attempt, expect_array=True)
+        if isinstance(data, dict):
+            data = [data]
+        return data if isinstance(data, list) else None
+            
+    except RateLimitError as e:
+        print(f"Rate limit error: {e}")
+        if attempt < max_attempts:
+            wait_time = min(2 ** attempt * 5, 60)  # Exponential backoff
+            print(f"Waiting {wait_time} seconds before retry...")
+            time.sleep(wait_time)
+            return request_scenario_batch(persona, num_scenarios, covered, attempt+1, max_attempts)
+        return None
+        
+    except APIStatusError as e:
+        if e.status_code == 529:  # Overloaded
+            print(f"API overloaded. Waiting before retry...")
+            if attempt < max_attempts:
+                wait_time = min(2 ** attempt * 10, 120)  # Longer exponential backoff
+                print(f"Waiting {wait_time} seconds before retry...")
+                time.sleep(wait_time)
+                return request_scenario_batch(persona, num_scenarios, covered, attempt+1, max_attempts)
+        else:
+            print(f"API error: {e}")
+        return None
+        
+    except Exception as e:
+        print(f"Error generating scenarios: {e}")
+        return None
+
+def generate_scenarios_for_persona(persona, count, batch_size=10, max_rounds=None):
+    """Generate count scenarios for a persona in batches, re-requesting only the items that were missing or invalid."""
+    persona_name = persona.split(':')[0]
+    scenarios = []
+    max_rounds = max_rounds or 2 * -(-count // batch_size) + 1
+    
+    for _ in range(max_rounds):
+        missing = count - len(scenarios)
+        if missing <= 0:
+            break
+        # Show the most recent scenarios so new ones differ, without letting the prompt grow unbounded
+        items = request_scenario_batch(persona, min(batch_size, missing), covered=scenarios[-30:]) or []
+        valid = [item for item in items if valid_scenario(item)]
+        if len(valid) < len(items):
+            print(f"Dropped {len(items) - len(valid)} invalid scenarios for {persona_name}")
+        scenarios.extend({"scenario": item["scenario"], "conversation_needed": item["conversation_needed"]} for item in valid[:missing])
+        print(f"{persona_name}: {len(scenarios)}/{count} scenarios")
+    
+    for data in scenarios:
+        data["persona"] = persona_name
+    if len(scenarios) < count:
+        print(f"Only generated {len(scenarios)}/{count} scenarios for {persona_name}")
+    return scenarios
+
+def main_batched(per_persona=2, batch_size=10, workers=6):
+    """Generate scenarios K at a time per persona, with personas processed concurrently."""
+    all_scenarios = []
+    lock = threading.Lock()
+    os.makedirs("data", exist_ok=True)
+    temp_df_path = "data/temp_scenarios.csv"
+    
+    print(f"Generating {per_persona} scenarios for each of {len(personas)} personas in batches of {batch_size} ({workers} workers)...")
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(generate_scenarios_for_persona, persona, per_persona, batch_size): persona for persona in personas}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Personas"):
+            persona_scenarios = future.result()
+            with lock:
+                all_scenarios.extend(persona_scenarios)
+                # Save progress after each persona
+                pd.DataFrame(all_scenarios).to_csv(temp_df_path, index=False)
+            print(f"Completed {len(persona_scenarios)} scenarios for {futures[future].split(':')[0]}")
+    
+    save_scenarios(all_scenarios)
+
+def save_scenarios(all_scenarios):
+    # Convert to DataFrame
+    df = pd.DataFrame(all_scenarios)
+    
+    # Save only the required columns
+    output_df = df[["scenario", "conversation_needed"]]
+    
+    # Generate timestamp for filename
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    filename = f"data/eq_scenarios_{timestamp}.csv"
+    
+    # Save to CSV
+    output_df.to_csv(filename, index=False)
+    print(f"\nGenerated {len(all_scenarios)} scenarios and saved to {filename}")
+
+def main(per_persona=2):
     """Main function to generate scenarios for all personas and save to CSV."""
     all_scenarios = []
     
     print(f"Generating scenarios for {len(personas)} personas...")
     
+    # Create data directory if it doesn't exist
+    os.makedirs("data", exist_ok=True)
+    
     # Save any successful scenarios as we go
     temp_df_path = "data/temp_scenarios.csv"
     
     for persona in tqdm(personas, desc="Personas"):
         persona_scenarios = []
         
-        # Generate 2 scenarios per persona (reduced from 3)
-        for i in range(2):
-            print(f"\nGenerating scenario {i+1}/2 for {persona.split(':')[0]}")
+        # Generate per_persona scenarios per persona (2 by default, reduced from 3)
+        for i in range(per_persona):
+            print(f"\nGenerating scenario {i+1}/{per_persona} for {persona.split(':')[0]}")
             data = generate_scenario(persona)
             
             if data:
@@ -180,19 +325,19 @@ def main():
         
         print(f"Completed {len(persona_scenarios)} scenarios for {persona.split(':')[0]}")
     
-    # Convert to DataFrame
-    df = pd.DataFrame(all_scenarios)
-    
-    # Save only the required columns
-    output_df = df[["scenario", "conversation_needed"]]
-    
-    # Generate timestamp for filename
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    filename = f"data/eq_scenarios_{timestamp}.csv"
-    
-    # Save to CSV
-    output_df.to_csv(filename, index=False)
-    print(f"\nGenerated {len(all_scenarios)} scenarios and saved to {filename}")
+    save_scenarios(all_scenarios)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate EQ scenarios for each persona')
+    parser.add_argument('--per_persona', type=int, default=2,
+                        help='Number of scenarios to generate per persona')
+    parser.add_argument('--batch_size', type=int, default=None,
+                        help='Request this many scenarios per API call and run personas concurrently (default: one call per scenario)')
+    parser.add_argument('--workers', type=int, default=6,
+                        help='Personas processed concurrently in batch mode')
+    
+    args = parser.parse_args()
+    if args.batch_size:
+        main_batched(args.per_persona, args.batch_size, args.workers)
+    else:
+        main(args.per_persona) 
\ No newline at end of file
@@ -0,0 +1,206 @@
+import os
+import time
+import queue
+import threading
+from token_budget import percentile
+
+
+class _Attempt(threading.Thread):
+    """One streaming request; reports its first token and completion to the coordinator's queue"""
+
+    def __init__(self, client, request, events, name):
+        super().__init__(daemon=True, name=name)
+        self.client = client
+        self.request = request
+        self.events = events
+        self.started_at = None
+        self.first_token_at = None
+        self.message = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self._stream = None
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        try:
+            with self.client.messages.stream(**self.request) as stream:
+                self._stream = stream
+                for event in stream:
+                    if self.cancelled.is_set():
+                        return
+                    if self.first_token_at is None and event.type == "content_block_delta":
+                        self.first_token_at = time.perf_counter()
+                        self.events.put(("first_token", self))
+                self.message = stream.get_final_message()
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.error = e
+        finally:
+            self.events.put(("done", self))
+
+    def cancel(self):
+        self.cancelled.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                # Closing the HTTP response stops generation on the server side
+                stream.close()
+            except Exception:
+                pass
+
+    @property
+    def ttft(self):
+        return self.first_token_at - self.started_at if self.first_token_at else None
+
+
+class HedgePolicy:
+    """Hedged streaming requests for latency-critical calls.
+
+    The primary request is streamed; if its first token has not arrived within the threshold (the
+    observed p95 time to first token, default_threshold until min_samples are seen), a duplicate is
+    launched and whichever streams first wins while the other is cancelled. At most `budget` of all
+    calls are hedged, which caps the extra spend.
+
+    Hedging only protects the time to first token. The loser is cancelled as soon as the winner
+    streams, so a winner that then fails mid-stream raises its error like an unhedged call would;
+    those failures are counted as "winner_errors" in metrics().
+    """
+
+    def __init__(self, budget=0.1, default_threshold=2.0, min_threshold=0.3, max_threshold=10.0, pct=95, min_samples=20, window=200):
+        self.budget = budget
+        self.default_threshold = default_threshold
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.pct = pct
+        self.min_samples = min_samples
+        self.window = window
+        self.samples = []
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0, "errors": 0, "winner_errors": 0, "latency_saved": 0.0}
+        self.ttfts = []
+        self._lock = threading.Lock()
+
+    def threshold(self):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return self.default_threshold
+            return max(self.min_threshold, min(self.max_threshold, percentile(self.samples, self.pct)))
+
+    def _allow_hedge(self):
+        with self._lock:
+            # One hedge of burst so the first slow call can be hedged
+            if self.stats["hedged"] + 1 <= self.budget * self.stats["calls"] + 1:
+                self.stats["hedged"] += 1
+                return True
+            self.stats["budget_denied"] += 1
+            return False
+
+    def _record_primary(self, ttft):
+        with self._lock:
+            self.samples.append(ttft)
+            del self.samples[:-self.window]
+
+    def _estimated_saving(self, elapsed):
+        """Expected extra wait of an unhedged primary still silent after `elapsed`, from observed first-token times"""
+        with self._lock:
+            slower = [t for t in self.samples if t > elapsed]
+        return sum(slower) / len(slower) - elapsed if slower else 0.0
+
+    def create(self, client, **request):
+        """Drop-in for client.messages.create that hedges slow starts; returns the winning final message"""
+        with self._lock:
+            self.stats["calls"] += 1
+        events = queue.Queue()
+        start = time.perf_counter()
+        primary = _Attempt(client, request, events, "primary")
+        primary.start()
+        attempts = [primary]
+        threshold = self.threshold()
+        can_hedge = True
+        winner = None
+        failed = set()
+
+        while winner is None:
+            timeout = None
+            if can_hedge:
+                timeout = max(0.0, threshold - (time.perf_counter() - start))
+            try:
+                kind, attempt = events.get(timeout=timeout)
+            except queue.Empty:
+                # Over budget the primary is simply awaited like an unhedged call
+                can_hedge = False
+                if self._allow_hedge():
+                    hedge = _Attempt(client, request, events, "hedge")
+                    hedge.start()
+                    attempts.append(hedge)
+                continue
+
+            if kind == "first_token":
+                winner = attempt
+            elif attempt.message is not None:
+                # Finished without streaming a text delta, e.g. an empty reply
+                winner = attempt
+            else:
+                failed.add(attempt)
+                can_hedge = False
+                if len(failed) == len(attempts):
+                    with self._lock:
+                        self.stats["errors"] += 1
+                    raise attempt.error
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+
+        effective_ttft = (winner.first_token_at or time.perf_counter()) - start
+        if primary.ttft is not None:
+            self._record_primary(primary.ttft)
+        elif winner is not primary and primary not in failed:
+            # A primary that lost to its hedge was still silent when cancelled. Its wait so far is a
+            # lower bound on its first-token time; leaving it out would drag the threshold down
+            # and make the policy hedge more and more over time.
+            self._record_primary(time.perf_counter() - (primary.started_at or start))
+        if winner is not primary:
+            saving = self._estimated_saving(effective_ttft)
+            with self._lock:
+                self.stats["hedge_wins"] += 1
+                self.stats["latency_saved"] += saving
+        with self._lock:
+            self.ttfts.append(effective_ttft)
+            del self.ttfts[:-self.window]
+
+        winner.join()
+        if winner.error is not None:
+            with self._lock:
+                self.stats["errors"] += 1
+                if len(attempts) > 1:
+                    # The cancelled attempt may have been healthy; hedging does not cover failures after the first token
+                    self.stats["winner_errors"] += 1
+            raise winner.error
+        return winner.message
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+            ttfts = list(self.ttfts)
+        calls = stats["calls"] or 1
+        stats["hedge_rate"] = round(stats["hedged"] / calls, 4)
+        stats["latency_saved"] = round(stats["latency_saved"], 3)
+        stats["threshold"] = round(self.threshold(), 3)
+        for pct in (50, 95, 99):
+            stats[f"ttft_p{pct}"] = round(percentile(ttfts, pct), 3)
+        return stats
+
+
+_default_policy = None
+_default_lock = threading.Lock()
+
+
+def default_hedge_policy():
+    """Shared policy for the live reply call, enabled with HEDGE_REPLIES=1 (budget from HEDGE_BUDGET)"""
+    global _default_policy
+    if os.getenv("HEDGE_REPLIES", "").lower() not in ("1", "true", "yes"):
+        return None
+    with _default_lock:
+        if _default_policy is None:
+            _default_policy = HedgePolicy(budget=float(os.getenv("HEDGE_BUDGET", "0.1")))
+        return _default_policy
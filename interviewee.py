@@ -0,0 +1,279 @@
+import os
+import re
+import glob
+import argparse
+from clients import get_client
+from token_budget import create_message
+from spend_governor import CACHE_READ_MULTIPLIER, CACHE_WRITE_MULTIPLIER
+
+# Rough characters-per-token ratio for offline prompt size estimates
+CHARS_PER_TOKEN = 4
+# Shorter prefixes are not cached by Sonnet models
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def persona_system_prompt(persona):
+    """Stable per-persona system prompt; identical every turn so it can be cached"""
+    return (
+        f"You are {persona['name']}, a product management candidate. "
+        f"Your emotional intelligence (EQ) level is {persona['eq_level']}. {persona['description']} "
+        "You are a product manager with 3 years of experience working in two AI startups. You are very good technically "
+        "but are less exposed to business side of things, which you know theoretically but not practically. "
+        "You are taking a job interview for a product manager position. Answer questions based on your personality traits "
+        "and your job experience. You are allowed to state any facts which fit your personality and your job history, "
+        "but stay consistent with the conversation history. Only output the response relevant to your persona and nothing else."
+    )
+
+
+class Interviewee:
+    """Simulated candidate with a native multi-turn history.
+
+    Interviewer messages are user turns and the candidate's answers assistant turns, under a fixed
+    persona system prompt. With cache=True the system prompt and the conversation so far are marked
+    for prompt caching, so each turn only pays full price for the new question. With max_exchanges
+    the history is bounded: once it grows past the limit the oldest exchanges are dropped down to
+    trim_to at once, so the cached prefix stays valid for several turns between trims.
+    """
+
+    def __init__(self, persona, client=None, cache=True, max_exchanges=None, trim_to=None, model="claude-3-7-sonnet-20250219"):
+        self.persona = persona
+        self.client = client
+        self.cache = cache
+        self.max_exchanges = max_exchanges
+        self.trim_to = trim_to if trim_to is not None else (max_exchanges // 2 if max_exchanges else None)
+        self.model = model
+        self.system_prompt = persona_system_prompt(persona)
+        self.messages = []
+
+    def _bound_context(self):
+        if not self.max_exchanges:
+            return
+        exchanges = len(self.messages) // 2
+        if exchanges > self.max_exchanges:
+            del self.messages[:2 * (exchanges - self.trim_to)]
+
+    def request(self, interviewer_response):
+        """create_message keyword arguments for answering interviewer_response"""
+        self._bound_context()
+        messages = self.messages + [{"role": "user", "content": interviewer_response}]
+        system = self.system_prompt
+        if self.cache:
+            system = [{"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}}]
+            # Breakpoint on the newest turn; the next request reads everything before it from the cache
+            messages[-1] = {"role": "user", "content": [
+                {"type": "text", "text": interviewer_response, "cache_control": {"type": "ephemeral"}}
+            ]}
+        return dict(
+            default_max_tokens=300,
+            max_continuations=2,
+            model=self.model,
+            system=system,
+            messages=messages
+        )
+
+    def record(self, interviewer_response, answer):
+        self.messages.append({"role": "user", "content": interviewer_response})
+        self.messages.append({"role": "assistant", "content": answer})
+
+    def answer(self, interviewer_response):
+        """The candidate's answer to the interviewer's latest message, added to the history"""
+        truncated = False
+        try:
+            message = create_message(self.client or get_client(), "interviewee.answer", **self.request(interviewer_response))
+            interviewee_response = message.content[0].text.strip()
+            truncated = message.stop_reason == "max_tokens"
+        except Exception as e:
+            print(f"Error during API call: {e}")
+            interviewee_response = "Sorry, I couldn't process that."
+
+        # Answers are continued on truncation, so the trimming call is only needed
+        # when the answer ran past its continuation limit
+        if truncated:
+            interviewee_response = trim_unfinished_answer(interviewee_response)
+        self.record(interviewer_response, interviewee_response)
+        return interviewee_response
+
+
+def build_interviewee_prompt(persona, conversation_history, interviewer_response):
+    """The original single-message candidate prompt, which inlines the whole history as a Python list.
+
+    Kept to measure the Interviewee agent against (see compare_prompt_tokens).
+    """
+    return f"""
+    You are {persona["name"]}, a product management candidate.
+    Your emotional intelligence (EQ) level is {persona["eq_level"]}. {persona["description"]}
+    You are a product manager with 3 years of experience working in two AI startups. You are very good technically
+    but are less exposed to business side of things, which you know theoretically but not practically.
+    You are taking a job interview for a product manager position. Answer questions based on your personality traits
+    and your job experience. You are allowed to state any facts which fit your personality and your job history,
+    but stay consistent with the conversation history. Only output the response relevant to your persona and nothing else.
+    Conversation history so far: {conversation_history}
+    Next interviewer question: {interviewer_response}
+    """
+
+
+def trim_unfinished_answer(interviewee_response):
+    """Call Anthropic API to make the interviewee's response logically complete"""
+    try:
+        completion_prompt = f"""
+        The following is a response from a product management candidate during an interview.
+        Please make sure the response is logically complete by trimming any unfinished sentences or thoughts at the end of the blurb.
+        Only return the trimmed response, and nothing else. If you don't have any changes to make, just return the original response.
+
+        Example 1:
+        Input: "I'm a product manager with 3 years of experience working in two AI startups. I'm very good technically but am less exposed to the business side of things, which I know theoretically but not practically."
+        Output: "I'm a product manager with 3 years of experience working in two AI startups. I'm very good technically but am less exposed to the business side of things, which I know theoretically but not practically."
+
+        Example 2:
+        Input: "I'm a product manager with 3 years of experience working in two AI startups. I'm very "
+        Output: "I'm a product manager with 3 years of experience working in two AI startups.
+
+        Example 3:
+        Input: "I resolved a technical issue on feature delivery by:
+
+           1. Creating space for the technical team to explain the core issues without pressure - I organized a whiteboard session where engineers could break down the problem in detail
+           2. Supporting the team tangibly - I took on stakeholder management to shield the engineers from constant status updates, giving them focused time to"
+
+        Output: "I resolved a technical issue on feature delivery by:
+
+           1. Creating space for the technical team to explain the core issues without pressure - I organized a whiteboard session where engineers could break down the problem in detail
+           2. Supporting the team tangibly - I took on stakeholder management to shield the engineers from constant status updates."
+
+        Response to trim: {interviewee_response}
+        """
+        completed_response = create_message(
+            get_client(),
+            "interviewee.trim",
+            default_max_tokens=1024,
+            model="claude-3-7-sonnet-20250219",
+            messages=[{"role": "user", "content": completion_prompt}]
+        )
+        return completed_response.content[0].text.strip()
+    except Exception as e:
+        print(f"Error during API call for completion: {e}")
+        return "Sorry, I couldn't process that."
+
+
+def _tokens(text):
+    return len(text) / CHARS_PER_TOKEN
+
+
+def _request_tokens(request):
+    system = request["system"] if isinstance(request["system"], str) else request["system"][0]["text"]
+    tokens = _tokens(system)
+    for message in request["messages"]:
+        content = message["content"]
+        tokens += _tokens(content if isinstance(content, str) else content[0]["text"])
+    return tokens
+
+
+def compare_prompt_tokens(persona, questions, answers, cache=True, max_exchanges=None):
+    """Per-turn input tokens of the legacy single-message prompt vs the Interviewee agent.
+
+    Replays a recorded conversation offline, estimating tokens from characters. "agent_uncached"
+    is the part of the agent's prompt not read from the cache. "agent_effective" prices it in
+    base-input-token equivalents: the uncached part is written to the cache at
+    CACHE_WRITE_MULTIPLIER (when the prompt is long enough to be cached) and the cached part is
+    read at CACHE_READ_MULTIPLIER.
+    """
+    interviewee = Interviewee(persona, cache=cache, max_exchanges=max_exchanges)
+    history = []
+    turns = []
+    previous = 0.0
+    for question, answer in zip(questions, answers):
+        legacy = _tokens(build_interviewee_prompt(persona, history, question))
+        kept = len(interviewee.messages)
+        request = interviewee.request(question)
+        prompt_tokens = _request_tokens(request)
+        cached = 0.0
+        if cache and previous >= MIN_CACHEABLE_TOKENS and len(interviewee.messages) == kept:
+            # The previous request cached its whole prompt; dropping old exchanges invalidates it
+            cached = previous
+        uncached = prompt_tokens - cached
+        # The request's cache breakpoint writes everything after the cached prefix at the write premium
+        written = uncached if cache and prompt_tokens >= MIN_CACHEABLE_TOKENS else 0.0
+        turns.append({
+            "legacy": round(legacy),
+            "agent": round(prompt_tokens),
+            "agent_uncached": round(uncached),
+            "agent_effective": round(uncached - written + written * CACHE_WRITE_MULTIPLIER + cached * CACHE_READ_MULTIPLIER),
+        })
+        previous = prompt_tokens
+        interviewee.record(question, answer)
+        history.append(f"Interviewer: {question}.")
+        history.append(f"You answered: {answer}.")
+    return turns
+
+
+def count_request_tokens(client, request):
+    """Exact input tokens of a create_message request via the token counting endpoint"""
+    return client.messages.count_tokens(model=request["model"], system=request["system"], messages=request["messages"]).input_tokens
+
+
+def _count_last_turn(client, persona, questions, answers, cache, max_exchanges):
+    """API token counts of the last turn's legacy prompt and agent request, to check the estimates"""
+    interviewee = Interviewee(persona, cache=cache, max_exchanges=max_exchanges)
+    history = []
+    for question, answer in zip(questions[:-1], answers[:-1]):
+        interviewee.request(question)
+        interviewee.record(question, answer)
+        history += [f"Interviewer: {question}.", f"You answered: {answer}."]
+    legacy = client.messages.count_tokens(model=interviewee.model, messages=[
+        {"role": "user", "content": build_interviewee_prompt(persona, history, questions[-1])}]).input_tokens
+    return legacy, count_request_tokens(client, interviewee.request(questions[-1]))
+
+
+def load_simulation(path):
+    """Interviewer questions and candidate answers from a simulation CSV, up to the final unanswered turn"""
+    import csv
+    questions, answers = [], []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if not row["interviewee_response"]:
+                break
+            questions.append(row["interviewer_response"])
+            answers.append(row["interviewee_response"])
+    return questions, answers
+
+
+def main(paths, cache=True, max_exchanges=None, api=False):
+    from test_interviewer import PERSONAS, simulation_filename
+    personas = {simulation_filename(p, "")[:-4]: p for p in PERSONAS}
+    totals = {"legacy": 0, "agent": 0, "agent_uncached": 0, "agent_effective": 0}
+    n_turns = 0
+    for path in paths:
+        stem = re.sub(r"\d+\.csv$", "", os.path.basename(path))
+        persona = personas.get(stem)
+        if persona is None:
+            print(f"Skipping {path}: no persona for this file name")
+            continue
+        questions, answers = load_simulation(path)
+        turns = compare_prompt_tokens(persona, questions, answers, cache=cache, max_exchanges=max_exchanges)
+        if api and turns:
+            legacy, agent = _count_last_turn(get_client(), persona, questions, answers, cache, max_exchanges)
+            print(f"{path}: last turn counted by the API: legacy {legacy}, agent {agent} "
+                  f"(estimated {turns[-1]['legacy']} / {turns[-1]['agent']})")
+        for turn in turns:
+            for key in totals:
+                totals[key] += turn[key]
+        n_turns += len(turns)
+
+    if not n_turns:
+        print("No simulated turns found")
+        return totals
+    print(f"{n_turns} turns from {len(paths)} files, mean input tokens per turn (estimated):")
+    for key, label in (("legacy", "legacy single prompt"), ("agent", "agent context"),
+                       ("agent_uncached", "agent uncached"), ("agent_effective", "agent cache-weighted")):
+        print(f"  {label:22s} {totals[key] / n_turns:8.0f}  ({totals[key] / max(totals['legacy'], 1):.0%} of legacy)")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare per-turn input tokens of the legacy interviewee prompt and the Interviewee agent on recorded simulations')
+    parser.add_argument('paths', nargs='*', help='Simulation CSVs (default: all *-eq-*.csv in this directory)')
+    parser.add_argument('--no_cache', action='store_true', help='Compare without prompt caching')
+    parser.add_argument('--max_exchanges', type=int, default=None, help='Bound the agent history to this many exchanges')
+    parser.add_argument('--api', action='store_true', help='Also count the last turn of each file with the token counting API')
+
+    args = parser.parse_args()
+    main(args.paths or sorted(glob.glob("*-eq-*.csv")), cache=not args.no_cache, max_exchanges=args.max_exchanges, api=args.api)
@@ -0,0 +1,72 @@
+import json
+
+
+class ArrayObjectParser:
+    """Incremental parser for a streamed JSON array of objects.
+
+    feed() takes text as it arrives and returns the objects of the array that were completed by
+    it. Text before the array (such as a preamble or code fence) is skipped; the array starts at the
+    first "[" whose next non-whitespace character is "{", so brackets in prose such as "[3]" are
+    not mistaken for it. Objects nested
+    inside array items are returned as part of their item. Items that fail to parse are counted in
+    `errors` and skipped, so the caller can fall back to parsing the full response.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        # Saw a "[" before the array and waiting to see whether an object follows it
+        self._opening = False
+        self.done = False
+        self.errors = 0
+        self._item = []
+
+    def feed(self, text):
+        objects = []
+        for char in text:
+            if self.done:
+                break
+            if self._opening:
+                if char.isspace():
+                    continue
+                self._opening = False
+                if char == "{":
+                    self.started = True
+                    self.depth = 1
+            if self.depth >= 2:
+                self._item.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                # Strings before the array are prose, not JSON
+                self.in_string = self.started
+            elif char in "[{":
+                if not self.started:
+                    self._opening = char == "["
+                    continue
+                self.depth += 1
+                if self.depth == 2:
+                    self._item = [char]
+            elif char in "]}" and self.started:
+                self.depth -= 1
+                if self.depth == 1:
+                    item = "".join(self._item)
+                    self._item = []
+                    try:
+                        parsed = json.loads(item)
+                    except json.JSONDecodeError:
+                        self.errors += 1
+                        continue
+                    if isinstance(parsed, dict):
+                        objects.append(parsed)
+                elif self.depth == 0:
+                    self.done = True
+        return objects
@@ -0,0 +1,225 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+from types import SimpleNamespace
+import token_budget
+from token_budget import TokenBudget, acreate_message, percentile
+from emotional_interviewer import Interviewer, emotion_score_tools
+from test_interviewer import PERSONAS
+from interviewee import Interviewee
+
+CANNED_ANSWERS = [
+    "I positioned our assistant against two incumbents by interviewing thirty customers and focusing on onboarding speed.",
+    "For TAM I worked bottom-up from seat counts in mid-size companies and cross-checked against analyst reports.",
+    "I wrote the PRD with engineering in the room, so the scope cuts were agreed before the sprint started.",
+    "Honestly I don't see why that matters, the engineers handled most of it.",
+    "We missed the first launch date, so I reset expectations with sales and we shipped two weeks later with fewer features.",
+    "I'd sunset the legacy plan gradually, with migration tooling and a long notice period for the biggest accounts.",
+]
+
+_FILLER = ("the candidate gave a structured answer with a concrete example and clear metrics but the trade-offs "
+           "around pricing and launch sequencing were only touched on briefly ").split()
+
+
+class LatencyModel:
+    """Latency of a mock completion: lognormal time to first token plus a per-output-token cost"""
+
+    def __init__(self, ttft_median=0.6, ttft_sigma=0.5, per_token=0.01, seed=None):
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.per_token = per_token
+        self.rng = random.Random(seed)
+
+    def sample(self, output_tokens):
+        return self.ttft_median * self.rng.lognormvariate(0, self.ttft_sigma) + output_tokens * self.per_token
+
+
+class MockAsyncMessages:
+    """Stands in for AsyncAnthropic().messages: waits out the latency model and returns canned content"""
+
+    def __init__(self, latency, error_rate=0.0, text_tokens=(40, 160), seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.text_tokens = text_tokens
+        self.rng = random.Random(seed)
+        self.stats = {"calls": 0, "errors": 0, "output_tokens": 0}
+
+    async def create(self, max_tokens=1024, messages=None, tools=None, **kwargs):
+        from anthropic.types import TextBlock, ToolUseBlock
+        self.stats["calls"] += 1
+        if tools:
+            output_tokens = 12
+            content = [ToolUseBlock(type="tool_use", id=f"toolu_{self.stats['calls']}", name=tools[0]["name"],
+                                    input={"emotion": self.rng.randint(20, 90)})]
+        else:
+            output_tokens = min(max_tokens, self.rng.randint(*self.text_tokens))
+            words = [self.rng.choice(_FILLER) for _ in range(int(output_tokens * 0.75))]
+            content = [TextBlock(type="text", text=" ".join(words).capitalize() + ".")]
+        await asyncio.sleep(self.latency.sample(output_tokens))
+        if self.rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            raise RuntimeError("mock backend error")
+        self.stats["output_tokens"] += output_tokens
+        input_tokens = sum(len(str(m.get("content", ""))) for m in messages or []) // 4
+        return SimpleNamespace(content=content, stop_reason="end_turn", model=kwargs.get("model"),
+                               usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens))
+
+
+def mock_client(latency, error_rate=0.0, seed=None):
+    return SimpleNamespace(messages=MockAsyncMessages(latency, error_rate, seed=seed))
+
+
+class SessionMessages:
+    """Counts one session's backend failures, which the interviewer otherwise hides behind its fallback replies"""
+
+    def __init__(self, messages):
+        self._messages = messages
+        self.errors = 0
+
+    async def create(self, **kwargs):
+        try:
+            return await self._messages.create(**kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+
+
+async def candidate_answer(client, mode, interviewee, question, rng):
+    if mode == "canned":
+        return rng.choice(CANNED_ANSWERS)
+    answer = await acreate_message(client, "interviewee.answer", **interviewee.request(question))
+    return answer.content[0].text.strip()
+
+
+async def virtual_candidate(client, deadline, n_turns, answers, turn_timeout, scorer, metrics, rng):
+    """Runs back-to-back sessions until the deadline, recording each turn's latency.
+
+    A turn counts as failed when any of its backend calls failed, even if the interviewer
+    recovered with a fallback reply; failed turns are left out of the latency percentiles.
+    """
+    while time.perf_counter() < deadline:
+        session = SessionMessages(client.messages)
+        interviewer = Interviewer(scorer=scorer, async_client=SimpleNamespace(messages=session))
+        interviewee = Interviewee(rng.choice(PERSONAS))
+        message = None
+        metrics["active"] += 1
+        metrics["peak_active"] = max(metrics["peak_active"], metrics["active"])
+        try:
+            for _ in range(n_turns):
+                start = time.perf_counter()
+                errors_before = session.errors
+                try:
+                    _, _, question, _ = await interviewer.aconduct_interview(message, timeout=turn_timeout)
+                except asyncio.TimeoutError:
+                    metrics["timeouts"] += 1
+                    break
+                except Exception:
+                    metrics["errors"] += 1
+                    break
+                if session.errors > errors_before:
+                    metrics["failed_turns"] += 1
+                else:
+                    metrics["turn_latency"].append(time.perf_counter() - start)
+                if time.perf_counter() >= deadline:
+                    break
+                try:
+                    message = await candidate_answer(client, answers, interviewee, question, rng)
+                except Exception:
+                    # Same fallback as Interviewee.answer
+                    metrics["answer_errors"] += 1
+                    message = "Sorry, I couldn't process that."
+                interviewee.record(question, message)
+            else:
+                metrics["sessions"] += 1
+        finally:
+            metrics["active"] -= 1
+
+
+async def run_level(users, duration, n_turns, answers, turn_timeout, scorer, latency, error_rate, ramp, seed):
+    """Drive `users` concurrent virtual candidates for `duration` seconds; returns the level's report"""
+    client = mock_client(latency, error_rate, seed)
+    metrics = {"turn_latency": [], "sessions": 0, "errors": 0, "failed_turns": 0, "answer_errors": 0, "timeouts": 0, "active": 0, "peak_active": 0}
+    rng = random.Random(seed)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    deadline = start + duration
+    tasks = []
+    for i in range(users):
+        # Spread session starts over the ramp so the level does not open with a thundering herd
+        await asyncio.sleep(ramp / users if ramp else 0)
+        tasks.append(asyncio.create_task(virtual_candidate(client, deadline, n_turns, answers, turn_timeout, scorer, metrics, random.Random(rng.random()))))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    turns = len(metrics["turn_latency"])
+    failed = metrics["failed_turns"] + metrics["errors"] + metrics["timeouts"]
+    return {
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "sessions_completed": metrics["sessions"],
+        "turns": turns,
+        "turns_per_second": round(turns / elapsed, 2),
+        "turn_p50": round(percentile(metrics["turn_latency"], 50), 3),
+        "turn_p95": round(percentile(metrics["turn_latency"], 95), 3),
+        "turn_p99": round(percentile(metrics["turn_latency"], 99), 3),
+        "error_rate": round(failed / max(turns + failed, 1), 4),
+        "failed_turns": metrics["failed_turns"],
+        "timeouts": metrics["timeouts"],
+        "answer_errors": metrics["answer_errors"],
+        "backend_calls": client.messages.stats["calls"],
+        "backend_errors": client.messages.stats["errors"],
+        "memory_per_session_kb": round(peak_memory / max(metrics["peak_active"], 1) / 1024, 1),
+    }
+
+
+def print_level(report):
+    print(f"{report['users']:6d} users  {report['turns_per_second']:8.2f} turns/s  "
+          f"p50 {report['turn_p50']:6.2f}s  p95 {report['turn_p95']:6.2f}s  p99 {report['turn_p99']:6.2f}s  "
+          f"errors {report['error_rate']:6.2%}  {report['memory_per_session_kb']:8.1f} KB/session")
+
+
+async def main(levels, duration, n_turns, answers, turn_timeout, scorer, latency, error_rate, ramp, seed):
+    # Load the SDK types and the scoring schema up front so one-time imports don't count as session memory
+    from anthropic.types import TextBlock, ToolUseBlock
+    emotion_score_tools()
+    reports = []
+    for users in levels:
+        report = await run_level(users, duration, n_turns, answers, turn_timeout, scorer, latency, error_rate, ramp, seed)
+        print_level(report)
+        reports.append(report)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load-test the Interviewer with many concurrent virtual candidates on a mock LLM backend')
+    parser.add_argument('--levels', type=int, nargs='+', default=[10, 50, 100, 200],
+                        help='Concurrent candidates per load level, run in order')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per level')
+    parser.add_argument('--ramp', type=float, default=5, help='Seconds over which a level starts its candidates')
+    parser.add_argument('--turns', type=int, default=5, help='Turns per session')
+    parser.add_argument('--answers', choices=['canned', 'persona'], default='canned',
+                        help='Canned candidate answers, or answers generated by the Interviewee agent')
+    parser.add_argument('--turn_timeout', type=float, default=30, help='Per-turn timeout in seconds')
+    parser.add_argument('--scorer', choices=['llm', 'local'], default='llm', help='Emotion scorer used by the interviewer')
+    parser.add_argument('--ttft', type=float, default=0.6, help='Median mock time to first token in seconds')
+    parser.add_argument('--ttft_sigma', type=float, default=0.5, help='Lognormal spread of the mock time to first token')
+    parser.add_argument('--per_token', type=float, default=0.01, help='Mock seconds per output token')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of mock calls that fail')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', type=str, default=None, help='Write all level reports as JSON to this file')
+
+    args = parser.parse_args()
+    # Keep mock traffic out of the learned token budgets
+    token_budget.default_budget = TokenBudget(path=None)
+    latency = LatencyModel(args.ttft, args.ttft_sigma, args.per_token, args.seed)
+    reports = asyncio.run(main(args.levels, args.duration, args.turns, args.answers, args.turn_timeout,
+                               args.scorer, latency, args.error_rate, args.ramp, args.seed))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,377 @@
+import json
+import time
+import uuid
+import argparse
+import threading
+import weakref
+from clients import env, FROM_ENV
+
+# LOCAL_BACKEND_FILE: JSON file assigning roles to OpenAI-compatible endpoints, e.g.
+# {"interviewee": {"base_url": "http://localhost:8080/v1", "model": "phi-4-eq"}}
+
+# Call-site prefixes served by each role; the longest matching prefix decides the role
+ROLE_CALL_SITES = {
+    "interviewer": ("interviewer",),
+    "scorer": ("interviewer.emotion_score",),
+    "interviewee": ("interviewee",),
+}
+
+# Messages from local backends carry this model prefix, which the spend governor prices at zero
+LOCAL_MODEL_PREFIX = "local/"
+
+_STOP_REASONS = {"stop": "end_turn", "length": "max_tokens", "tool_calls": "tool_use", "function_call": "tool_use"}
+
+
+def role_for(call_site):
+    best, best_len = None, -1
+    for role, prefixes in ROLE_CALL_SITES.items():
+        for prefix in prefixes:
+            if (call_site == prefix or call_site.startswith(prefix + ".")) and len(prefix) > best_len:
+                best, best_len = role, len(prefix)
+    return best
+
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if block.get("type", "text") == "text")
+
+
+def to_openai_request(request, model):
+    """Chat completions body for an Anthropic messages.create request"""
+    messages = []
+    if request.get("system"):
+        messages.append({"role": "system", "content": _text(request["system"])})
+    for message in request["messages"]:
+        text = _text(message["content"])
+        # Many chat templates require alternating roles, and the interviewer sends several assistant turns in a row
+        if messages and messages[-1]["role"] == message["role"]:
+            messages[-1]["content"] += "\n\n" + text
+        else:
+            messages.append({"role": message["role"], "content": text})
+
+    body = {"model": model, "messages": messages, "max_tokens": request["max_tokens"]}
+    for field in ("temperature", "top_p"):
+        if field in request:
+            body[field] = request[field]
+    if request.get("stop_sequences"):
+        body["stop"] = request["stop_sequences"]
+    if messages[-1]["role"] == "assistant":
+        # A trailing assistant turn is a prefill to continue (honoured by vLLM; llama.cpp continues it by default)
+        body["continue_final_message"] = True
+        body["add_generation_prompt"] = False
+    if request.get("tools"):
+        body["tools"] = [
+            {"type": "function", "function": {"name": tool["name"], "description": tool.get("description", ""), "parameters": tool["input_schema"]}}
+            for tool in request["tools"]
+        ]
+        choice = request.get("tool_choice") or {"type": "auto"}
+        if choice["type"] == "tool":
+            body["tool_choice"] = {"type": "function", "function": {"name": choice["name"]}}
+        else:
+            body["tool_choice"] = {"any": "required"}.get(choice["type"], "auto")
+    return body
+
+
+def from_openai_response(data, request, model):
+    """Anthropic Message for a chat completions response"""
+    from anthropic.types import Message, TextBlock, ToolUseBlock, Usage
+    choice = data["choices"][0]
+    message = choice.get("message") or {}
+    content = []
+    if message.get("content"):
+        content.append(TextBlock(type="text", text=message["content"]))
+    for call in message.get("tool_calls") or []:
+        arguments = call["function"].get("arguments") or "{}"
+        content.append(ToolUseBlock(type="tool_use", id=call.get("id") or f"toolu_{uuid.uuid4().hex[:12]}", name=call["function"]["name"],
+                                    input=json.loads(arguments) if isinstance(arguments, str) else arguments))
+    stop_reason = _STOP_REASONS.get(choice.get("finish_reason"), "end_turn")
+
+    # Servers without tool calling answer a forced tool choice in plain JSON
+    forced = (request.get("tool_choice") or {}).get("type") == "tool"
+    if forced and not any(block.type == "tool_use" for block in content) and message.get("content"):
+        try:
+            arguments = json.loads(message["content"][message["content"].find("{"):message["content"].rfind("}") + 1])
+            content = [ToolUseBlock(type="tool_use", id=f"toolu_{uuid.uuid4().hex[:12]}", name=request["tool_choice"]["name"], input=arguments)]
+            stop_reason = "tool_use"
+        except ValueError:
+            pass
+
+    usage = data.get("usage") or {}
+    return Message(
+        id=data.get("id") or f"msg_{uuid.uuid4().hex[:12]}",
+        type="message",
+        role="assistant",
+        content=content or [TextBlock(type="text", text="")],
+        model=LOCAL_MODEL_PREFIX + model,
+        stop_reason=stop_reason,
+        stop_sequence=None,
+        usage=Usage(input_tokens=usage.get("prompt_tokens", 0), output_tokens=usage.get("completion_tokens", 0)),
+    )
+
+
+class Endpoint:
+    """Pooled HTTP connections to one OpenAI-compatible server.
+
+    max_connections should match the server's parallel slots (llama.cpp --parallel): concurrent
+    requests up to that many are batched by the server into the same forward passes, and more
+    would only queue there.
+    """
+
+    def __init__(self, base_url, api_key=None, max_connections=8, timeout=120.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key or "none"
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._http = None
+        self._async_http = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _limits(self):
+        import httpx
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    @property
+    def http(self):
+        with self._lock:
+            if self._http is None:
+                import httpx
+                self._http = httpx.Client(base_url=self.base_url, limits=self._limits(), timeout=self.timeout,
+                                          headers={"Authorization": f"Bearer {self.api_key}"})
+            return self._http
+
+    def async_http(self):
+        # Async connections belong to the event loop that opened them
+        import asyncio
+        import httpx
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_http:
+            self._async_http[loop] = httpx.AsyncClient(base_url=self.base_url, limits=self._limits(), timeout=self.timeout,
+                                                       headers={"Authorization": f"Bearer {self.api_key}"})
+        return self._async_http[loop]
+
+
+class _Stream:
+    """messages.stream() stand-in that delivers the whole reply as one delta"""
+
+    def __init__(self, message):
+        self.message = message
+        self.text_stream = iter([block.text for block in message.content if block.type == "text"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get_final_message(self):
+        return self.message
+
+
+class _Messages:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, **request):
+        response = self._client.endpoint.http.post("/chat/completions", json=to_openai_request(request, self._client.model))
+        response.raise_for_status()
+        return from_openai_response(response.json(), request, self._client.model)
+
+    def stream(self, **request):
+        return _Stream(self.create(**request))
+
+
+class _AsyncMessages:
+    def __init__(self, client):
+        self._client = client
+
+    async def create(self, **request):
+        response = await self._client.endpoint.async_http().post("/chat/completions", json=to_openai_request(request, self._client.model))
+        response.raise_for_status()
+        return from_openai_response(response.json(), request, self._client.model)
+
+
+class OpenAICompatClient:
+    """Anthropic-style client for one model on an OpenAI-compatible endpoint.
+
+    client.messages.create() takes the same arguments as the Anthropic SDK and returns an
+    anthropic.types.Message, so create_message's budgets, continuations and tool calls work
+    unchanged. The request's own model is replaced by the endpoint's model.
+    """
+
+    def __init__(self, endpoint, model):
+        self.endpoint = endpoint
+        self.model = model
+        self.messages = _Messages(self)
+        self.async_messages = _AsyncMessages(self)
+
+
+class _AsyncView:
+    """The async counterpart of an OpenAICompatClient, for acreate_message"""
+
+    def __init__(self, client):
+        self.messages = client.async_messages
+
+
+class LocalBackends:
+    """Assignment of roles (interviewer, interviewee, scorer) to local OpenAI-compatible endpoints.
+
+    The config maps a role to {"base_url", "model"} and optionally "api_key", "max_connections" and
+    "timeout". Roles sharing a base_url share one connection pool. Roles that are not configured
+    stay on the hosted Anthropic API.
+    """
+
+    def __init__(self, config=None, path=FROM_ENV):
+        self._path = path
+        self._config = config
+        self._endpoints = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is FROM_ENV:
+            self._path = env("LOCAL_BACKEND_FILE")
+        return self._path
+
+    @property
+    def config(self):
+        # Loaded on first use so importing this module never touches the filesystem
+        with self._lock:
+            if self._config is None:
+                self._config = {}
+                if self.path:
+                    with open(self.path) as f:
+                        self._config = json.load(f)
+            return self._config
+
+    def client_for_role(self, role):
+        settings = self.config.get(role)
+        if not settings:
+            return None
+        with self._lock:
+            if role not in self._clients:
+                base_url = settings["base_url"]
+                if base_url not in self._endpoints:
+                    self._endpoints[base_url] = Endpoint(base_url, settings.get("api_key"), settings.get("max_connections", 8),
+                                                         settings.get("timeout", 120.0))
+                self._clients[role] = OpenAICompatClient(self._endpoints[base_url], settings["model"])
+            return self._clients[role]
+
+    def client(self, call_site):
+        """Local client serving the call site's role, or None to use the hosted API"""
+        if not self.config:
+            return None
+        role = role_for(call_site)
+        return self.client_for_role(role) if role else None
+
+    def async_client(self, call_site):
+        client = self.client(call_site)
+        return _AsyncView(client) if client else None
+
+
+default_backends = LocalBackends()
+
+
+def _sample_requests(role, n, max_tokens, log=None):
+    """Requests for the throughput comparison: recorded prompts of the role's call sites, or interviewee turns"""
+    if log:
+        from model_routing import load_prompt_log
+        entries = [e for e in load_prompt_log(log) if role_for(e["call_site"]) == role][-n:]
+        if entries:
+            return [dict(e["request"], model=e["model"], max_tokens=max_tokens) for e in (entries[i % len(entries)] for i in range(n))]
+        print(f"No {role} prompts in {log}, using synthetic interviewee turns")
+    from test_interviewer import PERSONAS
+    from interviewee import Interviewee
+    questions = ["Tell me about yourself.", "Walk me through a product you launched.",
+                 "How do you prioritise a roadmap?", "Tell me about a conflict with an engineer.",
+                 "How would you size the market for an AI note taker?"]
+    requests = []
+    for i in range(n):
+        request = Interviewee(PERSONAS[i % len(PERSONAS)], cache=False).request(questions[i % len(questions)])
+        requests.append({"model": request["model"], "system": request["system"], "messages": request["messages"],
+                         "max_tokens": max_tokens})
+    return requests
+
+
+def throughput(client, requests, concurrency):
+    """Run the requests `concurrency` at a time; returns throughput, latency and cost"""
+    from concurrent.futures import ThreadPoolExecutor
+    from token_budget import percentile
+    from spend_governor import call_cost
+
+    latencies, output_tokens, cost, errors = [], 0, 0.0, 0
+    # Open a connection and load the response types before timing
+    client.messages.create(**requests[0])
+
+    def send(request):
+        start = time.perf_counter()
+        message = client.messages.create(**request)
+        return time.perf_counter() - start, message
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(send, request) for request in requests]
+        for future in futures:
+            try:
+                latency, message = future.result()
+            except Exception as e:
+                print(f"Request failed: {e}")
+                errors += 1
+                continue
+            latencies.append(latency)
+            output_tokens += message.usage.output_tokens
+            cost += call_cost(message.model, message.usage)
+    elapsed = time.perf_counter() - start
+    done = len(latencies)
+    return {
+        "requests": done,
+        "errors": errors,
+        "requests_per_second": round(done / elapsed, 2),
+        "output_tokens_per_second": round(output_tokens / elapsed, 1),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "cost_per_1k_requests": round(cost / done * 1000, 2) if done else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare throughput of a role on its local OpenAI-compatible backend and on the hosted API')
+    parser.add_argument('--role', choices=sorted(ROLE_CALL_SITES), default='interviewee')
+    parser.add_argument('--config', type=str, default=None, help='Role to endpoint config (default: LOCAL_BACKEND_FILE)')
+    parser.add_argument('--base_url', type=str, default=None, help='Local endpoint, instead of a config file')
+    parser.add_argument('--model', type=str, default=None, help='Local model name, with --base_url')
+    parser.add_argument('--max_connections', type=int, default=8, help='Connection pool size, with --base_url')
+    parser.add_argument('--requests', type=int, default=40, help='Requests per backend')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight per backend')
+    parser.add_argument('--max_tokens', type=int, default=300)
+    parser.add_argument('--log', type=str, default=None, help='Prompt log to take the role\'s requests from')
+    parser.add_argument('--no_hosted', action='store_true', help='Skip the hosted API')
+    parser.add_argument('--report', type=str, default=None, help='Write the comparison as JSON to this file')
+
+    args = parser.parse_args()
+    if args.base_url:
+        backends = LocalBackends({args.role: {"base_url": args.base_url, "model": args.model or "local", "max_connections": args.max_connections}})
+    else:
+        backends = LocalBackends(path=args.config or FROM_ENV)
+    requests = _sample_requests(args.role, args.requests, args.max_tokens, args.log)
+
+    targets = {}
+    local = backends.client_for_role(args.role)
+    if local:
+        targets[f"local {local.model}"] = local
+    if not args.no_hosted:
+        from clients import get_client
+        targets["hosted " + requests[0]["model"]] = get_client()
+
+    report = {}
+    for name, client in targets.items():
+        print(f"Sending {len(requests)} {args.role} requests to {name}, {args.concurrency} at a time")
+        report[name] = throughput(client, requests, args.concurrency)
+    print(f"\n{'backend':44s} {'req/s':>7s} {'out tok/s':>10s} {'p50 s':>7s} {'p95 s':>7s} {'$/1k req':>9s} {'errors':>6s}")
+    for name, stats in report.items():
+        print(f"{name:44s} {stats['requests_per_second']:7.2f} {stats['output_tokens_per_second']:10.1f} "
+              f"{stats['latency_p50']:7.2f} {stats['latency_p95']:7.2f} {stats['cost_per_1k_requests']:9.2f} {stats['errors']:6d}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
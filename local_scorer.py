@@ -0,0 +1,202 @@
+import os
+import re
+import glob
+import time
+import zlib
+import argparse
+import threading
+import numpy as np
+from clients import env
+
+# pandas is imported only to read the training CSVs, so loading a saved model for live scoring stays light
+
+# Simulation CSVs written by test_interviewer.py
+DEFAULT_TRAINING_GLOB = "*-eq-*.csv"
+
+
+def default_model_path():
+    """Where the trained scorer is stored (LOCAL_SCORER_MODEL)"""
+    return env("LOCAL_SCORER_MODEL", os.path.join("data", "local_scorer.npz"))
+
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def feature_indices(text, dim):
+    """Hashed unigram and bigram feature indices for a text"""
+    words = _WORD_RE.findall(str(text).lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64, count=len(grams)))
+
+
+def load_training_pairs(pattern=DEFAULT_TRAINING_GLOB):
+    """(interviewer_emotions, interviewer_emotion_score) pairs from the simulation CSVs"""
+    import pandas as pd
+    files = sorted(glob.glob(pattern))
+    if not files:
+        raise FileNotFoundError(f"No simulation CSVs match {pattern}")
+    df = pd.concat([pd.read_csv(f, usecols=["interviewer_emotions", "interviewer_emotion_score"]) for f in files], ignore_index=True)
+    df = df.dropna()
+    df = df[df["interviewer_emotions"].str.strip() != ""]
+    print(f"Loaded {len(df)} emotion/score pairs from {len(files)} files")
+    return df["interviewer_emotions"].tolist(), df["interviewer_emotion_score"].astype(float).tolist()
+
+
+class LocalEmotionScorer:
+    """Ridge regression over hashed word n-grams that maps an emotions sentence to a 0-100 score"""
+
+    def __init__(self, weights, bias, dim):
+        self.weights = weights
+        self.bias = bias
+        self.dim = dim
+
+    @classmethod
+    def train(cls, texts, scores, dim=4096, alpha=0.3):
+        X = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            idx = feature_indices(text, dim)
+            if len(idx):
+                X[row, idx] = 1.0 / np.sqrt(len(idx))
+        y = np.asarray(scores, dtype=np.float64)
+        bias = y.mean()
+        # Closed-form ridge solution on centered targets, in whichever of the primal/dual forms is smaller
+        X = X.astype(np.float64)
+        if len(texts) < dim:
+            gram = X @ X.T
+            gram[np.diag_indices_from(gram)] += alpha
+            weights = X.T @ np.linalg.solve(gram, y - bias)
+        else:
+            gram = X.T @ X
+            gram[np.diag_indices_from(gram)] += alpha
+            weights = np.linalg.solve(gram, X.T @ (y - bias))
+        return cls(weights, bias, dim)
+
+    def predict(self, text):
+        idx = feature_indices(text, self.dim)
+        if not len(idx):
+            return self.bias
+        return self.bias + self.weights[idx].sum() / np.sqrt(len(idx))
+
+    def score(self, text):
+        """Integer emotion score (0-100) for a text"""
+        return int(round(min(100.0, max(0.0, self.predict(text)))))
+
+    def score_batch(self, texts):
+        return [self.score(text) for text in texts]
+
+    def save(self, path=None):
+        path = path or default_model_path()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, weights=self.weights, bias=self.bias, dim=self.dim)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or default_model_path()
+        data = np.load(path)
+        return cls(data["weights"], float(data["bias"]), int(data["dim"]))
+
+
+_scorers = {}
+_scorers_lock = threading.Lock()
+
+
+def get_local_scorer(path=None):
+    """The saved local scorer, loaded once per path.
+
+    Training is a separate step (python local_scorer.py train): the live scoring path never reads
+    the simulation CSVs, and a missing model raises FileNotFoundError instead of training one.
+    """
+    path = path or default_model_path()
+    # Scorers are shared by reward service worker threads, which must not load the same model twice
+    with _scorers_lock:
+        if path not in _scorers:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No local emotion scorer at {path}; train one with: python local_scorer.py train --model {path}")
+            _scorers[path] = LocalEmotionScorer.load(path)
+        return _scorers[path]
+
+
+def agreement(predicted, reference):
+    """Agreement statistics between two lists of scores"""
+    predicted = np.asarray(predicted, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    diff = np.abs(predicted - reference)
+    return {
+        "n": len(reference),
+        "mae": round(float(diff.mean()), 2),
+        "within_10": round(float((diff <= 10).mean()), 3),
+        "pearson_r": round(float(np.corrcoef(predicted, reference)[0, 1]), 3) if len(reference) > 1 else None,
+    }
+
+
+def cross_validate(texts, scores, folds=5, seed=42, **train_kwargs):
+    """K-fold agreement of the local scorer with the LLM scores recorded in the CSVs"""
+    order = np.random.RandomState(seed).permutation(len(texts))
+    predicted = np.zeros(len(texts))
+    for fold in range(folds):
+        test = order[fold::folds]
+        train = np.setdiff1d(order, test)
+        model = LocalEmotionScorer.train([texts[i] for i in train], [scores[i] for i in train], **train_kwargs)
+        for i in test:
+            predicted[i] = model.score(texts[i])
+    return agreement(predicted, scores)
+
+
+def compare_with_llm(texts, scorer):
+    """Score texts with both the local model and the LLM scorer and report their agreement"""
+    from emotional_interviewer import Interviewer
+    interviewer = Interviewer(scorer="llm")
+    local, llm = [], []
+    for text in texts:
+        try:
+            llm.append(interviewer.generate_emotion_score(text))
+            local.append(scorer.score(text))
+        except Exception as e:
+            print(f"LLM scoring failed: {e}")
+    return agreement(local, llm)
+
+
+def benchmark(scorer, texts, repeat=20):
+    """Texts scored per second on this CPU"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        scorer.score_batch(texts)
+    elapsed = time.perf_counter() - start
+    return len(texts) * repeat / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train and evaluate the CPU-only local emotion scorer')
+    parser.add_argument('command', choices=["train", "evaluate", "compare", "benchmark", "score"],
+                        help='train a model, cross-validate it, compare it with the LLM scorer, measure throughput, or score a text')
+    parser.add_argument('--data', type=str, default=DEFAULT_TRAINING_GLOB,
+                        help='Glob of simulation CSVs to train on')
+    parser.add_argument('--model', type=str, default=default_model_path(),
+                        help='Where the trained model is stored')
+    parser.add_argument('--samples', type=int, default=20,
+                        help='Number of texts sent to the LLM scorer in compare mode')
+    parser.add_argument('--text', type=str, default=None,
+                        help='Text to score in score mode')
+
+    args = parser.parse_args()
+
+    if args.command == "train":
+        texts, scores = load_training_pairs(args.data)
+        scorer = LocalEmotionScorer.train(texts, scores)
+        scorer.save(args.model)
+        print(f"Model saved to {args.model}")
+        print(f"Cross-validated agreement with recorded LLM scores: {cross_validate(texts, scores)}")
+    elif args.command == "evaluate":
+        texts, scores = load_training_pairs(args.data)
+        print(f"Cross-validated agreement with recorded LLM scores: {cross_validate(texts, scores)}")
+    elif args.command == "compare":
+        texts, _ = load_training_pairs(args.data)
+        sample = [texts[i] for i in np.random.RandomState(42).permutation(len(texts))[:args.samples]]
+        print(f"Agreement with live LLM scorer: {compare_with_llm(sample, get_local_scorer(args.model))}")
+    elif args.command == "benchmark":
+        texts, _ = load_training_pairs(args.data)
+        print(f"Scored {benchmark(get_local_scorer(args.model), texts):.0f} texts/second")
+    else:
+        print(get_local_scorer(args.model).score(args.text or ""))
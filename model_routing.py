@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import argparse
+import threading
+import statistics
+from clients import env, FROM_ENV
+
+# MODEL_ROUTING_FILE: JSON file mapping call sites to models, e.g. {"interviewer.emotion_score": "claude-3-5-haiku-20241022"}
+# PROMPT_LOG_FILE: when set, every create_message call is appended to this JSONL file for replay
+
+# Request fields kept in the prompt log; everything needed to replay the call against another model
+_REPLAY_FIELDS = ("system", "messages", "tools", "tool_choice", "temperature")
+
+
+class ModelRouter:
+    """Chooses the model for each call site.
+
+    Routes are looked up by exact call site, then by dotted prefix ("interviewer" covers
+    "interviewer.emotions"), then "*". Call sites without a route keep the model their caller passed.
+    """
+
+    def __init__(self, routes=None, path=FROM_ENV):
+        self._path = path
+        self._routes = routes
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is FROM_ENV:
+            self._path = env("MODEL_ROUTING_FILE")
+        return self._path
+
+    @property
+    def routes(self):
+        # Loaded on first use so importing this module never touches the filesystem
+        with self._lock:
+            if self._routes is None:
+                self._routes = {}
+                if self.path:
+                    with open(self.path) as f:
+                        self._routes = json.load(f)
+            return self._routes
+
+    def model(self, call_site, default=None):
+        routes = self.routes
+        parts = call_site.split(".")
+        for i in range(len(parts), 0, -1):
+            site = ".".join(parts[:i])
+            if site in routes:
+                return routes[site]
+        return routes.get("*", default)
+
+
+class PromptRecorder:
+    """Appends the request and result of each call to a JSONL file for offline replay"""
+
+    def __init__(self, path=FROM_ENV):
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is FROM_ENV:
+            self._path = env("PROMPT_LOG_FILE")
+        return self._path
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def record(self, call_site, request, message, latency):
+        if not self.path:
+            return
+        entry = {
+            "call_site": call_site,
+            "model": request.get("model"),
+            "max_tokens": request.get("max_tokens"),
+            "request": {key: request[key] for key in _REPLAY_FIELDS if key in request},
+            "output": message_output(message),
+            "latency": round(latency, 4),
+            "input_tokens": message.usage.input_tokens,
+            "output_tokens": message.usage.output_tokens,
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+
+# Shared router and recorder used by token_budget.create_message
+default_router = ModelRouter()
+default_recorder = PromptRecorder()
+
+
+def message_output(message):
+    """Comparable output of a message: the tool input for tool calls, otherwise the text"""
+    for block in message.content:
+        if getattr(block, "type", None) == "tool_use":
+            return {"tool_input": block.input}
+    return {"text": "".join(block.text for block in message.content if getattr(block, "type", None) == "text")}
+
+
+def agreement(reference, candidate):
+    """Similarity of two outputs in [0, 1].
+
+    Tool calls with numeric fields (the emotion score) score 1 - |difference| / 100 per field, other
+    tool fields by equality; text outputs by Jaccard similarity of their word trigrams.
+    """
+    if "tool_input" in reference or "tool_input" in candidate:
+        expected, actual = reference.get("tool_input") or {}, candidate.get("tool_input") or {}
+        keys = set(expected) | set(actual)
+        if not keys:
+            return 1.0
+        scores = []
+        for key in keys:
+            a, b = expected.get(key), actual.get(key)
+            if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+                scores.append(max(0.0, 1 - abs(a - b) / 100))
+            else:
+                scores.append(1.0 if a == b else 0.0)
+        return sum(scores) / len(scores)
+
+    from dedup import shingle_set, jaccard
+    return jaccard(shingle_set({"text": reference.get("text", "")}, ["text"]),
+                   shingle_set({"text": candidate.get("text", "")}, ["text"]))
+
+
+def load_prompt_log(path, call_sites=None, limit=None):
+    entries = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if call_sites and entry["call_site"] not in call_sites:
+                continue
+            entries.append(entry)
+    return entries[-limit:] if limit else entries
+
+
+def replay(entries, models, client=None):
+    """Send recorded prompts to each candidate model and compare with the recorded outputs.
+
+    Returns {call_site: {model: {"calls", "latency_p50", "latency_p95", "input_tokens",
+    "output_tokens", "agreement", "errors"}}}, with the recorded production run under "recorded".
+    """
+    if client is None:
+        from clients import get_client
+        client = get_client()
+
+    results = {}
+    for entry in entries:
+        site = results.setdefault(entry["call_site"], {})
+        recorded = site.setdefault("recorded", {"latency": [], "input_tokens": [], "output_tokens": [], "agreement": [], "errors": 0})
+        recorded["latency"].append(entry["latency"])
+        recorded["input_tokens"].append(entry["input_tokens"])
+        recorded["output_tokens"].append(entry["output_tokens"])
+        recorded["agreement"].append(1.0)
+
+        for model in models:
+            stats = site.setdefault(model, {"latency": [], "input_tokens": [], "output_tokens": [], "agreement": [], "errors": 0})
+            start = time.perf_counter()
+            try:
+                message = client.messages.create(model=model, max_tokens=entry["max_tokens"], **entry["request"])
+            except Exception as e:
+                print(f"Replay of {entry['call_site']} on {model} failed: {e}")
+                stats["errors"] += 1
+                continue
+            stats["latency"].append(time.perf_counter() - start)
+            stats["input_tokens"].append(message.usage.input_tokens)
+            stats["output_tokens"].append(message.usage.output_tokens)
+            stats["agreement"].append(agreement(entry["output"], message_output(message)))
+
+    from token_budget import percentile
+    report = {}
+    for call_site, site in results.items():
+        report[call_site] = {}
+        for model, stats in site.items():
+            report[call_site][model] = {
+                "calls": len(stats["latency"]),
+                "latency_p50": round(percentile(stats["latency"], 50), 3),
+                "latency_p95": round(percentile(stats["latency"], 95), 3),
+                "input_tokens": round(statistics.mean(stats["input_tokens"]), 1) if stats["input_tokens"] else 0,
+                "output_tokens": round(statistics.mean(stats["output_tokens"]), 1) if stats["output_tokens"] else 0,
+                "agreement": round(statistics.mean(stats["agreement"]), 3) if stats["agreement"] else None,
+                "errors": stats["errors"],
+            }
+    return report
+
+
+def print_report(report):
+    for call_site, models in report.items():
+        print(f"\n{call_site}")
+        print(f"  {'model':34s} {'calls':>5s} {'p50 s':>7s} {'p95 s':>7s} {'in tok':>8s} {'out tok':>8s} {'agree':>6s}")
+        for model, stats in models.items():
+            agree = f"{stats['agreement']:.3f}" if stats["agreement"] is not None else "-"
+            print(f"  {model:34s} {stats['calls']:5d} {stats['latency_p50']:7.2f} {stats['latency_p95']:7.2f} "
+                  f"{stats['input_tokens']:8.0f} {stats['output_tokens']:8.0f} {agree:>6s}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay recorded prompts through candidate models and compare latency, tokens and agreement')
+    parser.add_argument('--log', type=str, default=env("PROMPT_LOG_FILE") or os.path.join("data", "prompt_log.jsonl"),
+                        help='Prompt log written with PROMPT_LOG_FILE set')
+    parser.add_argument('--models', nargs='+', required=True, help='Candidate models to replay on')
+    parser.add_argument('--call_sites', nargs='*', default=None, help='Only replay these call sites')
+    parser.add_argument('--limit', type=int, default=50, help='Replay the most recent N matching prompts')
+    parser.add_argument('--report', type=str, default=None, help='Write the report as JSON to this file')
+
+    args = parser.parse_args()
+    entries = load_prompt_log(args.log, args.call_sites, args.limit)
+    print(f"Replaying {len(entries)} prompts on {', '.join(args.models)}")
+    report = replay(entries, args.models)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
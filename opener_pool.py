@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+from collections import deque
+
+
+class OpenerPool:
+    """Warm pool of pre-generated interviewer opening messages.
+
+    Sessions that start without candidate input all send the same opening prompt, so the
+    interviewer's first line can be generated ahead of time. Each opener is served once. Openers
+    older than max_age seconds are discarded, and a background thread tops the pool back up to
+    `size` whenever it drops to `low_watermark`. With keep_warm the thread stays alive and also
+    replaces openers as they expire, so an idle server still starts its next session warm.
+    Failed generations are retried with exponential backoff (retry_delay doubling up to
+    max_retry_delay); the keep-warm thread retries indefinitely, other refills give up after
+    max_retries failures in a row.
+    """
+
+    def __init__(self, size=8, max_age=3600, low_watermark=None, generate=None, keep_warm=False,
+                 retry_delay=1.0, max_retry_delay=60.0, max_retries=3):
+        self.size = size
+        self.max_age = max_age
+        self.low_watermark = size // 2 if low_watermark is None else low_watermark
+        self.keep_warm = keep_warm
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        self._generate = generate
+        self._openers = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refilling = False
+        self.stats = {"served_warm": 0, "served_cold": 0, "generated": 0, "expired": 0, "errors": 0}
+
+    def generate(self):
+        if self._generate is None:
+            from emotional_interviewer import generate_opener
+            self._generate = generate_opener
+        return self._generate()
+
+    def _drop_stale(self):
+        cutoff = time.time() - self.max_age
+        while self._openers and self._openers[0][1] < cutoff:
+            self._openers.popleft()
+            self.stats["expired"] += 1
+
+    def take(self):
+        """A warm opener, or None if the pool is empty; never blocks on the API"""
+        with self._lock:
+            self._drop_stale()
+            opener = self._openers.popleft()[0] if self._openers else None
+            if opener is not None:
+                self.stats["served_warm"] += 1
+            needs_refill = len(self._openers) <= self.low_watermark
+        if needs_refill:
+            self.refill()
+        return opener
+
+    def get(self):
+        """A warm opener, generated on the spot when the pool is empty"""
+        opener = self.take()
+        if opener is None:
+            opener = self.generate()
+            with self._lock:
+                self.stats["served_cold"] += 1
+        return opener
+
+    def refill(self, wait=False):
+        """Top the pool up to size in a background thread (or in this thread with wait=True)"""
+        with self._lock:
+            if self._refilling:
+                self._wake.set()
+                return
+            self._refilling = True
+        if wait:
+            # A blocking refill returns once the pool is full; keep_warm only applies to the background thread
+            self._refill(stay=False)
+        else:
+            threading.Thread(target=self._refill, args=(self.keep_warm,), daemon=True, name="opener-pool-refill").start()
+
+    def _refill(self, stay):
+        failures = 0
+        try:
+            while True:
+                with self._lock:
+                    self._drop_stale()
+                    full = len(self._openers) >= self.size
+                    next_expiry = self._openers[0][1] + self.max_age - time.time() if self._openers else 0
+                if full:
+                    if not stay:
+                        return
+                    # Sleep until the oldest opener expires or a take() wakes us up
+                    self._wake.wait(timeout=max(next_expiry, 0.01))
+                    self._wake.clear()
+                    continue
+                try:
+                    opener = self.generate()
+                except Exception as e:
+                    failures += 1
+                    with self._lock:
+                        self.stats["errors"] += 1
+                    if not stay and failures >= self.max_retries:
+                        print(f"Error generating opener for the pool, giving up after {failures} attempts: {e}")
+                        return
+                    # A transient API error must not leave the pool to drain; back off and try again
+                    delay = min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+                    print(f"Error generating opener for the pool, retrying in {delay:.0f}s: {e}")
+                    time.sleep(delay)
+                    continue
+                failures = 0
+                with self._lock:
+                    self._openers.append((opener, time.time()))
+                    self.stats["generated"] += 1
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def __len__(self):
+        with self._lock:
+            self._drop_stale()
+            return len(self._openers)
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_opener_pool():
+    """Shared pool for Interviewer sessions, enabled with OPENER_POOL_SIZE > 0 (freshness from OPENER_MAX_AGE)"""
+    global _default_pool
+    size = int(os.getenv("OPENER_POOL_SIZE", "0"))
+    if size <= 0:
+        return None
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = OpenerPool(size=size, max_age=float(os.getenv("OPENER_MAX_AGE", "3600")), keep_warm=True)
+            _default_pool.refill()
+        return _default_pool
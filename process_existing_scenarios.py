@@ -1,19 +1,15 @@
 import os
 import time
+import shutil
 import json
-import pandas as pd
+import argparse
 from tqdm import tqdm
-from dotenv import load_dotenv
-from anthropic import Anthropic, APIError, APIStatusError, RateLimitError
-
-# Load environment variables
-load_dotenv()
-
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-# Create data directory if it doesn't exist
-os.makedirs("data", exist_ok=True)
+from anthropic import APIError, APIStatusError, RateLimitError
+from clients import get_client
+from token_budget import create_message
+from scenario_stream import iter_scenarios, append_records
+from sharding import scenario_key
+from failure_ledger import FailureLedger, GenerationFailure, default_failure_ledger
 
 # Define personas with varying levels of EQ
 personas = [
@@ -28,6 +24,9 @@ personas = [
 # Map persona names to their full descriptions
 persona_map = {p.split(':')[0]: p for p in personas}
 
+# Name of this generator in the failure ledger
+GENERATOR = "process_existing_scenarios"
+
 def generate_conversation_history_prompt(scenario, conversation_needed):
     return f"""Based on the following scenario and conversation requirements, generate a conversation history summary and current emotional state:
 
@@ -108,8 +107,11 @@ def extract_json_from_response(response_text):
         print(f"Failed to parse JSON from response: {e}")
         return None
 
-def api_call(prompt, system_message, attempt=1, max_attempts=3):
-    """Make an API call with retry logic."""
+def api_call(prompt, system_message, attempt=1, max_attempts=3, call_site="process", default_max_tokens=1000):
+    """Make an API call with retry logic and a learned max_tokens budget for the call site.
+
+    Raises GenerationFailure once the retries are exhausted or on a non-retryable error.
+    """
     print(f"\n--- Prompt Preview (first 200 chars) ---")
     print(prompt[:200] + "..." if len(prompt) > 200 else prompt)
     print("--- End Prompt ---\n")
@@ -117,9 +119,11 @@ def api_call(prompt, system_message, attempt=1, max_attempts=3):
     print(f"Making API call (attempt {attempt}/{max_attempts})")
     
     try:
-        response = client.messages.create(
+        response = create_message(
+            get_client(),
+            call_site,
+            default_max_tokens=default_max_tokens,
             model="claude-3-5-sonnet-20240620",
-            max_tokens=1000,
             temperature=0.7,
             system=system_message,
             messages=[
@@ -135,8 +139,8 @@ def api_call(prompt, system_message, attempt=1, max_attempts=3):
             wait_time = min(2 ** attempt * 5, 60)  # Exponential backoff
             print(f"Waiting {wait_time} seconds before retry...")
             time.sleep(wait_time)
-            return api_call(prompt, system_message, attempt+1, max_attempts)
-        return None
+            return api_call(prompt, system_message, attempt+1, max_attempts, call_site, default_max_tokens)
+        raise GenerationFailure(call_site, type(e).__name__, str(e), attempt)
         
     except APIStatusError as e:
         if e.status_code == 529:  # Overloaded
@@ -145,26 +149,23 @@ def api_call(prompt, system_message, attempt=1, max_attempts=3):
                 wait_time = min(2 ** attempt * 10, 120)  # Longer exponential backoff
                 print(f"Waiting {wait_time} seconds before retry...")
                 time.sleep(wait_time)
-                return api_call(prompt, system_message, attempt+1, max_attempts)
+                return api_call(prompt, system_message, attempt+1, max_attempts, call_site, default_max_tokens)
         else:
             print(f"API error: {e}")
-        return None
+        raise GenerationFailure(call_site, type(e).__name__, str(e), attempt)
         
     except Exception as e:
         print(f"Error making API call: {e}")
-        return None
+        raise GenerationFailure(call_site, type(e).__name__, str(e), attempt)
 
 def generate_conversation_history(scenario, conversation_needed):
-    """Generate conversation history and current emotional state based on scenario."""
+    """Generate conversation history and current emotional state based on scenario; raises GenerationFailure if unusable."""
     prompt = generate_conversation_history_prompt(scenario, conversation_needed)
     
     system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate realistic conversation histories and emotional states for challenging scenarios. IMPORTANT: Your response must be valid JSON that can be parsed directly."
     
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
-    
-    data = extract_json_from_response(response_text)
+    response_text = api_call(prompt, system_message, call_site="process.conversation_history")
+    data = extract_json_from_response(response_text) if response_text else None
     
     required_keys = ["conversation_objective", "conversation_history", "current_emotional_state", "conversation_point"]
     if data and all(k in data for k in required_keys):
@@ -172,10 +173,11 @@ def generate_conversation_history(scenario, conversation_needed):
         return data
     else:
         print("Failed to extract valid conversation history data")
-        return None
+        raise GenerationFailure("process.conversation_history", "InvalidJSON" if data is None else "InvalidResponse",
+                                "no conversation history and emotional state in the response")
 
 def generate_optimal_response(scenario, conversation_data, persona_desc):
-    """Generate the optimal next response based on scenario, conversation history, and persona."""
+    """Generate the optimal next response based on scenario, conversation history, and persona; raises GenerationFailure if unusable."""
     prompt = generate_optimal_response_prompt(
         scenario,
         conversation_data["conversation_objective"],
@@ -187,106 +189,166 @@ def generate_optimal_response(scenario, conversation_data, persona_desc):
     
     system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate optimal responses that demonstrate emotional intelligence and help achieve conversation objectives. IMPORTANT: Your response must be valid JSON that can be parsed directly."
     
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
-    
-    data = extract_json_from_response(response_text)
+    response_text = api_call(prompt, system_message, call_site="process.optimal_response")
+    data = extract_json_from_response(response_text) if response_text else None
     
     if data and all(k in data for k in ["optimal_response", "reasoning", "eq_skills_demonstrated"]):
         print("Successfully generated optimal response")
         return data
     else:
         print("Failed to extract valid optimal response data")
-        return None
+        raise GenerationFailure("process.optimal_response", "InvalidJSON" if data is None else "InvalidResponse",
+                                "no optimal_response, reasoning and eq_skills_demonstrated in the response")
+
+def process_scenario(scenario, conversation_needed, persona, ledger, output_file, conversation_data=None):
+    """One training record for a scenario, or None if it failed and was recorded in the ledger.
 
-def process_scenarios(input_file, output_file=None, persona_to_process=None, max_scenarios=None):
-    """Process existing scenarios to generate conversation histories and optimal responses."""
-    # Read the existing scenarios
-    df = pd.read_csv(input_file)
-    print(f"Loaded {len(df)} scenarios from {input_file}")
+    The ledger entry keeps a successfully generated conversation history, and passing it back as
+    conversation_data skips straight to the optimal response.
+    """
+    # Get the full persona description
+    persona_desc = persona_map.get(persona, persona)
+    inputs = {"scenario": scenario, "conversation_needed": conversation_needed, "persona": persona}
+    key = scenario_key(scenario, conversation_needed)
     
-    # If a specific persona is requested, filter for it
-    if persona_to_process:
-        df = df[df["persona"] == persona_to_process]
-        print(f"Filtered to {len(df)} scenarios for persona {persona_to_process}")
+    # Generate conversation history
+    if conversation_data is None:
+        try:
+            conversation_data = generate_conversation_history(scenario, conversation_needed)
+        except GenerationFailure as e:
+            ledger.record(GENERATOR, "scenario", key, inputs, output_file, e)
+            return None
     
-    # If max_scenarios is specified, limit the number of scenarios
-    if max_scenarios and max_scenarios < len(df):
-        df = df.sample(max_scenarios, random_state=42)
-        print(f"Sampled {len(df)} scenarios")
+    # Generate optimal response
+    try:
+        response_data = generate_optimal_response(scenario, conversation_data, persona_desc)
+    except GenerationFailure as e:
+        ledger.record(GENERATOR, "scenario", key, dict(inputs, conversation_data=conversation_data), output_file, e)
+        return None
     
+    # Combine all data
+    return {
+        "persona": persona,
+        "scenario": scenario,
+        "conversation_needed": conversation_needed,
+        "conversation_objective": conversation_data["conversation_objective"],
+        "conversation_history": conversation_data["conversation_history"],
+        "current_emotional_state": conversation_data["current_emotional_state"],
+        "conversation_point": conversation_data["conversation_point"],
+        "optimal_response": response_data["optimal_response"],
+        "reasoning": response_data["reasoning"],
+        "eq_skills_demonstrated": response_data["eq_skills_demonstrated"]
+    }
+
+def process_scenarios(input_file, output_file=None, persona_to_process=None, max_scenarios=None, ledger=None):
+    """Process existing scenarios to generate conversation histories and optimal responses.
+
+    Scenarios are streamed from input_file chunk by chunk and records are appended to the progress file
+    as they are generated, so the input can be larger than memory. Scenarios that fail are recorded in
+    the failure ledger for retry_failed_units, and ones that succeed are resolved there.
+    """
     # Create a list to store the processed data
     processed_data = []
     
+    # Create data directory if it doesn't exist
+    os.makedirs("data", exist_ok=True)
+    
+    # Name the final output up front so failed units can record where their records belong
+    final_output_file = output_file or f"data/eq_training_data_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    ledger = ledger or FailureLedger()
+    
     # Create a temporary file to save progress
     temp_output_file = output_file or f"data/eq_training_data_temp_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    if os.path.exists(temp_output_file):
+        os.remove(temp_output_file)
     
     # Process each scenario
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing scenarios"):
+    scenarios_processed = 0
+    for row in tqdm(iter_scenarios(input_file, persona=persona_to_process, max_scenarios=max_scenarios), desc="Processing scenarios"):
         scenario = row["scenario"]
         conversation_needed = row["conversation_needed"]
         persona = row.get("persona", "Unknown")  # Use "Unknown" if persona is not in the data
+        scenarios_processed += 1
         
-        print(f"\nProcessing scenario {idx+1}/{len(df)} for persona {persona}")
-        
-        # Get the full persona description
-        persona_desc = persona_map.get(persona, persona)
+        print(f"\nProcessing scenario {scenarios_processed} for persona {persona}")
         
-        # Generate conversation history
-        conversation_data = generate_conversation_history(scenario, conversation_needed)
-        
-        if conversation_data:
-            # Generate optimal response
-            response_data = generate_optimal_response(scenario, conversation_data, persona_desc)
+        combined_data = process_scenario(scenario, conversation_needed, persona, ledger, final_output_file)
+        if combined_data:
+            processed_data.append(combined_data)
             
-            if response_data:
-                # Combine all data
-                combined_data = {
-                    "persona": persona,
-                    "scenario": scenario,
-                    "conversation_needed": conversation_needed,
-                    "conversation_objective": conversation_data["conversation_objective"],
-                    "conversation_history": conversation_data["conversation_history"],
-                    "current_emotional_state": conversation_data["current_emotional_state"],
-                    "conversation_point": conversation_data["conversation_point"],
-                    "optimal_response": response_data["optimal_response"],
-                    "reasoning": response_data["reasoning"],
-                    "eq_skills_demonstrated": response_data["eq_skills_demonstrated"]
-                }
-                
-                processed_data.append(combined_data)
-                
-                # Save progress
-                temp_df = pd.DataFrame(processed_data)
-                temp_df.to_csv(temp_output_file, index=False)
-                print(f"Progress saved to {temp_output_file}")
+            # Save progress
+            append_records(temp_output_file, [combined_data])
+            print(f"Progress saved to {temp_output_file}")
+            # An earlier run may have recorded this scenario as failed; --retry-failed must not generate it again
+            ledger.resolve(GENERATOR, "scenario", scenario_key(scenario, conversation_needed))
         
         # Rate limiting - be nice to the API
         wait_time = 10
         print(f"Waiting {wait_time} seconds before next scenario...")
         time.sleep(wait_time)
     
-    # Generate final output filename if not provided
-    if not output_file:
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        output_file = f"data/eq_training_data_{timestamp}.csv"
+    output_file = final_output_file
     
-    # Save to CSV
+    # The progress file already holds every record; copy it when the final name differs
     if processed_data:
-        final_df = pd.DataFrame(processed_data)
-        final_df.to_csv(output_file, index=False)
+        if os.path.abspath(output_file) != os.path.abspath(temp_output_file):
+            shutil.copyfile(temp_output_file, output_file)
         print(f"\nProcessed {len(processed_data)} scenarios and saved to {output_file}")
     else:
         print("No data was processed successfully.")
     
+    if ledger.recorded:
+        print(f"{ledger.recorded} scenarios failed and were recorded in {ledger.path}; rerun with --retry-failed to reprocess only those")
+    
     return processed_data
 
+def retry_failed_units(ledger=None, output_file=None):
+    """Reprocess only the scenarios recorded in the failure ledger and merge their records into the existing output.
+
+    A scenario whose optimal response failed reuses its saved conversation history. Records are
+    appended to the output file each unit was recorded with (or to output_file), and units that
+    succeed are marked resolved. Returns the records generated.
+    """
+    ledger = ledger or FailureLedger()
+    units = ledger.pending(GENERATOR) if os.path.exists(ledger.path) else []
+    if not units:
+        print(f"No failed units waiting in {ledger.path}")
+        return []
+    print(f"Retrying {len(units)} failed units from {ledger.path}")
+    
+    records = []
+    for unit in tqdm(units, desc="Retrying failed units"):
+        inputs = unit["inputs"]
+        combined_data = process_scenario(inputs["scenario"], inputs["conversation_needed"], inputs["persona"], ledger,
+                                         unit["output"], conversation_data=inputs.get("conversation_data"))
+        if combined_data:
+            append_records(output_file or unit["output"], [combined_data])
+            ledger.resolve(GENERATOR, unit["stage"], unit["key"])
+            records.append(combined_data)
+    
+    print(f"\nResolved {len(records)} of {len(units)} failed units; "
+          f"{len(ledger.pending(GENERATOR))} failed units remain in {ledger.path}")
+    return records
+
 if __name__ == "__main__":
-    # File paths
-    input_file = "data/eq_scenarios_20250227-161517.csv"
-    output_file = f"data/eq_training_data_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    parser = argparse.ArgumentParser(description='Generate a conversation history and optimal response for each existing scenario')
+    parser.add_argument('--input', type=str, default="data/eq_scenarios_20250227-161517.csv",
+                        help='Input CSV file with scenarios')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output CSV file for training data (default: auto-generated filename)')
+    parser.add_argument('--persona', type=str, default=None,
+                        help='Filter to process only scenarios for this persona')
+    parser.add_argument('--max_scenarios', type=int, default=None,
+                        help='Maximum number of scenarios to process')
+    parser.add_argument('--failure_ledger', type=str, default=default_failure_ledger(),
+                        help='SQLite ledger where failed scenarios are recorded')
+    parser.add_argument('--retry_failed', '--retry-failed', action='store_true',
+                        help='Only reprocess the failed scenarios in the ledger and merge their records into the output they belong to (or --output)')
     
-    # Process all scenarios or specify parameters to process a subset
-    # Example: process_scenarios(input_file, output_file, persona_to_process="Taylor", max_scenarios=2)
-    process_scenarios(input_file, output_file) 
\ No newline at end of file
+    args = parser.parse_args()
+    ledger = FailureLedger(args.failure_ledger)
+    if args.retry_failed:
+        retry_failed_units(ledger=ledger, output_file=args.output)
+    else:
+        output_file = args.output or f"data/eq_training_data_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+        process_scenarios(args.input, output_file, persona_to_process=args.persona, max_scenarios=args.max_scenarios, ledger=ledger)
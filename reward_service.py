@@ -0,0 +1,252 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request as urllib_request
+from token_budget import percentile
+
+
+class LLMBackend:
+    """Scores texts with the Interviewer's LLM emotion scorer, one API call per text"""
+    name = "llm"
+    # Each score is a blocking API call, so it benefits from many concurrent workers
+    concurrent = True
+
+    def __init__(self):
+        from emotional_interviewer import Interviewer
+        self.interviewer = Interviewer(scorer="llm")
+
+    def score(self, text):
+        return self.interviewer.generate_emotion_score(text)
+
+
+class LocalBackend:
+    """Scores texts with the CPU-only local emotion scorer"""
+    name = "local"
+    concurrent = False
+
+    def __init__(self, model_path=None):
+        from local_scorer import get_local_scorer
+        self.scorer = get_local_scorer(model_path) if model_path else get_local_scorer()
+
+    def score(self, text):
+        return self.scorer.score(text)
+
+
+BACKENDS = {"llm": LLMBackend, "local": LocalBackend}
+
+
+def completion_text(completion):
+    """Plain text of a completion given as a string or as a list of chat messages"""
+    if isinstance(completion, str):
+        return completion
+    if isinstance(completion, dict):
+        return str(completion.get("content", ""))
+    if isinstance(completion, (list, tuple)) and completion:
+        return completion_text(completion[-1])
+    return str(completion)
+
+
+class RewardService:
+    """Batched, deduplicated and cached reward scoring for GRPO training.
+
+    A batch is deduplicated, cache hits are answered immediately and the remaining texts are
+    scored concurrently by the backend. Texts that are not scored within the batch timeout get
+    default_reward so a slow backend never stalls a training step; their scores still land in
+    the cache when they finish.
+    """
+
+    def __init__(self, backend, max_workers=16, cache_size=100000, timeout=None, default_reward=50, scale=1.0):
+        self.backend = backend
+        self.max_workers = max_workers if getattr(backend, "concurrent", True) else 1
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.default_reward = default_reward
+        self.scale = scale
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.totals = {"batches": 0, "texts": 0, "cache_hits": 0, "scored": 0, "errors": 0, "timeouts": 0}
+        self.batch_latencies = []
+
+    def _key(self, text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        return None
+
+    def _store(self, key, score):
+        with self._lock:
+            self.cache[key] = score
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            self._pending.pop(key, None)
+
+    def _score_one(self, key, text):
+        try:
+            score = self.backend.score(text)
+        except Exception:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise
+        self._store(key, score)
+        return score
+
+    def _submit(self, key, text):
+        # Identical texts already being scored by an earlier batch share its future
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self.executor.submit(self._score_one, key, text)
+                self._pending[key] = future
+        return future
+
+    def score(self, texts):
+        """Score a batch of texts. Returns (rewards, metrics) with rewards in input order."""
+        start = time.perf_counter()
+        keys = [self._key(text) for text in texts]
+        unique = dict(zip(keys, texts))
+
+        scores = {}
+        futures = {}
+        for key, text in unique.items():
+            cached = self._cached(key)
+            if cached is not None:
+                scores[key] = cached
+            else:
+                futures[key] = self._submit(key, text)
+        cache_hits = len(scores)
+
+        done, not_done = wait(futures.values(), timeout=self.timeout) if futures else (set(), set())
+        errors = 0
+        for key, future in futures.items():
+            if future in done and future.exception() is None:
+                scores[key] = future.result()
+            else:
+                errors += future in done
+                scores[key] = self.default_reward
+
+        rewards = [scores[key] * self.scale for key in keys]
+        latency_ms = (time.perf_counter() - start) * 1000
+        metrics = {
+            "batch_size": len(texts),
+            "unique": len(unique),
+            "cache_hits": cache_hits,
+            "scored": len(futures) - errors - len(not_done),
+            "errors": errors,
+            "timeouts": len(not_done),
+            "latency_ms": round(latency_ms, 1),
+            "texts_per_second": round(len(texts) / (latency_ms / 1000), 1) if latency_ms else None,
+        }
+        with self._lock:
+            self.totals["batches"] += 1
+            self.totals["texts"] += len(texts)
+            for name in ("cache_hits", "scored", "errors", "timeouts"):
+                self.totals[name] += metrics[name]
+            self.batch_latencies.append(latency_ms)
+            del self.batch_latencies[:-1000]
+        return rewards, metrics
+
+    def reward_fn(self, completions, **kwargs):
+        """GRPO reward function: one reward per completion (string or chat message list)"""
+        rewards, _ = self.score([completion_text(c) for c in completions])
+        return rewards
+
+    def stats(self):
+        """Cumulative counters and batch latency percentiles"""
+        with self._lock:
+            latencies = list(self.batch_latencies)
+            totals = dict(self.totals)
+        totals.update({
+            "backend": getattr(self.backend, "name", type(self.backend).__name__),
+            "cache_size": len(self.cache),
+            "batch_latency_p50_ms": round(percentile(latencies, 50), 1),
+            "batch_latency_p95_ms": round(percentile(latencies, 95), 1),
+        })
+        return totals
+
+
+def serve(service, host="127.0.0.1", port=8765):
+    """Expose a RewardService over HTTP: POST /score {"texts": [...]}, GET /metrics"""
+
+    class RewardHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != "/score":
+                return self._send(404, {"error": "not found"})
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                texts = [completion_text(c) for c in payload.get("texts", payload.get("completions", []))]
+            except (ValueError, AttributeError) as e:
+                return self._send(400, {"error": f"invalid request: {e}"})
+            rewards, metrics = service.score(texts)
+            self._send(200, {"rewards": rewards, "metrics": metrics})
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                return self._send(404, {"error": "not found"})
+            self._send(200, service.stats())
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), RewardHandler)
+    print(f"Reward service ({service.stats()['backend']} backend) listening on http://{host}:{port}")
+    return server
+
+
+def remote_reward_fn(url="http://127.0.0.1:8765", timeout=60):
+    """GRPO reward function that scores completions through a running reward service"""
+    def reward_fn(completions, **kwargs):
+        body = json.dumps({"texts": [completion_text(c) for c in completions]}).encode("utf-8")
+        req = urllib_request.Request(f"{url}/score", data=body, headers={"Content-Type": "application/json"})
+        with urllib_request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read())["rewards"]
+    return reward_fn
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Batched EQ reward service for GRPO training')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default="local",
+                        help='Scorer used for rewards')
+    parser.add_argument('--host', type=str, default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=16,
+                        help='Concurrent scoring calls for the LLM backend')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Seconds a batch waits for scores before using the default reward')
+    parser.add_argument('--default_reward', type=float, default=50,
+                        help='Reward used for texts that fail or time out')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplier applied to scores (e.g. 0.01 for rewards in [0, 1])')
+
+    args = parser.parse_args()
+    service = RewardService(
+        BACKENDS[args.backend](),
+        max_workers=args.workers,
+        timeout=args.timeout,
+        default_reward=args.default_reward,
+        scale=args.scale
+    )
+    server = serve(service, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nReward service stats: {service.stats()}")
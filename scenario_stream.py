@@ -0,0 +1,71 @@
+import os
+import random
+import pandas as pd
+from sharding import in_shard, scenario_key
+
+
+def _read_rows(input_file, persona=None, chunksize=10000):
+    """Scenario rows as dicts, read chunk by chunk and filtered to one persona if requested"""
+    for chunk in pd.read_csv(input_file, chunksize=chunksize):
+        if persona:
+            if "persona" not in chunk.columns:
+                continue
+            chunk = chunk[chunk["persona"] == persona]
+        yield from chunk.to_dict("records")
+
+
+def reservoir_sample(rows, k, seed=42):
+    """Uniform sample of k rows from a stream in one pass and O(k) memory (Algorithm R), in stream order"""
+    rng = random.Random(seed)
+    reservoir = []
+    for i, row in enumerate(rows):
+        if i < k:
+            reservoir.append((i, row))
+        else:
+            j = rng.randint(0, i)
+            if j < k:
+                reservoir[j] = (i, row)
+    return [row for _, row in sorted(reservoir, key=lambda item: item[0])]
+
+
+def iter_scenarios(input_file, persona=None, max_scenarios=None, shard=None, skip_keys=None, chunksize=10000, seed=42):
+    """Stream scenarios from a CSV in bounded memory.
+
+    Rows are filtered by persona while reading, sampled down to max_scenarios with reservoir sampling,
+    then restricted to a shard and stripped of already processed scenarios (skip_keys, as produced by
+    sharding.scenario_key). Sampling happens before sharding so the shards of a sampled run add up to
+    the unsharded run. Without max_scenarios, rows are yielded as soon as their chunk is read.
+    """
+    rows = _read_rows(input_file, persona, chunksize)
+    if max_scenarios:
+        rows = reservoir_sample(rows, max_scenarios, seed)
+
+    for row in rows:
+        if shard or skip_keys:
+            key = scenario_key(row["scenario"], row["conversation_needed"])
+            if not in_shard(key, shard) or (skip_keys and key in skip_keys):
+                continue
+        yield row
+
+
+def count_rows(input_file, chunksize=100000):
+    """Number of data rows in a CSV, counted without keeping it in memory"""
+    if not os.path.exists(input_file):
+        return 0
+    return sum(len(chunk) for chunk in pd.read_csv(input_file, chunksize=chunksize, usecols=[0]))
+
+
+def processed_scenario_keys(output_file, chunksize=10000):
+    """Keys of the scenarios that already have records in an output CSV"""
+    keys = set()
+    for chunk in pd.read_csv(output_file, chunksize=chunksize, usecols=["scenario", "conversation_needed"]):
+        keys.update(scenario_key(s, c) for s, c in zip(chunk["scenario"], chunk["conversation_needed"]))
+    return keys
+
+
+def append_records(path, records):
+    """Append records to a CSV, writing the header only when the file is new"""
+    if not records:
+        return
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    pd.DataFrame(records).to_csv(path, mode="a", header=write_header, index=False)
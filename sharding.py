@@ -0,0 +1,130 @@
+import os
+import sys
+import glob
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Columns that identify one generated record when merging shard outputs
+MERGE_KEY = ["scenario", "variation_id", "conversation_point"]
+
+
+def parse_shard(spec):
+    """Parse a shard spec "i/N" (0-based i) into (i, N)"""
+    if spec is None:
+        return None
+    try:
+        index, count = (int(part) for part in str(spec).split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected i/N such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{spec}', index must be between 0 and {count - 1}")
+    return index, count
+
+
+def scenario_key(scenario, conversation_needed=""):
+    """Stable content hash of a scenario, independent of its position in the input file"""
+    return hashlib.sha1(f"{scenario}\n{conversation_needed}".encode("utf-8")).hexdigest()
+
+
+def in_shard(key, shard):
+    if shard is None:
+        return True
+    index, count = shard
+    return int(key[:12], 16) % count == index
+
+
+def shard_output_path(path, shard):
+    """Per-shard variant of an output path, e.g. out.csv -> out_shard-0-of-4.csv"""
+    if shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_shard-{shard[0]}-of-{shard[1]}{ext or '.csv'}"
+
+
+def merge_shards(files, output_file, input_file=None):
+    """Merge shard outputs into one deduplicated dataset ordered like the scenario input file"""
+    import pandas as pd
+    frames = []
+    for path in files:
+        try:
+            frames.append(pd.read_csv(path))
+        except (OSError, pd.errors.EmptyDataError) as e:
+            print(f"Skipping {path}: {e}")
+    if not frames:
+        print("No shard outputs to merge")
+        return None
+
+    merged = pd.concat(frames, ignore_index=True)
+    before = len(merged)
+    key = [c for c in MERGE_KEY if c in merged.columns]
+    merged = merged.drop_duplicates(subset=key, keep="last")
+
+    # Order by the scenario's position in the input file when it is known, otherwise by scenario text
+    if input_file and os.path.exists(input_file):
+        order = {s: i for i, s in enumerate(pd.read_csv(input_file, usecols=["scenario"])["scenario"])}
+        merged["_order"] = merged["scenario"].map(order).fillna(len(order))
+    else:
+        merged["_order"] = merged["scenario"].rank(method="dense")
+    sort_by = ["_order"] + (["variation_id"] if "variation_id" in merged.columns else [])
+    merged = merged.sort_values(sort_by, kind="stable").drop(columns="_order")
+
+    merged.to_csv(output_file, index=False)
+    print(f"Merged {len(files)} shard files: {before} rows, {before - len(merged)} duplicates removed, "
+          f"{len(merged)} rows saved to {output_file}")
+    return merged
+
+
+def launch(shards, output_file, generator_args, processes=None, script="generate_eq_training_data.py"):
+    """Run one generator process per shard on this machine, then merge their outputs"""
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    def run_shard(index):
+        shard = (index, shards)
+        shard_file = shard_output_path(output_file, shard)
+        log_file = shard_file.replace(".csv", ".log")
+        # The generator adds the shard suffix to --output itself
+        command = [sys.executable, script, "--shard", f"{index}/{shards}", "--output", output_file] + list(generator_args)
+        print(f"Starting shard {index}/{shards}: log in {log_file}")
+        with open(log_file, "w") as log:
+            result = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT)
+        print(f"Shard {index}/{shards} finished with exit code {result.returncode}")
+        return shard_file, result.returncode
+
+    with ThreadPoolExecutor(max_workers=processes or shards) as pool:
+        results = list(pool.map(run_shard, range(shards)))
+
+    failed = [path for path, code in results if code != 0]
+    if failed:
+        print(f"{len(failed)} shards failed; rerun them with --shard i/{shards} --resume <shard file> before merging")
+    input_file = generator_args[generator_args.index("--input") + 1] if "--input" in generator_args else None
+    return merge_shards([path for path, _ in results if os.path.exists(path)], output_file, input_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run sharded EQ data generation and merge shard outputs')
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    launch_parser = subparsers.add_parser("launch", help="run all shards of a generation job as local processes")
+    launch_parser.add_argument('--shards', type=int, required=True, help='Number of shards')
+    launch_parser.add_argument('--processes', type=int, default=None,
+                               help='Maximum shard processes running at once (default: one per shard)')
+    launch_parser.add_argument('--output', type=str, required=True, help='Merged output CSV')
+
+    merge_parser = subparsers.add_parser("merge", help="merge shard outputs produced here or on other machines")
+    merge_parser.add_argument('files', nargs='+', help='Shard output CSVs (globs are expanded)')
+    merge_parser.add_argument('--output', type=str, required=True, help='Merged output CSV')
+    merge_parser.add_argument('--input', type=str, default=None,
+                              help='Scenario CSV used to order the merged dataset')
+
+    # Everything after "--" is passed to every generator process
+    argv = sys.argv[1:]
+    generator_args = argv[argv.index("--") + 1:] if "--" in argv else []
+    args = parser.parse_args(argv[:argv.index("--")] if "--" in argv else argv)
+
+    if args.command == "launch":
+        launch(args.shards, args.output, generator_args, args.processes)
+    else:
+        files = sorted({path for pattern in args.files for path in glob.glob(pattern)})
+        merge_shards(files, args.output, args.input)
@@ -0,0 +1,120 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s|$)")
+
+
+def _words(text):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def stable_prefix(text):
+    """A partial transcript cut at its last sentence end.
+
+    Speech recognisers keep revising the words still being spoken, but finished sentences rarely
+    change, so only those are worth speculating on; finalize() still checks the final text.
+    """
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(text or "")]
+    return text[:ends[-1]].strip() if ends else ""
+
+
+class SpeculativeTurn:
+    """One interviewer turn fed with partial candidate transcripts.
+
+    While the candidate is still speaking, feed_partial() speculatively computes the interviewer's
+    emotions, score and thoughts on stable prefixes of the transcript in a background thread.
+    finalize() reuses the latest speculation when the final text did not change materially (the
+    speculated words are still there and at most max_tail_words were added after them) and
+    recomputes otherwise; only the visible reply then remains to be generated.
+    """
+
+    def __init__(self, interviewer, min_new_words=6, max_tail_words=8, min_overlap=0.9):
+        self.interviewer = interviewer
+        self.min_new_words = min_new_words
+        self.max_tail_words = max_tail_words
+        self.min_overlap = min_overlap
+        self.base_messages = list(interviewer.messages)
+        self.speculations = []
+        self.stats = {"partials": 0, "speculations": 0, "reused": False, "recomputed": False}
+        self._last_speculated = ""
+        self._wanted = ""
+        self._running = False
+        self._finalized = False
+        # Reentrant: a speculation that is already done runs its callback inside _start
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-turn")
+
+    def feed_partial(self, text):
+        """Accept the latest partial transcript; starts a speculation when a longer stable prefix appears"""
+        stable = stable_prefix(text)
+        with self._lock:
+            self.stats["partials"] += 1
+            if self._finalized:
+                return
+            self._wanted = stable
+            # One speculation at a time; a newer prefix waits for the running one to finish
+            if not self._running and self._worth_speculating(stable):
+                self._start(stable)
+
+    def _worth_speculating(self, text):
+        return len(_words(text)) - len(_words(self._last_speculated)) >= self.min_new_words
+
+    def _start(self, text):
+        self._running = True
+        self._last_speculated = text
+        self.stats["speculations"] += 1
+        future = self._executor.submit(self._speculate, text)
+        self.speculations.append((text, future))
+        future.add_done_callback(self._on_done)
+
+    def _speculate(self, text):
+        return self.interviewer.inner_state(self.base_messages + [{"role": "user", "content": text}])
+
+    def _on_done(self, _future):
+        with self._lock:
+            self._running = False
+            if not self._finalized and self._worth_speculating(self._wanted):
+                self._start(self._wanted)
+
+    def reusable(self, speculated_text, final_text):
+        """Whether inner state computed on speculated_text still holds for final_text"""
+        speculated, final = _words(speculated_text), _words(final_text)
+        if not speculated:
+            return False
+        matches = sum(a == b for a, b in zip(speculated, final))
+        return matches / len(speculated) >= self.min_overlap and len(final) - len(speculated) <= self.max_tail_words
+
+    def finalize(self, final_text):
+        """Commit the turn with the final transcript; returns the same tuple as Interviewer.get_response"""
+        with self._lock:
+            self._finalized = True
+            speculations = list(self.speculations)
+
+        state = None
+        for text, future in reversed(speculations):
+            if not self.reusable(text, final_text):
+                continue
+            try:
+                state = future.result()
+            except Exception as e:
+                print(f"Speculation on a partial transcript failed: {e}")
+                continue
+            self.stats["reused"] = True
+            break
+        self._executor.shutdown(wait=False)
+
+        if state is None:
+            self.stats["recomputed"] = True
+            state = self.interviewer.inner_state(self.base_messages + [{"role": "user", "content": final_text}])
+        internal_emotions, emotion_score, internal_thoughts = state
+
+        interviewer = self.interviewer
+        interviewer.messages.append({"role": "user", "content": final_text})
+        interviewer.messages.append({"role": "assistant", "content": f"[emotions]{internal_emotions}[/emotions]"})
+        interviewer.messages.append({"role": "assistant", "content": f"[thoughts]{internal_thoughts}[/thoughts]"})
+        interviewer_response = interviewer.call_anthropic_api(interviewer.messages)
+        interviewer.messages.append({"role": "assistant", "content": interviewer_response})
+        interviewer.conversation_history = interviewer.messages.copy()
+        return (internal_emotions, internal_thoughts, interviewer_response, emotion_score)
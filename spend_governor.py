@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import deque
+from local_backend import LOCAL_MODEL_PREFIX
+
+# USD per million input/output tokens; models not listed are priced like Sonnet
+PRICES = {
+    "claude-3-7-sonnet-20250219": (3.0, 15.0),
+    "claude-3-5-sonnet-20240620": (3.0, 15.0),
+    "claude-3-5-sonnet-20241022": (3.0, 15.0),
+    "claude-3-5-haiku-20241022": (0.8, 4.0),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-opus-20240229": (15.0, 75.0),
+}
+DEFAULT_PRICE = (3.0, 15.0)
+# Cache writes and reads relative to the base input price
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+LIMIT_KINDS = ("tokens", "calls", "cost")
+
+
+class BudgetExceeded(Exception):
+    """A run or stage reached one of its spend limits; no further calls are made"""
+
+    def __init__(self, scope, kind, limit, spent):
+        super().__init__(f"{scope} reached its {kind} limit ({spent:g} of {limit:g})")
+        self.scope = scope
+        self.kind = kind
+        self.limit = limit
+        self.spent = spent
+
+
+def call_cost(model, usage):
+    """Estimated USD cost of one response from its usage block"""
+    if model and model.startswith(LOCAL_MODEL_PREFIX):
+        # Served by a local_backend endpoint
+        return 0.0
+    input_price, output_price = PRICES.get(model, DEFAULT_PRICE)
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    return (usage.input_tokens * input_price
+            + cache_write * input_price * CACHE_WRITE_MULTIPLIER
+            + cache_read * input_price * CACHE_READ_MULTIPLIER
+            + usage.output_tokens * output_price) / 1e6
+
+
+def parse_stage_limit(spec):
+    """Parse a stage limit "call_site:kind=value", e.g. "generator.optimal_response:cost=5" """
+    try:
+        stage, limit = spec.rsplit(":", 1)
+        kind, value = limit.split("=")
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid stage limit '{spec}', expected call_site:kind=value such as generator.variations:cost=5")
+    if kind not in LIMIT_KINDS:
+        raise ValueError(f"Invalid stage limit '{spec}', kind must be one of {', '.join(LIMIT_KINDS)}")
+    return stage, kind, value
+
+
+class SpendGovernor:
+    """Meters and caps the API spend of a run.
+
+    Every create_message call reports its usage here (set token_budget.default_governor). Limits
+    on tokens, calls and estimated cost apply to the whole run and, via stage_limits
+    ({call_site: {kind: value}}, where a dotted prefix covers its sub-stages), to single stages.
+    A call that would start past a limit raises BudgetExceeded instead. With tokens_per_minute,
+    calls are throttled to keep the trailing minute's tokens under that rate.
+    """
+
+    def __init__(self, max_tokens=None, max_calls=None, max_cost=None, stage_limits=None, tokens_per_minute=None):
+        self.limits = {"tokens": max_tokens, "calls": max_calls, "cost": max_cost}
+        self.stage_limits = stage_limits or {}
+        self.tokens_per_minute = tokens_per_minute
+        self.totals = self._empty()
+        self.stages = {}
+        self.throttled_seconds = 0.0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _empty():
+        return {"tokens": 0, "calls": 0, "cost": 0.0, "input_tokens": 0, "output_tokens": 0}
+
+    def _stage_spend(self, stage):
+        """Spend of a stage, including its sub-stages ("generator" covers "generator.variations")"""
+        spent = self._empty()
+        for call_site, call_site_spent in self.stages.items():
+            if call_site == stage or call_site.startswith(stage + "."):
+                for kind in spent:
+                    spent[kind] += call_site_spent[kind]
+        return spent
+
+    def _check(self, scope, limits, spent):
+        for kind in LIMIT_KINDS:
+            limit = limits.get(kind)
+            if limit is not None and spent[kind] >= limit:
+                raise BudgetExceeded(scope, kind, limit, spent[kind])
+
+    def before_call(self, call_site):
+        """Raise BudgetExceeded if the run or the call's stage is out of budget; throttle if needed"""
+        with self._lock:
+            self._check("run", self.limits, self.totals)
+            for stage, limits in self.stage_limits.items():
+                if call_site == stage or call_site.startswith(stage + "."):
+                    self._check(stage, limits, self._stage_spend(stage))
+        if self.tokens_per_minute:
+            self._throttle()
+
+    def _throttle(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                while self._recent and self._recent[0][0] < now - 60:
+                    self._recent.popleft()
+                used = sum(tokens for _, tokens in self._recent)
+                if used < self.tokens_per_minute or not self._recent:
+                    return
+                wait = self._recent[0][0] + 60 - now
+                self.throttled_seconds += wait
+            print(f"Throttling: {used} tokens in the last minute, waiting {wait:.0f}s")
+            time.sleep(wait)
+
+    def record(self, call_site, model, usage):
+        tokens = usage.input_tokens + usage.output_tokens
+        cost = call_cost(model, usage)
+        with self._lock:
+            stage = self.stages.setdefault(call_site, self._empty())
+            for spent in (self.totals, stage):
+                spent["tokens"] += tokens
+                spent["calls"] += 1
+                spent["cost"] += cost
+                spent["input_tokens"] += usage.input_tokens
+                spent["output_tokens"] += usage.output_tokens
+            self._recent.append((time.time(), tokens))
+
+    def remaining(self):
+        """Run budget left per limited kind"""
+        with self._lock:
+            return {kind: limit - self.totals[kind] for kind, limit in self.limits.items() if limit is not None}
+
+    def projection(self, units_done, units_total):
+        """Spend projected for units_total units from the average of the units_done so far"""
+        with self._lock:
+            totals = dict(self.totals)
+        if not units_done:
+            return None
+        return {kind: totals[kind] / units_done * units_total for kind in LIMIT_KINDS}
+
+    def can_afford(self, units_done, units=1):
+        """Whether `units` more units fit in the run budget at the average spend per unit so far"""
+        if not units_done:
+            return True
+        with self._lock:
+            return all(
+                self.totals[kind] + self.totals[kind] / units_done * units <= limit
+                for kind, limit in self.limits.items() if limit is not None
+            )
+
+    def report(self, records=None):
+        """Print spend by stage, and per generated record when `records` is given"""
+        with self._lock:
+            totals = dict(self.totals)
+            stages = {stage: dict(spent) for stage, spent in self.stages.items()}
+        print("\n--- Spend ---")
+        for stage, spent in sorted(stages.items()):
+            print(f"{stage:32s} {spent['calls']:6d} calls  {spent['input_tokens']:10d} in  {spent['output_tokens']:9d} out  ${spent['cost']:.4f}")
+        print(f"{'total':32s} {totals['calls']:6d} calls  {totals['input_tokens']:10d} in  {totals['output_tokens']:9d} out  ${totals['cost']:.4f}")
+        if self.throttled_seconds:
+            print(f"Throttled for {self.throttled_seconds:.0f}s")
+        if records:
+            print(f"{records} records: ${totals['cost'] / records:.4f} and {totals['tokens'] / records:.0f} tokens per record")
+        return {"totals": totals, "stages": stages, "records": records}
@@ -0,0 +1,69 @@
+import re
+import statistics
+
+# Phrases the interviewer uses once it reaches the closing stage of the system prompt
+CLOSING_PATTERNS = [
+    r"\b(do|would) you have any (other |more |further |final )?questions\b",
+    r"\bany (other |more |further |final )?questions (for me|you'd like to ask|you would like to ask|about the (role|company|team))\b",
+    r"\bthank you (so much )?for your time\b",
+    r"\b(that|this) (concludes|wraps up) (our|the) interview\b",
+    r"\bwe('re| are) (almost|nearly) out of time\b",
+    r"\bnext steps in (the|our) (process|hiring)\b",
+]
+_CLOSING_RE = re.compile("|".join(CLOSING_PATTERNS), re.IGNORECASE)
+
+
+def closing_intent(text):
+    """True if an interviewer message moves the interview into its closing stage"""
+    return bool(text) and bool(_CLOSING_RE.search(text))
+
+
+class TerminationPolicy:
+    """Rules for ending a simulated interview once further turns add no training signal.
+
+    - closing: the interviewer asked whether the candidate has questions / wrapped up
+    - plateau: the emotion score stayed within plateau_tolerance for plateau_turns turns
+    - low_reward_variance: the variance of the last variance_turns rewards fell below reward_variance;
+      the jump from the opener's placeholder score is not a reward, as in the simulation CSVs
+    No rule fires before min_turns turns have been played.
+    """
+
+    def __init__(self, closing=True, plateau_turns=3, plateau_tolerance=2, reward_variance=None, variance_turns=3, min_turns=4):
+        self.closing = closing
+        self.plateau_turns = plateau_turns
+        self.plateau_tolerance = plateau_tolerance
+        self.reward_variance = reward_variance
+        # Independent of plateau_turns, so plateau detection can be off while the variance rule stays on
+        self.variance_turns = variance_turns
+        self.min_turns = min_turns
+
+    @classmethod
+    def from_dict(cls, config):
+        """Build a policy from a dict such as an experiment spec's "termination" section (None disables it)"""
+        if config is None or config is False:
+            return None
+        return cls(**config)
+
+    def to_dict(self):
+        """The policy's arguments, as accepted by from_dict"""
+        return {"closing": self.closing, "plateau_turns": self.plateau_turns, "plateau_tolerance": self.plateau_tolerance,
+                "reward_variance": self.reward_variance, "variance_turns": self.variance_turns, "min_turns": self.min_turns}
+
+    def check(self, interviewer_response, scores):
+        """Return the reason to stop after the latest interviewer turn, or None to continue"""
+        if len(scores) < self.min_turns:
+            return None
+        if self.closing and closing_intent(interviewer_response):
+            return "closing"
+        if self.plateau_turns and len(scores) >= self.plateau_turns:
+            recent = scores[-self.plateau_turns:]
+            if max(recent) - min(recent) <= self.plateau_tolerance:
+                return "plateau"
+        # scores[0] is the opener's placeholder, so rewards start with the change after it
+        observed = scores[1:]
+        if self.reward_variance is not None and len(observed) > self.variance_turns >= 2:
+            recent = observed[-self.variance_turns - 1:]
+            rewards = [b - a for a, b in zip(recent, recent[1:])]
+            if statistics.pvariance(rewards) < self.reward_variance:
+                return "low_reward_variance"
+        return None
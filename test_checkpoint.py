@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from checkpoint import SimulationCheckpoint
+from termination import TerminationPolicy
+from test_interviewer import run_config
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    checkpoint = SimulationCheckpoint(str(tmp_path / "checkpoints.db"))
+    yield checkpoint
+    checkpoint.close()
+
+
+def test_turns_and_run_config_round_trip(checkpoint):
+    config = run_config(10, TerminationPolicy(reward_variance=4.0))
+    checkpoint.start("alex-high-eq-1.csv", "Alex (High EQ)", 1, 10, config)
+    checkpoint.save_turn("alex-high-eq-1.csv", 0, {"scores": [50]}, ["calm", 50])
+    checkpoint.save_turn("alex-high-eq-1.csv", 1, {"scores": [50, 60]}, ["warm", 60])
+    saved = checkpoint.load("alex-high-eq-1.csv")
+    assert saved["status"] == "running"
+    assert saved["config"] == config
+    assert saved["rows"] == [["calm", 50], ["warm", 60]]
+    assert saved["state"] == {"scores": [50, 60]}
+
+    checkpoint.finish("alex-high-eq-1.csv", 55.0)
+    assert checkpoint.load("alex-high-eq-1.csv")["status"] == "done"
+    assert checkpoint.load("casey-low-eq-1.csv") is None
+
+
+def test_run_configs_tell_sweeps_apart():
+    sweep = run_config(10)
+    experiment = run_config(10, TerminationPolicy.from_dict({}))
+    assert sweep != experiment
+    assert run_config(12) != sweep
+    assert experiment == run_config(10, TerminationPolicy())
+
+
+def test_restarting_drops_the_old_turns(checkpoint):
+    checkpoint.start("alex-high-eq-1.csv", "Alex (High EQ)", 1, 10, run_config(10))
+    checkpoint.save_turn("alex-high-eq-1.csv", 0, {}, ["calm", 50])
+    checkpoint.start("alex-high-eq-1.csv", "Alex (High EQ)", 1, 6, run_config(6))
+    saved = checkpoint.load("alex-high-eq-1.csv")
+    assert (saved["rows"], saved["config"]) == ([], run_config(6))
+
+
+def test_databases_without_run_configs_are_upgraded(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE simulations (key TEXT PRIMARY KEY, persona TEXT NOT NULL, sim INTEGER NOT NULL, n_turns INTEGER NOT NULL,
+                                  status TEXT NOT NULL, average REAL, updated_at REAL NOT NULL);
+        INSERT INTO simulations VALUES ('alex-high-eq-1.csv', 'Alex (High EQ)', 1, 10, 'done', 61.5, 0);
+    """)
+    conn.close()
+    checkpoint = SimulationCheckpoint(path)
+    saved = checkpoint.load("alex-high-eq-1.csv")
+    # An old checkpoint has no run configuration, so it matches no run and is started over
+    assert (saved["status"], saved["config"]) == ("done", None)
+    checkpoint.close()
@@ -0,0 +1,59 @@
+import pytest
+
+from dedup import NearDuplicateFilter, jaccard, shingle_set
+
+WORDS = [f"word{i}" for i in range(22)]
+
+
+def variation(words, description="", point="asks about the deadline"):
+    return {"current_emotional_state": " ".join(words), "conversation_point": point, "variation_description": description}
+
+
+ORIGINAL = variation(WORDS, "original")
+# The last word changed: 21 of the 23 distinct shingles shared
+NEAR = variation(WORDS[:-1] + ["other"], "near")
+DIFFERENT = variation([f"term{i}" for i in range(22)], "different")
+
+
+def test_shingles_and_jaccard():
+    assert shingle_set({"current_emotional_state": "Calm, but TIRED now"}, ["current_emotional_state"]) == {
+        "current_emotional_state:calm but tired", "current_emotional_state:but tired now"}
+    # Fields shorter than a shingle still count as one shingle
+    assert shingle_set({"conversation_point": "Greeting"}, ["conversation_point"]) == {"conversation_point:greeting"}
+    assert jaccard(set(), set()) == 1.0
+    assert jaccard({1, 2, 3}, {2, 3, 4}) == 0.5
+
+
+def test_threshold_decides_between_near_duplicates():
+    similarity = jaccard(shingle_set(ORIGINAL), shingle_set(NEAR))
+    assert similarity == pytest.approx(21 / 23)
+
+    strict = NearDuplicateFilter(threshold=0.95)
+    assert strict.filter([ORIGINAL, NEAR]) == [ORIGINAL, NEAR]
+
+    loose = NearDuplicateFilter(threshold=0.9)
+    assert loose.filter([ORIGINAL, NEAR, DIFFERENT]) == [ORIGINAL, DIFFERENT]
+    assert (loose.report["checked"], loose.report["kept"], loose.report["dropped"]) == (3, 2, 1)
+    [duplicate] = loose.report["duplicates"]
+    assert (duplicate["dropped"], duplicate["kept"], duplicate["similarity"]) == ("near", "original", round(similarity, 3))
+
+
+def test_exact_duplicates_are_dropped_at_the_default_threshold():
+    dedup = NearDuplicateFilter()
+    assert dedup.add(ORIGINAL)
+    assert not dedup.add(dict(ORIGINAL, variation_description="copy"))
+    kept, similarity = dedup.find_duplicate(NEAR)
+    assert kept is ORIGINAL and similarity == pytest.approx(21 / 23)
+    assert dedup.find_duplicate(DIFFERENT) is None
+
+
+def test_records_are_only_compared_within_their_group():
+    dedup = NearDuplicateFilter(threshold=0.8)
+    assert dedup.add(ORIGINAL, group="scenario-1")
+    assert dedup.add(ORIGINAL, group="scenario-2")
+    assert not dedup.add(NEAR, group="scenario-1")
+
+
+def test_num_perm_must_split_into_bands():
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(num_perm=60, bands=16)
@@ -0,0 +1,47 @@
+import math
+
+import pytest
+
+from experiment_runner import DEFAULT_SPEC, confidence_interval, per_look_confidence, t_critical
+
+# Two-sided critical values from a standard t table
+T_TABLE = [
+    (1, 0.95, 12.7062),
+    (2, 0.95, 4.3027),
+    (3, 0.95, 3.1824),
+    (4, 0.95, 2.7764),
+    (9, 0.95, 2.2622),
+    (30, 0.95, 2.0423),
+    (1, 0.99, 63.6567),
+    (5, 0.99, 4.0321),
+    (30, 0.99, 2.7500),
+    (9, 0.90, 1.8331),
+]
+
+
+@pytest.mark.parametrize("df, confidence, expected", T_TABLE)
+def test_t_critical_matches_the_t_table(df, confidence, expected):
+    assert t_critical(df, confidence) == pytest.approx(expected, abs=1e-4)
+
+
+def test_t_critical_approaches_the_normal_quantile():
+    assert t_critical(100000, 0.95) == pytest.approx(1.95996, abs=1e-4)
+
+
+def test_t_critical_without_degrees_of_freedom():
+    assert t_critical(0) == math.inf
+
+
+def test_per_look_confidence_splits_alpha_across_looks():
+    spec = dict(DEFAULT_SPEC)
+    # min_sims=3 to max_sims=10 is 8 looks sharing the 5% error rate
+    assert per_look_confidence(spec) == pytest.approx(1 - 0.05 / 8)
+    assert per_look_confidence(dict(spec, sequential_correction="none")) == 0.95
+    assert per_look_confidence(dict(spec, min_sims=5, max_sims=5)) == pytest.approx(0.95)
+
+
+def test_confidence_interval():
+    mean, half_width = confidence_interval([60, 70, 80])
+    assert mean == 70
+    assert half_width == pytest.approx(4.3027 * 10 / math.sqrt(3), rel=1e-4)
+    assert confidence_interval([60]) == (60, math.inf)
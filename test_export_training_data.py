@@ -0,0 +1,72 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from export_training_data import (discounted_returns, export_training_data, load_simulation,
+                                  parse_simulation_filename, persona_return_stats)
+
+
+def write_simulation(directory, name, scores):
+    rows = [{"interviewer_emotions": "", "interviewer_emotion_score": score, "interviewer_thoughts": "",
+             "interviewer_response": f"Question {turn}?", "interviewee_response": f"Answer {turn}.",
+             "reward": 0, "conversation_history": ""} for turn, score in enumerate(scores)]
+    path = os.path.join(directory, name)
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return path
+
+
+def test_discounted_returns():
+    assert discounted_returns([1, 2, 3], 0.5) == pytest.approx([1 + 0.5 * 2 + 0.25 * 3, 2 + 0.5 * 3, 3])
+    assert discounted_returns([1, 2, 3], 1.0) == pytest.approx([6, 5, 3])
+    assert discounted_returns([1, 2, 3], 0) == pytest.approx([1, 2, 3])
+    assert len(discounted_returns([], 0.9)) == 0
+
+
+def test_parse_simulation_filename():
+    assert parse_simulation_filename("runs/alex-high-eq-7.csv") == {"persona": "alex", "eq_level": "high", "sim": 7}
+    assert parse_simulation_filename("notes.csv")["eq_level"] == "unknown"
+
+
+def test_first_reward_is_zero_and_last_turn_is_dropped(tmp_path):
+    path = write_simulation(str(tmp_path), "alex-high-eq-1.csv", [50, 70, 60, 80])
+    df = load_simulation(path, gamma=0.5)
+    # The opener's 50 is a placeholder, so the jump to 70 is not credited to the first answer
+    assert df["reward"].tolist() == [0, -10, 20]
+    assert df["return"].tolist() == pytest.approx([0 - 5 + 5, -10 + 10, 20])
+    assert df["turn"].tolist() == [0, 1, 2]
+    assert df["next_emotion_score"].tolist() == [70, 60, 80]
+    assert df["prompt"].iloc[1] == "Interviewer: Question 0?\nCandidate: Answer 0.\nInterviewer: Question 1?\nCandidate:"
+    assert df["completion"].iloc[1] == " Answer 1."
+
+
+def test_advantages_are_normalized_per_persona(tmp_path):
+    directory = str(tmp_path)
+    files = [
+        write_simulation(directory, "alex-high-eq-1.csv", [50, 60, 70, 80]),
+        write_simulation(directory, "alex-high-eq-2.csv", [50, 55, 50, 65]),
+        write_simulation(directory, "casey-low-eq-1.csv", [50, 40, 30, 35]),
+    ]
+    stats = persona_return_stats(files, gamma=0.9)
+    assert stats["alex"]["count"] == 6 and stats["casey"]["count"] == 3
+
+    output_dir = os.path.join(directory, "grpo")
+    manifest = export_training_data(os.path.join(directory, "*-eq-*.csv"), output_dir, gamma=0.9)
+    assert manifest["records"] == 9
+    records = [json.loads(line) for shard in manifest["shards"] for line in open(os.path.join(output_dir, shard))]
+    for persona in ("alex", "casey"):
+        advantages = np.array([r["advantage"] for r in records if r["persona"] == persona])
+        assert advantages.mean() == pytest.approx(0, abs=1e-6)
+        assert advantages.std() == pytest.approx(1, abs=1e-6)
+
+
+def test_export_filters_on_advantage(tmp_path):
+    directory = str(tmp_path)
+    write_simulation(directory, "alex-high-eq-1.csv", [50, 60, 70, 80])
+    write_simulation(directory, "alex-high-eq-2.csv", [50, 55, 50, 65])
+    manifest = export_training_data(os.path.join(directory, "*-eq-*.csv"), os.path.join(directory, "grpo"),
+                                    min_advantage=0.0)
+    assert manifest["records"] + manifest["filtered_out"] == 6
+    assert 0 < manifest["records"] < 6
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+from failure_ledger import FailureLedger, GenerationFailure
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = FailureLedger(str(tmp_path / "data" / "failures.db"))
+    yield ledger
+    ledger.close()
+
+
+def failure(error_class="RateLimitError", attempts=3):
+    return GenerationFailure("generator.variations", error_class, "overloaded", attempts)
+
+
+def test_resolving_without_failures_creates_no_database(ledger):
+    ledger.resolve("eq", "variations", "scenario-1")
+    ledger.supersede("eq", "optimal_response", "scenario-1:", time.time())
+    assert not ledger.exists
+    assert not os.path.exists(ledger.path)
+
+
+def test_record_and_pending(ledger):
+    ledger.record("eq", "variations", "scenario-1", {"scenario": "s1"}, "out.jsonl", failure())
+    ledger.record("eq", "optimal_response", "scenario-2:0", {"variation": "v"}, "out.jsonl", failure("InvalidJSON", 1))
+    assert ledger.recorded == 2
+    pending = ledger.pending()
+    assert [entry["key"] for entry in pending] == ["scenario-1", "scenario-2:0"]
+    assert pending[0]["inputs"] == {"scenario": "s1"}
+    assert pending[0]["output"] == "out.jsonl"
+    assert [entry["key"] for entry in ledger.pending(stage="optimal_response")] == ["scenario-2:0"]
+    assert ledger.pending(generator="other") == []
+
+
+def test_repeated_failures_accumulate_attempts(ledger):
+    ledger.record("eq", "variations", "scenario-1", {}, "out.jsonl", failure(attempts=3))
+    ledger.record("eq", "variations", "scenario-1", {}, "out.jsonl", failure("APITimeoutError", 2))
+    [entry] = ledger.pending()
+    assert (entry["attempts"], entry["failures"], entry["error_class"]) == (5, 2, "APITimeoutError")
+
+
+def test_resolve_removes_the_unit_from_pending(ledger):
+    ledger.record("eq", "variations", "scenario-1", {}, "out.jsonl", failure())
+    ledger.record("eq", "variations", "scenario-2", {}, "out.jsonl", failure())
+    ledger.resolve("eq", "variations", "scenario-1")
+    assert [entry["key"] for entry in ledger.pending()] == ["scenario-2"]
+    statuses = {(entry["status"], entry["units"]) for entry in ledger.summary()}
+    assert statuses == {("failed", 1), ("resolved", 1)}
+    # A unit that fails again after being resolved is pending again
+    ledger.record("eq", "variations", "scenario-1", {}, "out.jsonl", failure())
+    assert len(ledger.pending()) == 2
+
+
+def test_supersede_only_resolves_older_units_under_the_prefix(ledger):
+    ledger.record("eq", "optimal_response", "scenario-1:0", {}, "out.jsonl", failure())
+    ledger.record("eq", "optimal_response", "scenario-10:0", {}, "out.jsonl", failure())
+    before = time.time()
+    time.sleep(0.01)
+    ledger.record("eq", "optimal_response", "scenario-1:1", {}, "out.jsonl", failure())
+    ledger.supersede("eq", "optimal_response", "scenario-1:", before)
+    assert [entry["key"] for entry in ledger.pending()] == ["scenario-10:0", "scenario-1:1"]
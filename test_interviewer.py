@@ -1,162 +1,221 @@
 from emotional_interviewer import Interviewer
-from anthropic import Anthropic
-from dotenv import load_dotenv
-import os
+from interviewee import Interviewee
+from termination import TerminationPolicy
+from checkpoint import SimulationCheckpoint, default_checkpoint_db
+from opener_pool import OpenerPool
 import statistics
+import argparse
 import csv
 import json
 
-load_dotenv()
-api_key = os.getenv("ANTHROPIC_API_KEY")
-
-client = Anthropic(api_key=api_key)
 N_TURNS = 10
 N_SIM = 10
 
-def main():
+PERSONAS = [
+    {"name": "Alex (High EQ)", "eq_level": "High", "description": "Strong leadership, empathetic, and excellent communicator."},
+    {"name": "Jordan (Low EQ)", "eq_level": "Low", "description": "Struggles with collaboration, dismissive of feedback, poor communication."},
+    {"name": "Taylor (Mid EQ)", "eq_level": "Mid", "description": "Good communication but lacks empathy and adaptability."},
+    {"name": "Morgan (High EQ)", "eq_level": "High", "description": "Inspiring leader, strong interpersonal skills."},
+    {"name": "Casey (Low EQ)", "eq_level": "Low", "description": "Avoids responsibility, struggles with emotional awareness."},
+]
+
+CSV_HEADER = ["interviewer_emotions", "interviewer_emotion_score", "interviewer_thoughts", "interviewer_response", "interviewee_response", "reward", "conversation_history", "termination_reason"]
+
+
+def simulation_filename(persona, sim):
+    return f"{persona['name'].split()[0].lower()}-{persona['eq_level'].lower()}-eq-{sim}.csv"
+
+
+def run_config(n_turns, termination=None):
+    """Settings a checkpointed simulation must share with the run that resumes it"""
+    return {"n_turns": n_turns, "termination": termination.to_dict() if termination else None}
+
+
+def run_simulation(persona, sim, n_turns=N_TURNS, termination=None, checkpoint=None, resume=False, opener_pool=None):
+    """Run one simulated interview, write it to the persona's CSV and return its average emotion score.
+
+    With a TerminationPolicy the interview ends early (at most n_turns) once the interviewer wraps up or
+    the score stops moving; the final row records why the session ended.
+
+    With a SimulationCheckpoint every completed turn is saved durably. When resuming, a finished
+    simulation returns its stored average without any API calls, and an unfinished one rewrites its CSV
+    from the saved rows and continues after the last completed turn. A checkpoint made with other
+    n_turns or termination rules (e.g. by experiment_runner.py) is not resumed; the simulation starts over.
+
+    With an OpenerPool the interviewer's first line comes pre-generated from the pool.
+    """
+    interviewer = Interviewer(opener_pool=opener_pool)
+    interviewee = Interviewee(persona)
+    conversation_history = []
+    interviewee_response = None
+    previous_emotion_score = 0
+    accumulated_conversation = []
+    scores = []
+    rows = []
+
+    csv_filename = simulation_filename(persona, sim)
+    config = run_config(n_turns, termination)
+    saved = checkpoint.load(csv_filename) if checkpoint and resume else None
+    if saved and saved["config"] != config:
+        print(f"Starting {csv_filename} over: its checkpoint was made with {saved['config']}, this run uses {config}")
+        saved = None
+    if saved and saved["status"] == "done":
+        print(f"Skipping {csv_filename}: already finished (average {saved['average']:.1f})")
+        return saved["average"]
+    if saved and saved["state"]:
+        state = saved["state"]
+        interviewer.messages = state["interviewer_messages"]
+        interviewer.conversation_history = interviewer.messages.copy()
+        interviewee.messages = state.get("interviewee_messages", [])
+        conversation_history = state["conversation_history"]
+        accumulated_conversation = state["accumulated_conversation"]
+        scores = state["scores"]
+        previous_emotion_score = state["previous_emotion_score"]
+        interviewee_response = state["interviewee_response"]
+        rows = saved["rows"]
+        print(f"Resuming {csv_filename} after turn {len(rows)}")
+    elif checkpoint:
+        checkpoint.start(csv_filename, persona["name"], sim, n_turns, config)
+
+    # Prepare CSV file; a resumed simulation rewrites the rows saved in its checkpoint
+    with open(csv_filename, mode='w', newline='') as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow(CSV_HEADER)
+        csv_writer.writerows(rows)
+
+        def save_turn(turn, row):
+            rows.append(row)
+            if not checkpoint:
+                return
+            csvfile.flush()
+            checkpoint.save_turn(csv_filename, turn, {
+                "interviewer_messages": interviewer.messages,
+                "interviewee_messages": interviewee.messages,
+                "conversation_history": conversation_history,
+                "accumulated_conversation": accumulated_conversation,
+                "scores": scores,
+                "previous_emotion_score": previous_emotion_score,
+                "interviewee_response": interviewee_response,
+            }, row)
+
+        # A saved row with a termination reason means the session already ended
+        first_turn = n_turns if rows and rows[-1][-1] else len(rows)
+        for turn in range(first_turn, n_turns):
+            # Start with the interviewer asking a question
+            result = interviewer.conduct_interview(interviewee_response, function_mode=True)
+            emotions, thoughts, interviewer_response, emotion_score = result
+            if not isinstance(emotion_score, int):
+                emotion_score = 50
+            # Print emotions and thoughts
+            print(f"Interviewer emotions: {emotions}")
+            print(f"Emotion score: {emotion_score}")
+            print(f"Interviewer thoughts: {thoughts}")
+            print(f"Interviewer response: {interviewer_response}")
+
+            # Accumulate the emotion score
+            scores.append(emotion_score)
+
+            # Calculate reward
+            reward = emotion_score - previous_emotion_score if turn > 0 else 0
+            previous_emotion_score = emotion_score
+
+            # Stop before paying for an answer that adds no training signal; the row still records
+            # the interviewer's reaction to the previous answer
+            termination_reason = termination.check(interviewer_response, scores) if termination else None
+            if termination_reason:
+                print(f"Ending simulation after {len(scores)} turns: {termination_reason}")
+                row = [emotions, emotion_score, thoughts, interviewer_response, "", reward, json.dumps(accumulated_conversation), termination_reason]
+                csv_writer.writerow(row)
+                save_turn(turn, row)
+                break
+
+            interviewee_response = interviewee.answer(interviewer_response)
+
+            print(f"\nCandidate: {interviewee_response}")
+            conversation_history.append(f"Interviewer: {interviewer_response}.")
+            conversation_history.append(f"You answered: {interviewee_response}.")
+
+            # Update accumulated conversation history
+            if turn > 0:
+                accumulated_conversation.append({
+                    "interviewer_response": conversation_history[-2],
+                    "interviewee_response": conversation_history[-1]
+                })
+
+            # Write to CSV
+            termination_reason = "max_turns" if turn == n_turns - 1 else ""
+            row = [emotions, emotion_score, thoughts, interviewer_response, interviewee_response, reward, json.dumps(accumulated_conversation), termination_reason]
+            csv_writer.writerow(row)
+            save_turn(turn, row)
+
+    # Calculate the average emotion score for this simulation
+    average = sum(scores) / len(scores)
+    if checkpoint:
+        checkpoint.finish(csv_filename, average)
+    return average
+
+
+def print_persona_statistics(persona, scores, n_turns=N_TURNS):
+    # Calculate statistics for the persona
+    avg_score = statistics.mean(scores)
+    min_score = min(scores)
+    max_score = max(scores)
+    std_dev = statistics.stdev(scores) if len(scores) > 1 else 0.0
+
+    # Print final statistics for the persona
+    print(f"\nStatistics for {persona['name']} in {n_turns} conversation turns in {len(scores)} simulations:")
+    print(f"Average Emotion Score: {avg_score}")
+    print(f"Minimum Emotion Score: {min_score}")
+    print(f"Maximum Emotion Score: {max_score}")
+    print(f"Standard Deviation: {std_dev}")
+
+
+def main(termination=None, checkpoint=None, resume=False, opener_pool=None):
     print("Generating data for EIQ training via interviewer's emotional score simulation")
     print("------------------------------------------------------------------------------")
-    
-    personas = [
-        {"name": "Alex (High EQ)", "eq_level": "High", "description": "Strong leadership, empathetic, and excellent communicator."},
-        {"name": "Jordan (Low EQ)", "eq_level": "Low", "description": "Struggles with collaboration, dismissive of feedback, poor communication."},
-        {"name": "Taylor (Mid EQ)", "eq_level": "Mid", "description": "Good communication but lacks empathy and adaptability."},
-        {"name": "Morgan (High EQ)", "eq_level": "High", "description": "Inspiring leader, strong interpersonal skills."},
-        {"name": "Casey (Low EQ)", "eq_level": "Low", "description": "Avoids responsibility, struggles with emotional awareness."},
-    ]
-
-    for persona in personas:
+
+    for persona in PERSONAS:
         scores = []
 
         for sim in range(1, N_SIM + 1):
-            interviewer = Interviewer()
-            conversation_history = []
-            total_emotion_score = 0
-            interviewee_response = None
-            previous_emotion_score = 0
-            accumulated_conversation = []
-
-            # Prepare CSV file
-            csv_filename = f"{persona['name'].split()[0].lower()}-{persona['eq_level'].lower()}-eq-{sim}.csv"
-            with open(csv_filename, mode='w', newline='') as csvfile:
-                csv_writer = csv.writer(csvfile)
-                csv_writer.writerow(["interviewer_emotions", "interviewer_emotion_score", "interviewer_thoughts", "interviewer_response", "interviewee_response", "reward", "conversation_history"])
-
-                for turn in range(N_TURNS):
-                    # Start with the interviewer asking a question
-                    result = interviewer.conduct_interview(interviewee_response, function_mode=True)
-                    emotions, thoughts, interviewer_response, emotion_score = result
-                    if not isinstance(emotion_score, int):
-                        emotion_score = 50
-                    # Print emotions and thoughts
-                    print(f"Interviewer emotions: {emotions}")
-                    print(f"Emotion score: {emotion_score}")
-                    print(f"Interviewer thoughts: {thoughts}")
-                    print(f"Interviewer response: {interviewer_response}")
-                    
-                    # Accumulate the emotion score
-                    total_emotion_score += emotion_score
-                    
-                    # Calculate reward
-                    reward = emotion_score - previous_emotion_score if turn > 0 else 0
-                    previous_emotion_score = emotion_score
-
-                    # Create the interviewee's prompt based on the interviewer's question
-                    interviewee_prompt = f"""
-                    You are {persona["name"]}, a product management candidate.
-                    Your emotional intelligence (EQ) level is {persona["eq_level"]}. {persona["description"]}
-                    You are a product manager with 3 years of experience working in two AI startups. You are very good technically 
-                    but are less exposed to business side of things, which you know theoretically but not practically.
-                    You are taking a job interview for a product manager position. Answer questions based on your personality traits
-                    and your job experience. You are allowed to state any facts which fit your personality and your job history, 
-                    but stay consistent with the conversation history. Only output the response relevant to your persona and nothing else.
-                    Conversation history so far: {conversation_history}
-                    Next interviewer question: {interviewer_response}
-                    """
-                    
-                    try:
-                        interviewee_response = client.messages.create(
-                            model="claude-3-7-sonnet-20250219",
-                            max_tokens=300,
-                            messages=[{"role": "user", "content": interviewee_prompt}]
-                        )
-                        interviewee_response = interviewee_response.content[0].text.strip()
-                    except Exception as e:
-                        print(f"Error during API call: {e}")
-                        interviewee_response = "Sorry, I couldn't process that."
-                    
-                    # Call Anthropic API to make the interviewee's response logically complete
-                    try:
-                        completion_prompt = f"""
-                        The following is a response from a product management candidate during an interview. 
-                        Please make sure the response is logically complete by trimming any unfinished sentences or thoughts at the end of the blurb.
-                        Only return the trimmed response, and nothing else. If you don't have any changes to make, just return the original response.
-                        
-                        Example 1: 
-                        Input: "I'm a product manager with 3 years of experience working in two AI startups. I'm very good technically but am less exposed to the business side of things, which I know theoretically but not practically."
-                        Output: "I'm a product manager with 3 years of experience working in two AI startups. I'm very good technically but am less exposed to the business side of things, which I know theoretically but not practically."
-                        
-                        Example 2:
-                        Input: "I'm a product manager with 3 years of experience working in two AI startups. I'm very "
-                        Output: "I'm a product manager with 3 years of experience working in two AI startups. 
-                        
-                        Example 3:
-                        Input: "I resolved a technical issue on feature delivery by:
-
-                           1. Creating space for the technical team to explain the core issues without pressure - I organized a whiteboard session where engineers could break down the problem in detail
-                           2. Supporting the team tangibly - I took on stakeholder management to shield the engineers from constant status updates, giving them focused time to"
-                        
-                        Output: "I resolved a technical issue on feature delivery by:
-
-                           1. Creating space for the technical team to explain the core issues without pressure - I organized a whiteboard session where engineers could break down the problem in detail
-                           2. Supporting the team tangibly - I took on stakeholder management to shield the engineers from constant status updates."
-                        
-                        Response to trim: {interviewee_response}
-                        """
-                        completed_response = client.messages.create(
-                            model="claude-3-7-sonnet-20250219",
-                            max_tokens=300,
-                            messages=[{"role": "user", "content": completion_prompt}]
-                        )
-                        interviewee_response = completed_response.content[0].text.strip()
-                    except Exception as e:
-                        print(f"Error during API call for completion: {e}")
-                        interviewee_response = "Sorry, I couldn't process that."
-
-
-                    print(f"\nCandidate: {interviewee_response}")
-                    conversation_history.append(f"Interviewer: {interviewer_response}.")
-                    conversation_history.append(f"You answered: {interviewee_response}.")
-
-                    # Update accumulated conversation history
-                    if turn > 0:
-                        accumulated_conversation.append({
-                            "interviewer_response": conversation_history[-2],
-                            "interviewee_response": conversation_history[-1]
-                        })
-
-                    # Write to CSV
-                    csv_writer.writerow([emotions, emotion_score, thoughts, interviewer_response, interviewee_response, reward, json.dumps(accumulated_conversation)])
-            
-            # Calculate the average emotion score for this simulation
-            average_emotion_score = total_emotion_score / N_TURNS
-            scores.append(average_emotion_score)
-
-        # Calculate statistics for the persona
-        avg_score = statistics.mean(scores)
-        min_score = min(scores)
-        max_score = max(scores)
-        std_dev = statistics.stdev(scores)
-
-        # Print final statistics for the persona
-        print(f"\nStatistics for {persona['name']} in {N_TURNS} conversation turns in {N_SIM} simulations:")
-        print(f"Average Emotion Score: {avg_score}")
-        print(f"Minimum Emotion Score: {min_score}")
-        print(f"Maximum Emotion Score: {max_score}")
-        print(f"Standard Deviation: {std_dev}")
-
-if __name__ == "__main__":
-    main() 
-
+            scores.append(run_simulation(persona, sim, termination=termination, checkpoint=checkpoint, resume=resume, opener_pool=opener_pool))
 
+        print_persona_statistics(persona, scores)
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate interviews with EQ personas and record the interviewer's emotion scores")
+    parser.add_argument('--early_stop', action='store_true',
+                        help=f'End sessions before {N_TURNS} turns when a termination rule fires (off by default, so every session plays all turns)')
+    parser.add_argument('--min_turns', type=int, default=4,
+                        help='Turns played before any termination rule can end a session')
+    parser.add_argument('--plateau_turns', type=int, default=3,
+                        help='End a session when the emotion score stays flat for this many turns (0 disables)')
+    parser.add_argument('--plateau_tolerance', type=int, default=2,
+                        help='Largest score change that still counts as flat')
+    parser.add_argument('--reward_variance', type=float, default=None,
+                        help='End a session when the variance of recent rewards drops below this')
+    parser.add_argument('--variance_turns', type=int, default=3,
+                        help='Number of recent rewards the --reward_variance rule looks at')
+    parser.add_argument('--no_closing_stop', action='store_true',
+                        help="Keep going after the interviewer asks whether the candidate has questions")
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip finished simulations and continue unfinished ones from their last checkpointed turn')
+    parser.add_argument('--checkpoint_db', type=str, default=default_checkpoint_db(),
+                        help='SQLite file holding per-turn simulation checkpoints')
+    parser.add_argument('--opener_pool_size', type=int, default=0,
+                        help='Pre-generate this many interviewer openers in the background (0 uses OPENER_POOL_SIZE)')
+
+    args = parser.parse_args()
+    termination = None if not args.early_stop else TerminationPolicy(
+        closing=not args.no_closing_stop,
+        plateau_turns=args.plateau_turns,
+        plateau_tolerance=args.plateau_tolerance,
+        reward_variance=args.reward_variance,
+        variance_turns=args.variance_turns,
+        min_turns=args.min_turns
+    )
+    opener_pool = None
+    if args.opener_pool_size > 0:
+        opener_pool = OpenerPool(size=args.opener_pool_size)
+        opener_pool.refill()
+    main(termination, SimulationCheckpoint(args.checkpoint_db), args.resume, opener_pool)
@@ -0,0 +1,53 @@
+from json_stream import ArrayObjectParser
+
+
+def feed_in_chunks(text, size):
+    parser = ArrayObjectParser()
+    objects = []
+    for i in range(0, len(text), size):
+        objects += parser.feed(text[i:i + size])
+    return parser, objects
+
+
+RESPONSE = 'Here are the variations:\n```json\n[\n  {"id": 1, "text": "a"},\n  {"id": 2, "nested": {"k": [1, 2]}}\n]\n```'
+
+
+def test_objects_are_returned_as_they_complete():
+    parser = ArrayObjectParser()
+    assert parser.feed('[{"id": 1}, {"id"') == [{"id": 1}]
+    assert parser.feed(': 2}]') == [{"id": 2}]
+    assert parser.done
+
+
+def test_any_chunking_gives_the_same_objects():
+    expected = [{"id": 1, "text": "a"}, {"id": 2, "nested": {"k": [1, 2]}}]
+    for size in (1, 2, 3, 7, len(RESPONSE)):
+        parser, objects = feed_in_chunks(RESPONSE, size)
+        assert objects == expected
+        assert parser.done and parser.errors == 0
+
+
+def test_escapes_and_brackets_inside_strings():
+    text = r'[{"text": "she said \"[no]\" {ok}", "path": "C:\\dir\\"}, {"id": 2}]'
+    for size in (1, 4, len(text)):
+        _, objects = feed_in_chunks(text, size)
+        assert objects == [{"text": 'she said "[no]" {ok}', "path": "C:\\dir\\"}, {"id": 2}]
+
+
+def test_brackets_in_prose_before_the_array_are_skipped():
+    text = 'I wrote [3] variations, see "[x]" below:\n[ \n {"id": 1}]'
+    for size in (1, len(text)):
+        _, objects = feed_in_chunks(text, size)
+        assert objects == [{"id": 1}]
+
+
+def test_text_after_the_array_is_ignored():
+    parser = ArrayObjectParser()
+    assert parser.feed('[{"id": 1}] and then [{"id": 2}]') == [{"id": 1}]
+    assert parser.done
+
+
+def test_unparseable_items_are_counted_and_skipped():
+    parser = ArrayObjectParser()
+    assert parser.feed('[{"id": 1,}, {"id": 2}]') == [{"id": 2}]
+    assert parser.errors == 1
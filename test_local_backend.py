@@ -0,0 +1,97 @@
+from local_backend import LocalBackends, from_openai_response, role_for, to_openai_request
+
+SCORE_TOOL = {"name": "emotion_score", "description": "Score the interviewer's feelings",
+              "input_schema": {"type": "object", "properties": {"score": {"type": "integer"}}}}
+
+
+def test_role_for_uses_the_longest_prefix():
+    assert role_for("interviewer") == "interviewer"
+    assert role_for("interviewer.reply") == "interviewer"
+    assert role_for("interviewer.emotion_score") == "scorer"
+    assert role_for("interviewee.answer") == "interviewee"
+    assert role_for("interviewerX") is None
+    assert role_for("generator.variations") is None
+
+
+def test_request_merges_consecutive_roles_and_continues_a_prefill():
+    request = {
+        "model": "claude-3-7-sonnet-20250219",
+        "max_tokens": 200,
+        "temperature": 0.7,
+        "stop_sequences": ["</answer>"],
+        "system": [{"type": "text", "text": "You are an interviewer.", "cache_control": {"type": "ephemeral"}}],
+        "messages": [
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello."},
+            {"role": "assistant", "content": [{"type": "text", "text": "Tell me"}]},
+        ],
+    }
+    body = to_openai_request(request, "phi-4-eq")
+    assert body["model"] == "phi-4-eq"
+    assert body["messages"] == [
+        {"role": "system", "content": "You are an interviewer."},
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello.\n\nTell me"},
+    ]
+    assert (body["max_tokens"], body["temperature"], body["stop"]) == (200, 0.7, ["</answer>"])
+    assert body["continue_final_message"] and not body["add_generation_prompt"]
+    assert "tools" not in body
+
+
+def test_request_translates_tools_and_tool_choice():
+    request = {"max_tokens": 50, "messages": [{"role": "user", "content": "Score it"}], "tools": [SCORE_TOOL]}
+    body = to_openai_request(dict(request, tool_choice={"type": "tool", "name": "emotion_score"}), "m")
+    assert body["tools"] == [{"type": "function", "function": {"name": "emotion_score", "description": SCORE_TOOL["description"],
+                                                               "parameters": SCORE_TOOL["input_schema"]}}]
+    assert body["tool_choice"] == {"type": "function", "function": {"name": "emotion_score"}}
+    assert "continue_final_message" not in body
+    assert to_openai_request(dict(request, tool_choice={"type": "any"}), "m")["tool_choice"] == "required"
+    assert to_openai_request(request, "m")["tool_choice"] == "auto"
+
+
+def test_response_text_and_usage():
+    data = {"id": "chatcmpl-1", "choices": [{"message": {"role": "assistant", "content": "Nice to meet you."}, "finish_reason": "length"}],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 5}}
+    message = from_openai_response(data, {"messages": []}, "phi-4-eq")
+    assert message.content[0].text == "Nice to meet you."
+    assert message.model == "local/phi-4-eq"
+    assert message.stop_reason == "max_tokens"
+    assert (message.usage.input_tokens, message.usage.output_tokens) == (12, 5)
+
+
+def test_response_tool_calls():
+    data = {"choices": [{"message": {"content": None, "tool_calls": [
+        {"id": "call_1", "function": {"name": "emotion_score", "arguments": '{"score": 72}'}}]}, "finish_reason": "tool_calls"}]}
+    message = from_openai_response(data, {"messages": []}, "m")
+    [block] = message.content
+    assert (block.type, block.name, block.input) == ("tool_use", "emotion_score", {"score": 72})
+    assert message.stop_reason == "tool_use"
+
+
+def test_forced_tool_answered_in_plain_json():
+    request = {"tools": [SCORE_TOOL], "tool_choice": {"type": "tool", "name": "emotion_score"}}
+    data = {"choices": [{"message": {"content": 'Sure: {"score": 40}'}, "finish_reason": "stop"}]}
+    message = from_openai_response(data, request, "m")
+    [block] = message.content
+    assert (block.type, block.name, block.input) == ("tool_use", "emotion_score", {"score": 40})
+    assert message.stop_reason == "tool_use"
+
+
+def test_empty_response_has_an_empty_text_block():
+    message = from_openai_response({"choices": [{"message": {"content": ""}, "finish_reason": "stop"}]}, {}, "m")
+    assert message.content[0].text == ""
+    assert message.stop_reason == "end_turn"
+
+
+def test_backends_share_endpoints_and_leave_unconfigured_roles_hosted():
+    backends = LocalBackends({
+        "interviewee": {"base_url": "http://localhost:8080/v1", "model": "phi-4-eq"},
+        "scorer": {"base_url": "http://localhost:8080/v1", "model": "scorer-1b"},
+    }, path=None)
+    interviewee = backends.client("interviewee.answer")
+    scorer = backends.client("interviewer.emotion_score")
+    assert (interviewee.model, scorer.model) == ("phi-4-eq", "scorer-1b")
+    assert interviewee.endpoint is scorer.endpoint
+    assert backends.client("interviewer.reply") is None
+    assert backends.client("interviewee") is interviewee
+    assert LocalBackends(path=None).client("interviewee") is None
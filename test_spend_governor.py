@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pytest
+
+from spend_governor import BudgetExceeded, SpendGovernor, call_cost, parse_stage_limit
+
+
+def usage(input_tokens=1000, output_tokens=500, cache_write=0, cache_read=0):
+    return SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                           cache_creation_input_tokens=cache_write, cache_read_input_tokens=cache_read)
+
+
+def test_call_cost_prices_cache_writes_and_reads():
+    model = "claude-3-7-sonnet-20250219"
+    assert call_cost(model, usage(1_000_000, 0)) == pytest.approx(3.0)
+    assert call_cost(model, usage(0, 1_000_000)) == pytest.approx(15.0)
+    assert call_cost(model, usage(0, 0, cache_write=1_000_000)) == pytest.approx(3.75)
+    assert call_cost(model, usage(0, 0, cache_read=1_000_000)) == pytest.approx(0.3)
+    assert call_cost("unknown-model", usage(1_000_000, 0)) == pytest.approx(3.0)
+    assert call_cost("local/qwen", usage(1_000_000, 1_000_000)) == 0.0
+
+
+def test_parse_stage_limit():
+    assert parse_stage_limit("generator.optimal_response:cost=5") == ("generator.optimal_response", "cost", 5.0)
+    for spec in ("generator:cost", "generator:dollars=5", "generator:cost=five"):
+        with pytest.raises(ValueError):
+            parse_stage_limit(spec)
+
+
+def test_run_limit_stops_the_next_call():
+    governor = SpendGovernor(max_calls=2)
+    for _ in range(2):
+        governor.before_call("generator.variations")
+        governor.record("generator.variations", "claude-3-7-sonnet-20250219", usage())
+    with pytest.raises(BudgetExceeded) as excinfo:
+        governor.before_call("generator.variations")
+    assert (excinfo.value.scope, excinfo.value.kind, excinfo.value.spent) == ("run", "calls", 2)
+    assert governor.remaining() == {"calls": 0}
+
+
+def test_stage_limit_covers_sub_stages_only():
+    governor = SpendGovernor(stage_limits={"generator": {"tokens": 1500}})
+    governor.record("generator.variations", "claude-3-7-sonnet-20250219", usage(1000, 0))
+    governor.record("generator.optimal_response", "claude-3-7-sonnet-20250219", usage(500, 0))
+    with pytest.raises(BudgetExceeded) as excinfo:
+        governor.before_call("generator.optimal_response")
+    assert excinfo.value.scope == "generator"
+    # "generatorX" is not a sub-stage of "generator", and other stages are unaffected
+    governor.before_call("generatorX")
+    governor.before_call("interviewer")
+
+
+def test_can_afford_projects_the_average_unit():
+    governor = SpendGovernor(max_tokens=10_000)
+    assert governor.can_afford(0)
+    # Two units of 1500 tokens each: four more (6 units, 9,000 tokens) fit, five more (10,500) would pass 10,000
+    governor.record("generator", "claude-3-7-sonnet-20250219", usage(2000, 1000))
+    assert governor.can_afford(2, units=4)
+    assert not governor.can_afford(2, units=5)
+    assert governor.projection(2, 6)["tokens"] == pytest.approx(9000)
+
+
+def test_can_afford_without_limits():
+    governor = SpendGovernor()
+    governor.record("generator", "claude-3-7-sonnet-20250219", usage())
+    assert governor.can_afford(1, units=1000)
@@ -0,0 +1,62 @@
+from termination import TerminationPolicy, closing_intent
+
+QUESTION = "Tell me about a time you disagreed with a teammate."
+CLOSING = "Great, thanks. Do you have any questions for me?"
+
+
+def test_closing_intent():
+    assert closing_intent(CLOSING)
+    assert closing_intent("Thank you so much for your time today.")
+    assert closing_intent("That concludes our interview.")
+    assert not closing_intent(QUESTION)
+    assert not closing_intent("")
+    assert not closing_intent(None)
+
+
+def test_no_rule_fires_before_min_turns():
+    policy = TerminationPolicy(min_turns=4)
+    assert policy.check(CLOSING, [50, 50, 50]) is None
+    assert policy.check(CLOSING, [50, 50, 50, 50]) == "closing"
+
+
+def test_closing_rule_can_be_disabled():
+    assert TerminationPolicy(closing=False, plateau_turns=0).check(CLOSING, [10, 30, 50, 70]) is None
+
+
+def test_plateau():
+    policy = TerminationPolicy(plateau_turns=3, plateau_tolerance=2)
+    assert policy.check(QUESTION, [10, 30, 50, 51, 52]) == "plateau"
+    assert policy.check(QUESTION, [10, 30, 50, 51, 53]) is None
+
+
+def test_low_reward_variance_uses_its_own_window():
+    # Plateau detection off: the variance rule still looks at the last variance_turns rewards
+    policy = TerminationPolicy(plateau_turns=0, reward_variance=1.0, variance_turns=3)
+    steady_climb = [10, 20, 30, 40, 50]
+    assert policy.check(QUESTION, steady_climb) == "low_reward_variance"
+    assert policy.check(QUESTION, [10, 40, 30, 60, 50]) is None
+    # With a longer window the early jumps count and the rule does not fire
+    wide = TerminationPolicy(plateau_turns=0, reward_variance=1.0, variance_turns=4, min_turns=4)
+    assert wide.check(QUESTION, [10, 20, 50, 60, 70, 80]) is None
+    assert wide.check(QUESTION, [10, 20, 30, 40, 50, 60]) == "low_reward_variance"
+
+
+def test_low_reward_variance_needs_enough_scores():
+    policy = TerminationPolicy(plateau_turns=0, reward_variance=1.0, variance_turns=4, min_turns=1)
+    assert policy.check(QUESTION, [10, 20, 30, 40, 50]) is None
+    assert policy.check(QUESTION, [10, 20, 30, 40, 50, 60]) == "low_reward_variance"
+
+
+def test_low_reward_variance_ignores_the_opener_placeholder():
+    policy = TerminationPolicy(plateau_turns=0, reward_variance=1.0)
+    # Without the placeholder only two rewards are observed at turn 4, fewer than variance_turns
+    assert policy.check(QUESTION, [50, 51, 52, 53]) is None
+    # The jump away from the placeholder does not count against a steady run of rewards
+    assert policy.check(QUESTION, [50, 80, 81, 82, 83]) == "low_reward_variance"
+
+
+def test_from_dict():
+    assert TerminationPolicy.from_dict(None) is None
+    assert TerminationPolicy.from_dict(False) is None
+    policy = TerminationPolicy.from_dict({"plateau_turns": 0, "reward_variance": 2.0, "variance_turns": 5})
+    assert (policy.plateau_turns, policy.reward_variance, policy.variance_turns) == (0, 2.0, 5)
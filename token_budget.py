@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import atexit
+import threading
+from clients import env, FROM_ENV
+from model_routing import default_router, default_recorder
+from local_backend import default_backends, LOCAL_MODEL_PREFIX
+
+
+class _file_lock:
+    """Exclusive advisory lock on a file, for read-modify-write across processes (no-op without fcntl)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        return False
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class TokenBudget:
+    """Per-call-site max_tokens budgets learned from observed output lengths.
+
+    New samples are written to the budget file in batches, every save_every samples or
+    save_interval seconds and at exit (or on flush()). Each save merges them into the samples
+    currently on disk, so concurrent processes such as generator shards keep each other's updates.
+    """
+
+    def __init__(self, path=FROM_ENV, min_samples=10, window=200, pct=95, headroom=1.25, floor=64, ceiling=8192,
+                 save_every=20, save_interval=30.0):
+        # Persisted between runs in TOKEN_BUDGET_FILE (default data/token_budgets.json); None keeps budgets in memory
+        self._path = path
+        self.min_samples = min_samples
+        self.window = window
+        self.pct = pct
+        self.headroom = headroom
+        self.floor = floor
+        self.ceiling = ceiling
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.samples = {}
+        self.stats = {}
+        self._loaded = False
+        # Samples recorded since the last save, per call site
+        self._pending = {}
+        self._last_save = time.time()
+        self._flush_at_exit = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is FROM_ENV:
+            self._path = env("TOKEN_BUDGET_FILE", os.path.join("data", "token_budgets.json"))
+        return self._path
+
+    def _load(self):
+        # Budgets are loaded on first use so importing this module never touches the filesystem
+        if self._loaded:
+            return
+        self._loaded = True
+        self.samples = self._read()
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return {site: list(values) for site, values in json.load(f).get("samples", {}).items()}
+        except (OSError, ValueError) as e:
+            print(f"Could not load token budgets from {self.path}: {e}")
+            return {}
+
+    def max_tokens(self, call_site, default=1024):
+        """Return the max_tokens budget for a call site, or the default until enough outputs were observed"""
+        with self._lock:
+            self._load()
+            samples = self.samples.get(call_site, [])
+            if len(samples) < self.min_samples:
+                return default
+            learned = int(percentile(samples, self.pct) * self.headroom)
+            return max(self.floor, min(self.ceiling, learned))
+
+    def record(self, call_site, output_tokens, continuations=0):
+        """Record the full (untruncated) output length of a finished call"""
+        with self._lock:
+            self._load()
+            samples = self.samples.setdefault(call_site, [])
+            samples.append(int(output_tokens))
+            del samples[:-self.window]
+            stats = self.stats.setdefault(call_site, {"calls": 0, "continuations": 0})
+            stats["calls"] += 1
+            stats["continuations"] += continuations
+            if not self.path:
+                return
+            self._pending.setdefault(call_site, []).append(int(output_tokens))
+            if not self._flush_at_exit:
+                self._flush_at_exit = True
+                atexit.register(self.flush)
+            if sum(map(len, self._pending.values())) >= self.save_every or time.time() - self._last_save >= self.save_interval:
+                self._save()
+
+    def flush(self):
+        """Write samples recorded since the last save"""
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if not self.path or not self._pending:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with _file_lock(f"{self.path}.lock"):
+                # Add this process's new samples to whatever other processes saved in the meantime
+                merged = self._read()
+                for site, new in self._pending.items():
+                    merged[site] = (merged.get(site, []) + new)[-self.window:]
+                # Per-process temp file so sharded generator processes never write the same file
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"samples": merged}, f)
+                os.replace(tmp_path, self.path)
+            self.samples = merged
+            self._pending = {}
+            self._last_save = time.time()
+        except OSError as e:
+            print(f"Could not save token budgets to {self.path}: {e}")
+
+    def summary(self):
+        """Current budget, sample count and continuation rate per call site"""
+        with self._lock:
+            self._load()
+            sites = sorted(set(self.samples) | set(self.stats))
+        report = {}
+        for site in sites:
+            stats = self.stats.get(site, {"calls": 0, "continuations": 0})
+            report[site] = {
+                "samples": len(self.samples.get(site, [])),
+                "budget": self.max_tokens(site, default=None),
+                "calls": stats["calls"],
+                "continuations": stats["continuations"],
+            }
+        return report
+
+
+# Shared budget used by every call site unless a caller passes its own
+default_budget = TokenBudget()
+# When set to a spend_governor.SpendGovernor, every call is metered and capped by it
+default_governor = None
+
+
+def _message_text(message):
+    return "".join(block.text for block in message.content if getattr(block, "type", None) == "text")
+
+
+def _with_prefill(messages, prefill):
+    """messages ending in an assistant prefill. A trailing assistant turn is already a prefill that the
+    response continues, so the text is appended to it; the API rejects two assistant turns in a row."""
+    if messages and messages[-1]["role"] == "assistant":
+        last = messages[-1]
+        if isinstance(last["content"], str):
+            content = last["content"] + prefill
+        else:
+            content = list(last["content"]) + [{"type": "text", "text": prefill}]
+        return messages[:-1] + [dict(last, content=content)]
+    return messages + [{"role": "assistant", "content": prefill}]
+
+
+def _governed(call_site, model, request):
+    """Yield one request, checking the spend governor before it and metering its usage after"""
+    governor = default_governor
+    if governor is not None:
+        governor.before_call(call_site)
+    message = yield request
+    if governor is not None:
+        # Local backends report their own model, which is metered but not priced
+        served_by = getattr(message, "model", None) or ""
+        governor.record(call_site, served_by if served_by.startswith(LOCAL_MODEL_PREFIX) else model, message.usage)
+    return message
+
+
+def _message_calls(call_site, budget, default_max_tokens, max_continuations, kwargs):
+    """The request/continuation logic shared by create_message and acreate_message.
+
+    A generator that yields request kwargs, receives each response via send() and returns the
+    final message, so the sync and async callers differ only in how they perform the request.
+    """
+    budget = budget or default_budget
+    max_tokens = budget.max_tokens(call_site, default_max_tokens)
+    messages = list(kwargs.pop("messages"))
+    kwargs["model"] = default_router.model(call_site, kwargs.get("model"))
+    request = dict(kwargs, messages=messages, max_tokens=max_tokens)
+    start = time.perf_counter()
+
+    message = yield from _governed(call_site, kwargs["model"], dict(max_tokens=max_tokens, messages=messages, **kwargs))
+    output_tokens = message.usage.output_tokens
+    continuations = 0
+
+    if "tools" in kwargs:
+        while message.stop_reason == "max_tokens" and continuations < max_continuations:
+            continuations += 1
+            max_tokens = min(max_tokens * 2, budget.ceiling)
+            print(f"Tool call truncated for {call_site}, retrying with max_tokens={max_tokens} ({continuations}/{max_continuations})")
+            message = yield from _governed(call_site, kwargs["model"], dict(max_tokens=max_tokens, messages=messages, **kwargs))
+            output_tokens += message.usage.output_tokens
+        # Only the final attempt reflects the real length of the tool call
+        budget.record(call_site, message.usage.output_tokens, continuations)
+        message.usage.output_tokens = output_tokens
+        default_recorder.record(call_site, request, message, time.perf_counter() - start)
+        return message
+
+    text = _message_text(message)
+    while message.stop_reason == "max_tokens" and continuations < max_continuations:
+        continuations += 1
+        print(f"Output truncated at {max_tokens} tokens for {call_site}, continuing ({continuations}/{max_continuations})")
+        # The API rejects a final assistant turn that ends in whitespace; the model regenerates it
+        prefill = text.rstrip()
+        if prefill:
+            continuation_messages = _with_prefill(messages, prefill)
+        else:
+            # Nothing to resume from, so give the model more room instead
+            continuation_messages = messages
+            max_tokens = min(max_tokens * 2, budget.ceiling)
+        message = yield from _governed(call_site, kwargs["model"], dict(max_tokens=max_tokens, messages=continuation_messages, **kwargs))
+        output_tokens += message.usage.output_tokens
+        text = prefill + _message_text(message)
+
+    from anthropic.types import TextBlock
+    message.content = [TextBlock(type="text", text=text)]
+    message.usage.output_tokens = output_tokens
+    budget.record(call_site, output_tokens, continuations)
+    default_recorder.record(call_site, request, message, time.perf_counter() - start)
+    return message
+
+
+def _streaming_send(client, on_text):
+    """A client.messages.create stand-in that streams the response and passes each text delta to on_text"""
+    def send(**request):
+        with client.messages.stream(**request) as stream:
+            for text in stream.text_stream:
+                on_text(text)
+            return stream.get_final_message()
+    return send
+
+
+def create_message(client, call_site, budget=None, default_max_tokens=1024, max_continuations=3, hedge=None, on_text=None, **kwargs):
+    """Call client.messages.create with a learned max_tokens budget.
+
+    When a text response stops on max_tokens, the partial answer is sent back as an assistant
+    prefill and generation continues, so callers always get the complete text. Truncated tool
+    calls cannot be resumed and are retried with a doubled budget instead. If the response is
+    still truncated after max_continuations, the returned message keeps stop_reason "max_tokens".
+
+    The model comes from model_routing.default_router when it has a route for the call site, and
+    finished calls are appended to the prompt log when PROMPT_LOG_FILE is set. default_governor,
+    when set, meters every request and raises spend_governor.BudgetExceeded at its limits. With a
+    hedging.HedgePolicy, requests are streamed and duplicated when their first token is late.
+    With on_text, requests are streamed and every text delta is passed to it as it arrives,
+    continuations included, so the deltas add up to the returned text (up to whitespace where a
+    continuation resumes).
+
+    Call sites whose role (interviewer, interviewee, scorer) has a local OpenAI-compatible endpoint
+    in local_backend.default_backends are sent there instead of to `client`, without hedging.
+    """
+    local = default_backends.client(call_site)
+    if local is not None:
+        client, hedge = local, None
+    if on_text is not None:
+        send = _streaming_send(client, on_text)
+    elif hedge is not None:
+        def send(**request):
+            return hedge.create(client, **request)
+    else:
+        send = client.messages.create
+
+    calls = _message_calls(call_site, budget, default_max_tokens, max_continuations, kwargs)
+    request = next(calls)
+    while True:
+        try:
+            request = calls.send(send(**request))
+        except StopIteration as done:
+            return done.value
+
+
+async def acreate_message(client, call_site, budget=None, default_max_tokens=1024, max_continuations=3, **kwargs):
+    """create_message for an AsyncAnthropic client: same budgets, continuations, routing and logging"""
+    client = default_backends.async_client(call_site) or client
+    calls = _message_calls(call_site, budget, default_max_tokens, max_continuations, kwargs)
+    request = next(calls)
+    while True:
+        response = await client.messages.create(**request)
+        try:
+            request = calls.send(response)
+        except StopIteration as done:
+            return done.value